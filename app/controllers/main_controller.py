@@ -8,19 +8,39 @@
 # @Description:
 #
 #
-from PyQt5.QtCore import QObject, QTimer, QThread, pyqtSignal
-from PyQt5.QtWidgets import QMessageBox
+from PyQt5.QtCore import Qt, QObject, QTimer, QThread, pyqtSignal
+from PyQt5.QtWidgets import QMessageBox, QApplication
 from qfluentwidgets import (
     qconfig,
     MessageBox,
 )
 
-from app.utils.wallpaper_spider import AutoWallpaperSpider
+from app.utils.wallpaper_spider import AutoWallpaperSpider, DownloadCancelledError
+from app.utils.http_session import create_http_session
+from app.utils.http_cache import ValidatorCache, CACHE_FILE_NAME
+from app.utils.tile_cache import TileCache, CACHE_DIR_NAME
+from app.utils.frame_hash import FrameHashStore, HASH_FILE_NAME
+from app.utils.wallpaper_history import WallpaperHistory, HISTORY_DB_NAME, parse_history_name
+from app.utils.backfill import BackfillJob
+from app.utils.frame_archive import FrameArchive, ARCHIVE_DIR_NAME
+from app.utils.slideshow import SlideshowBuffer, SLIDESHOW_DIR_NAME, get_slideshow_frames, load_slideshow_frames
+from app.utils.retry_policy import CircuitBreakerRegistry
+from app.utils.slot_discovery import HimawariSlotFinder
+from app.utils.mirrors import MirrorRegistry
+from app.utils.image_encoder import ImageEncoder
+from app.utils.multi_monitor import MultiMonitorWallpaper, ScreenGeometry
+from app.utils.prefetcher import StagingArea, get_prefetch_delay_ms, get_prefetch_target_time
+from app.utils.scheduler import get_next_tick_time, get_tick_slot, get_delay_ms
+from app.utils.metrics import metrics
 from app.utils.wallpaper_sources import get_earth_h8_img_url, get_moon_nasa_img_url, get_sun_nasa_img_url, \
-    get_earth_h8_4x4_img_urls
+    get_earth_h8_tile_urls, get_source_stages, skips_unchanged_frames
+from app.controllers.refresh_jobs import RefreshJobManager
 from app.windows.pod_config import PoDConfig
 from app.utils.resource_path import get_resource_path
+import datetime
 import logging
+import os
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -30,32 +50,283 @@ class WallpaperDownloadThread(QThread):
 
     download_finished = pyqtSignal(bool, str)
 
-    def __init__(self, img_url: str, img_name: str, save_folder: str, img_fill: bool = False):
+    def __init__(self, source_resolver, save_folder: str, auto_save: bool = False, staging=None,
+                 spider_options=None, image_source=None, history=None, prefetch_thread=None):
+        """
+        :param source_resolver: 无参可调用对象，返回 (img_urls, img_name, img_fill)。
+                                在后台线程中调用，以便时次探测等网络请求不阻塞界面
+        :param save_folder: 壁纸保存目录
+        :param auto_save: 是否按图片名保存历史壁纸，否则统一保存为 pod.png
+        :param staging: StagingArea 实例，命中预取结果时直接替换文件
+        :param spider_options: 传给 AutoWallpaperSpider 的关键字参数（会话、缓存、熔断器等共享资源）
+        :param image_source: 图片源名称，记录到历史索引和归档
+        :param history: WallpaperHistory 实例，保存历史壁纸时记录每一帧并按保留策略淘汰
+        :param prefetch_thread: 正在运行的 WallpaperPrefetchThread，合成的是同一帧时等待它结束并使用暂存结果
+        """
         super().__init__()
-        self.img_url = img_url
-        self.img_name = img_name
+        self.source_resolver = source_resolver
         self.save_folder = save_folder
-        self.img_fill = img_fill
+        self.auto_save = auto_save
+        self.staging = staging
+        self.cancel_event = threading.Event()
+        self.cancelled = False
+        self.spider_options = dict(spider_options or {}, cancel_event=self.cancel_event)
+        self.image_source = image_source
+        self.history = history
+        self.prefetch_thread = prefetch_thread
+        # 实际下载的时次（从图片名解析），SDO 太阳等名称中没有时次的为 None
+        self.slot_time = None
+        self.started_at = None
+
+    def cancel(self):
+        """通知线程在下一个数据块、重试等待或写出文件之前退出，不等待"""
+        self.cancelled = True
+        self.cancel_event.set()
 
     def run(self):
+        self.started_at = datetime.datetime.utcnow()
         try:
-            aw = AutoWallpaperSpider(self.img_url, self.img_name, self.save_folder, self.img_fill)
-            aw.run()
-            self.download_finished.emit(True, "壁纸下载成功")
+            img_urls, source_img_name, img_fill = self.source_resolver()
+            parsed = parse_history_name(source_img_name)
+            self.slot_time = parsed[1] if parsed is not None else None
+            # 判断是否保存历史图片
+            img_name = source_img_name if self.auto_save else 'pod.png'
+            aw = AutoWallpaperSpider(img_urls, img_name, self.save_folder, img_fill, **self.spider_options)
+            self._wait_for_prefetch(source_img_name)
+            # 预取的帧在预取时已经归档
+            staged_path = self.staging.take(source_img_name) if self.staging is not None else None
+            if staged_path is not None:
+                if aw.run_prepared(staged_path):
+                    self._record_history(aw)
+                    self.download_finished.emit(True, "壁纸设置成功（预取）")
+                else:
+                    self.download_finished.emit(True, "壁纸未变化")
+                return
+            logger.info(f'开始下载壁纸: {img_urls}')
+            updated = aw.run()
+            aw.archive_frame(source_img_name, self.image_source)
+            if updated:
+                self._record_history(aw)
+                self.download_finished.emit(True, "壁纸下载成功")
+            else:
+                self.download_finished.emit(True, "壁纸未变化")
+        except DownloadCancelledError:
+            logger.info(f"壁纸刷新已取消: {self.image_source}")
+            self.download_finished.emit(False, "已取消")
         except Exception as e:
             logger.error(f"壁纸下载失败: {e}")
             self.download_finished.emit(False, str(e))
 
+    def _wait_for_prefetch(self, img_name):
+        """预取线程正在合成同一帧（或尚未确定目标）时等待它结束，之后直接取出暂存结果，而不是再完整下载一次"""
+        prefetch = self.prefetch_thread
+        if prefetch is None:
+            return
+        while prefetch.isRunning() and prefetch.img_name in (None, img_name):
+            # 在后台线程中轮询，等待期间同样可以被取消
+            if self.cancel_event.wait(0.2):
+                raise DownloadCancelledError("刷新任务已取消")
+
+    def _record_history(self, aw):
+        """历史壁纸写入索引；索引失败不影响壁纸设置"""
+        if not self.auto_save or self.history is None:
+            return
+        try:
+            self.history.add(self.image_source, aw.wallpaper_path, frame_hash=aw.frame_hash)
+        except Exception as e:
+            logger.warning(f"记录历史壁纸失败: {e}")
+
+
+class WallpaperPrefetchThread(QThread):
+    """后台预取线程：提前下载并合成下一帧到暂存区，不设置壁纸"""
+
+    prefetch_finished = pyqtSignal(bool, str)
+
+    def __init__(self, source_resolver, staging, spider_options=None, image_source=None):
+        super().__init__()
+        self.source_resolver = source_resolver
+        self.staging = staging
+        self.spider_options = spider_options or {}
+        self.image_source = image_source
+        # 正在预取的图片名，解析出 URL 之前为 None
+        self.img_name = None
+
+    def run(self):
+        try:
+            resolved = self.source_resolver()
+            if resolved is None:
+                self.prefetch_finished.emit(True, "下一时次尚未发布，跳过预取")
+                return
+            img_urls, img_name, img_fill = resolved
+            self.img_name = img_name
+            if self.staging.has(img_name):
+                self.prefetch_finished.emit(True, f"已预取: {img_name}")
+                return
+            logger.info(f'开始预取壁纸: {img_urls}')
+            aw = AutoWallpaperSpider(img_urls, img_name, self.staging.work_dir, img_fill, **self.spider_options)
+            prepared = aw.prepare()
+            # 暂存前记录，flat_size 取合成好的文件大小
+            aw.archive_frame(img_name, self.image_source)
+            if prepared:
+                self.staging.commit(aw.wallpaper_path, img_name)
+            self.prefetch_finished.emit(True, img_name)
+        except Exception as e:
+            logger.warning(f"壁纸预取失败: {e}")
+            self.prefetch_finished.emit(False, str(e))
+
+
+class MultiMonitorDownloadThread(QThread):
+    """后台多显示器壁纸线程：各图片源并发下载，渲染后一次设置"""
+
+    download_finished = pyqtSignal(bool, str)
+
+    def __init__(self, multi_monitor_wallpaper):
+        super().__init__()
+        self.multi_monitor_wallpaper = multi_monitor_wallpaper
+        self.cancel_event = threading.Event()
+        self.cancelled = False
+        self.multi_monitor_wallpaper.spider_options['cancel_event'] = self.cancel_event
+
+    def cancel(self):
+        """通知线程在下一个数据块、重试等待或写出文件之前退出，不等待"""
+        self.cancelled = True
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            self.multi_monitor_wallpaper.run()
+            self.download_finished.emit(True, "多显示器壁纸设置成功")
+        except DownloadCancelledError:
+            logger.info("多显示器壁纸刷新已取消")
+            self.download_finished.emit(False, "已取消")
+        except Exception as e:
+            logger.error(f"多显示器壁纸设置失败: {e}")
+            self.download_finished.emit(False, str(e))
+
+
+class WallpaperApplyThread(QThread):
+    """后台设置系统壁纸：系统接口（osascript、gsettings 等子进程）可能耗时数百毫秒，不在界面线程中调用"""
+
+    def __init__(self, image_path):
+        super().__init__()
+        self.image_path = image_path
+
+    def run(self):
+        try:
+            AutoWallpaperSpider.apply_wallpaper(self.image_path)
+        except Exception as e:
+            logger.warning(f"幻灯片切换失败: {e}")
+
+
+class SlideshowLoadThread(QThread):
+    """后台加载幻灯片帧：下载缓冲区中缺少的帧，缩小编码后写入缓冲区"""
+
+    load_finished = pyqtSignal(bool, str)
+
+    def __init__(self, buffer, image_source, frames_resolver, screen_size, spider_options=None):
+        """
+        :param frames_resolver: 无参可调用对象，返回 get_slideshow_frames 的结果。
+                                在后台线程中调用，以便探测最新可用时次的网络请求不阻塞界面
+        """
+        super().__init__()
+        self.buffer = buffer
+        self.image_source = image_source
+        self.frames_resolver = frames_resolver
+        self.screen_size = screen_size
+        self.spider_options = spider_options or {}
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        try:
+            frames = self.frames_resolver()
+            # 播放窗口随最新时次向前移动，淘汰窗口之外的帧
+            self.buffer.evict_before(frames[0][0])
+            loaded = load_slideshow_frames(self.buffer, self.image_source, frames, self.screen_size,
+                                           spider_options=self.spider_options, cancel_event=self.cancel_event)
+            self.load_finished.emit(True, f"幻灯片已加载 {loaded} 帧")
+        except Exception as e:
+            logger.error(f"幻灯片帧加载失败: {e}")
+            self.load_finished.emit(False, str(e))
+
+
+class BackfillThread(QThread):
+    """后台补抓线程：下载一段时间范围内的 Himawari 历史时次"""
+
+    backfill_progress = pyqtSignal(dict)
+    backfill_finished = pyqtSignal(bool, str)
+
+    def __init__(self, backfill_job_factory):
+        """
+        :param backfill_job_factory: 无参可调用对象，返回 BackfillJob。
+                                     在后台线程中调用，以便探测最新可用时次的网络请求不阻塞界面
+        """
+        super().__init__()
+        self.backfill_job_factory = backfill_job_factory
+        self.backfill_job = None
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """停止提交新的时次，已开始的时次会完成，进度保留以便下次继续"""
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            self.backfill_job = self.backfill_job_factory()
+            self.backfill_job.on_progress = self.backfill_progress.emit
+            report = self.backfill_job.run(cancel_event=self.cancel_event)
+            self.backfill_finished.emit(True, f"补抓完成 {report['done']} 帧，失败 {report['failed']} 帧")
+        except Exception as e:
+            logger.error(f"补抓失败: {e}")
+            self.backfill_finished.emit(False, str(e))
+
 
 class MainController(QObject):
 
     def __init__(self, main_window):
         super().__init__()
         self.mw = main_window
+        # 单次定时器，每次触发后按图片源的发布时刻重新安排下一次
         self.timer = QTimer(self.mw)
+        self.timer.setSingleShot(True)
+        # 默认的粗精度定时器可能提前约 5% 触发，长间隔时会落在发布时刻之前
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._on_timer_tick)
+        self._next_tick_time = None
         self.timer_active = False  # 追踪定时器状态
-        self.download_thread = None
+        # 当前显示的 (图片源, 时次)，定时器触发时该时次已在屏幕上则跳过
+        self.displayed_slot = None
+        # 下载线程由任务队列启动：同一时刻只运行一个，运行期间的刷新合并为一次
+        self.refresh_jobs = RefreshJobManager(self)
+        self.refresh_jobs.job_finished.connect(self._on_download_finished)
         self._init_config()
+        # 控制器持有长期复用的 HTTP 会话，交给每个下载线程共享连接池
+        self.http_session = create_http_session(pool_size=max(PoDConfig.DOWNLOAD_WORKERS_OPTIONS))
+        self.validator_cache = None
+        self.tile_cache = None
+        self.frame_hashes = None
+        self.history = None
+        self.archive = None
+        # 按主机的熔断器，跨刷新共享：主机故障期间后续瓦片和定时任务快速失败
+        self.circuit_breakers = CircuitBreakerRegistry()
+        # 镜像组及其延迟统计，跨刷新保留以便优先选择更快的镜像
+        self.mirrors = MirrorRegistry()
+        # Himawari 最新可用时次探测，缓存已确认的时次
+        self.slot_finder = HimawariSlotFinder(self.http_session, circuit_breakers=self.circuit_breakers)
+        # 预取：在定时器触发前把下一帧合成到暂存区
+        self.staging = None
+        self.prefetch_thread = None
+        self.prefetch_timer = QTimer(self.mw)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.timeout.connect(self.run_prefetch)
+        self.backfill_thread = None
+        # 幻灯片：已编码的屏幕尺寸帧的环形缓冲区，切换定时器只调用系统壁纸接口
+        self.slideshow_buffer = None
+        self._slideshow_key = None
+        self.slideshow_thread = None
+        self._slideshow_reload = None
+        self.slide_apply_thread = None
+        self.slideshow_timer = QTimer(self.mw)
+        self.slideshow_timer.timeout.connect(self.show_next_slide)
         logger.info("MainController 初始化完成。")  # 这是一个示例日志
 
         # 开启
@@ -75,18 +346,46 @@ class MainController(QObject):
             self.timer.stop()
             logger.info("停止已存在的定时器")
 
-        self.timer.timeout.connect(self.run_set_wallpaper)
-
         time_interval = self.cfg.get(self.cfg.timeInterval)
         if time_interval == 'OFF':
             self.timer.stop()
+            self.prefetch_timer.stop()
             self.timer_active = False
             return
         else:
-            # 将分钟转换为毫秒
-            interval_ms = int(time_interval) * 60 * 1000
-            self.timer.start(interval_ms)
             self.timer_active = True
+            self._schedule_next_tick()
+
+    def _schedule_next_tick(self, previous_tick=None):
+        """
+        按图片源的发布周期和发布延迟，把定时器对齐到下一次发布之后。
+
+        :param previous_tick: 刚刚触发的刷新时间，下一次刷新严格晚于它
+        """
+        image_source = self.cfg.get(self.cfg.imageSource)
+        next_tick = get_next_tick_time(image_source, int(self.cfg.get(self.cfg.timeInterval)),
+                                       previous_tick=previous_tick)
+        self._next_tick_time = next_tick
+        delay_ms = get_delay_ms(next_tick)
+        self.timer.start(delay_ms)
+        logger.info(f"下一次刷新: {next_tick:%Y-%m-%d %H:%M} UTC（{delay_ms / 1000:.0f} 秒后）")
+        self._schedule_prefetch()
+
+    def _on_timer_tick(self):
+        """定时刷新：本次应显示的时次已在屏幕上时跳过，然后安排下一次"""
+        try:
+            image_source = self.cfg.get(self.cfg.imageSource)
+            slot = get_tick_slot(image_source, max(self._next_tick_time, datetime.datetime.utcnow()))
+            if self.displayed_slot is not None and self.displayed_slot[0] == image_source \
+                    and self.displayed_slot[1] >= slot:
+                logger.info(f"时次 {slot:%Y-%m-%d %H:%M} 已在屏幕上，跳过本次刷新")
+                metrics.incr('scheduler.skipped_ticks')
+            else:
+                self.run_set_wallpaper()
+        finally:
+            if self.timer_active:
+                # 定时器提前几毫秒触发时，按当前时间计算会再次得到刚触发的这一次
+                self._schedule_next_tick(previous_tick=self._next_tick_time)
 
     def run_set_wallpaper(self):
         """执行壁纸下载设置"""
@@ -102,41 +401,424 @@ class MainController(QObject):
 
             # 判断图片源
             image_source = self.cfg.get(self.cfg.imageSource)
-            if image_source == 'Earth-H8':
-                img_urls, img_name, img_fill = get_earth_h8_img_url()
-            elif image_source == 'Earth-H8-16':
-                img_urls, img_name, img_fill = get_earth_h8_4x4_img_urls()
-            elif image_source == 'Moon-NASA':
-                img_urls, img_name, img_fill = get_moon_nasa_img_url()
-            elif image_source == 'Sun-NASA':
-                img_urls, img_name, img_fill = get_sun_nasa_img_url()
-            else:
+            source_resolver = self._make_source_resolver(image_source)
+            if source_resolver is None:
                 w = MessageBox('提示', '未找到壁纸源，请检查配置文件', self.mw)
                 w.yesButton.setText("好的")
                 w.cancelButton.hide()
                 w.exec_()
                 return
 
-            # 判断是否保存历史图片
-            auto_save = self.cfg.get(self.cfg.autoSave)
-            if not auto_save:
-                img_name = 'pod.png'
-            # 启动后台下载线程
-            self.download_thread = WallpaperDownloadThread(img_urls, img_name, image_folder, img_fill=img_fill)
-            self.download_thread.download_finished.connect(self._on_download_finished)
+            if self.cfg.get(self.cfg.slideshow):
+                if self._run_slideshow(image_folder, image_source):
+                    return
+            elif self.slideshow_buffer is not None:
+                self.stop_slideshow()
+
+            screens = self._get_screens()
+            if self.cfg.get(self.cfg.multiMonitor) and len(screens) > 1:
+                self._run_multi_monitor(image_folder, image_source, screens)
+                return
+
+            # 启动后台下载线程；归档模式下历史帧保存在归档中，壁纸目录只保留当前壁纸
+            auto_save = self.cfg.get(self.cfg.autoSave) and self.cfg.get(self.cfg.historyBackend) == 'files'
+            download_thread = WallpaperDownloadThread(
+                source_resolver, image_folder, auto_save=auto_save, staging=self._get_staging(image_folder),
+                spider_options=self._get_spider_options(image_folder, image_source),
+                image_source=image_source, history=self._get_history(image_folder) if auto_save else None,
+                prefetch_thread=self.prefetch_thread if self.prefetch_thread is not None
+                and self.prefetch_thread.isRunning() else None
+            )
 
             # 禁用按钮防止重复点击
             self.mw.setDesktopButton.setEnabled(False)
-            self.download_thread.start()
+            self.refresh_jobs.submit(download_thread)
 
-            logger.info(f'开始下载壁纸: {img_urls}')
+            logger.info(f'开始获取壁纸: {image_source}')
+            self._schedule_prefetch()
 
         except Exception as e:
             logger.error(f'设置壁纸发生错误: {e}')
             QMessageBox.critical(self.mw, '错误', f'壁纸下载失败: {e}')
 
-    def _on_download_finished(self, success: bool, message: str):
-        """下载完成后回调"""
-        # 重新启用按钮
-        self.mw.setDesktopButton.setEnabled(True)
+    def _run_slideshow(self, image_folder, image_source):
+        """
+        幻灯片模式：定时器每次触发时补齐播放窗口内缺少的帧（通常只有最新的一帧），淘汰窗口之外的帧；
+        帧之间的切换由 slideshow_timer 完成。
+
+        :return: 图片源是否支持幻灯片（SDO 太阳只有最新一张图片，按普通模式设置）
+        """
+        hours = self.cfg.get(self.cfg.slideshowHours)
+        level = self.cfg.get(self.cfg.himawariLevel)
+        # 帧数只取决于播放窗口长度，这里只用于确定缓冲区容量；实际的时次在加载线程中按最新可用时次确定
+        frame_count = len(get_slideshow_frames(image_source, datetime.datetime.utcnow(), hours, level=level))
+        if not frame_count:
+            self.stop_slideshow()
+            return False
+        buffer = self._get_slideshow_buffer(image_folder, image_source, frame_count)
+        if self.slideshow_thread is not None and self.slideshow_thread.isRunning():
+            if self.slideshow_thread.buffer is not buffer:
+                # 旧缓冲区的加载线程已通知取消，退出后再为新缓冲区加载
+                self._slideshow_reload = (image_folder, image_source)
+        else:
+            def resolve_frames():
+                if image_source in ('Earth-H8', 'Earth-H8-16'):
+                    end = self.slot_finder.find_latest_slot()
+                else:
+                    end = datetime.datetime.utcnow()
+                return get_slideshow_frames(image_source, end, hours, level=level)
+
+            self.slideshow_thread = SlideshowLoadThread(
+                buffer, image_source, resolve_frames, self._get_screen_size(),
+                spider_options=self._get_spider_options(image_folder, image_source)
+            )
+            self.slideshow_thread.finished.connect(self._on_slideshow_thread_finished)
+            self.slideshow_thread.start()
+            logger.info(f'开始加载幻灯片: {image_source}，最近 {hours} 小时共 {frame_count} 帧')
+        interval_ms = int(self.cfg.get(self.cfg.slideshowInterval) * 1000)
+        if not self.slideshow_timer.isActive() or self.slideshow_timer.interval() != interval_ms:
+            self.slideshow_timer.start(interval_ms)
+        return True
+
+    def _get_slideshow_buffer(self, image_folder, image_source, capacity):
+        """获取幻灯片缓冲区；壁纸目录、图片源变化时重建，播放窗口变化时调整容量"""
+        work_dir = os.path.join(image_folder, SLIDESHOW_DIR_NAME)
+        key = (work_dir, image_source)
+        if self.slideshow_buffer is None or self._slideshow_key != key:
+            self.stop_slideshow()
+            self.slideshow_buffer = SlideshowBuffer(work_dir, capacity, encoder=self._get_encoder(image_source))
+            self._slideshow_key = key
+        self.slideshow_buffer.capacity = capacity
+        return self.slideshow_buffer
+
+    def show_next_slide(self):
+        """切换到下一帧：只在后台线程中调用系统壁纸接口；上一次切换还未完成时跳过本次"""
+        if self.slideshow_buffer is None:
+            return
+        if self.slide_apply_thread is not None and self.slide_apply_thread.isRunning():
+            return
+        path = self.slideshow_buffer.advance()
+        if path is None:
+            return
+        self.slide_apply_thread = WallpaperApplyThread(path)
+        self.slide_apply_thread.start()
+
+    def stop_slideshow(self):
+        """
+        停止幻灯片并清理缓冲区。
+        加载线程只通知取消、不在界面线程中等待；它写入的缓冲区在线程退出后由 _on_slideshow_thread_finished 清理。
+        """
+        self.slideshow_timer.stop()
+        buffer, self.slideshow_buffer = self.slideshow_buffer, None
+        self._slideshow_key = None
+        self._slideshow_reload = None
+        if self.slideshow_thread is not None and self.slideshow_thread.isRunning():
+            self.slideshow_thread.cancel_event.set()
+            if buffer is self.slideshow_thread.buffer:
+                return
+        if buffer is not None:
+            buffer.clear()
+
+    def _on_slideshow_thread_finished(self):
+        """
+        加载线程退出后，缓冲区已不再使用（幻灯片已停止或已切换图片源）时清理其中的帧；
+        运行期间切换了壁纸目录或图片源时，立即为新的缓冲区启动加载，不必等到下一次定时器触发。
+        """
+        thread = self.sender()
+        if thread.buffer is not self.slideshow_buffer:
+            thread.buffer.clear()
+        reload, self._slideshow_reload = self._slideshow_reload, None
+        if reload is not None and self.slideshow_buffer is not None:
+            self._run_slideshow(*reload)
+
+    def _get_spider_options(self, image_folder, image_source):
+        """传给 AutoWallpaperSpider 的共享资源、下载配置和图片源声明的后处理阶段"""
+        return {
+            'max_workers': self.cfg.get(self.cfg.downloadWorkers),
+            'session': self.http_session,
+            'validator_cache': self._get_validator_cache(image_folder),
+            'tile_cache': self._get_tile_cache(image_folder),
+            'circuit_breakers': self.circuit_breakers,
+            'mirrors': self.mirrors,
+            'in_memory': self.cfg.get(self.cfg.inMemoryTiles),
+            'placeholder_hashes': self.cfg.get(self.cfg.placeholderHashes),
+            'frame_hashes': self._get_frame_hashes(image_folder, image_source),
+            'archive': self._get_archive(image_folder),
+            'stages': get_source_stages(image_source, enhance=self._get_enhance_options()),
+            'encoder': self._get_encoder(image_source),
+            'screen_size': self._get_screen_size() if self.cfg.get(self.cfg.downscaleToScreen) else None,
+            'resample': self.cfg.get(self.cfg.resampleFilter),
+        }
+
+    @staticmethod
+    def _get_screen_size():
+        """
+        主屏幕的物理分辨率（逻辑尺寸 × 设备像素比）。
+        通过 Qt 读取，Windows、macOS、Linux 通用；必须在界面线程中调用，结果再传给后台线程。
+        """
+        screen = QApplication.primaryScreen()
+        if screen is None:
+            return None
+        geometry = screen.geometry()
+        ratio = screen.devicePixelRatio()
+        return round(geometry.width() * ratio), round(geometry.height() * ratio)
+
+    def _get_enhance_options(self):
+        """Himawari 图像增强参数，未开启时为 None"""
+        if not self.cfg.get(self.cfg.enhanceEarth):
+            return None
+        return {
+            'gamma': self.cfg.get(self.cfg.enhanceGamma) / 100,
+            'saturation': self.cfg.get(self.cfg.enhanceSaturation) / 100,
+        }
+
+    def _get_encoder(self, image_source):
+        """按图片源的输出格式配置创建编码器"""
+        return ImageEncoder(
+            self.cfg.get(self.cfg.output_format_item(image_source)),
+            quality=self.cfg.get(self.cfg.encodeQuality),
+            png_compress_level=self.cfg.get(self.cfg.pngCompressLevel),
+        )
+
+    @staticmethod
+    def _get_screens():
+        """所有显示器的位置和物理分辨率（在界面线程中读取）"""
+        screens = []
+        for screen in QApplication.screens():
+            geometry = screen.geometry()
+            ratio = screen.devicePixelRatio()
+            # Qt 的屏幕坐标为逻辑像素，乘以设备像素比换算为物理像素
+            screens.append(ScreenGeometry(
+                screen.name(),
+                round(geometry.x() * ratio), round(geometry.y() * ratio),
+                round(geometry.width() * ratio), round(geometry.height() * ratio)
+            ))
+        return screens
+
+    def _run_multi_monitor(self, image_folder, image_source, screens):
+        """多显示器模式：按 MonitorSources 为每个显示器选择图片源，并发下载后拼接设置"""
+        configured = self.cfg.get(self.cfg.monitorSources) or []
+        screen_sources = []
+        for index in range(len(screens)):
+            source = configured[index] if index < len(configured) else image_source
+            screen_sources.append(source if self._make_source_resolver(source) is not None else image_source)
+        source_resolvers = {source: self._make_source_resolver(source) for source in set(screen_sources)}
+
+        multi_monitor_wallpaper = MultiMonitorWallpaper(
+            screens, screen_sources, source_resolvers, image_folder,
+            spider_options=self._get_spider_options(image_folder, image_source),
+            resample=self.cfg.get(self.cfg.resampleFilter),
+            encoder=self._get_encoder(image_source),
+            enhance=self._get_enhance_options()
+        )
+        self.mw.setDesktopButton.setEnabled(False)
+        self.refresh_jobs.submit(MultiMonitorDownloadThread(multi_monitor_wallpaper))
+        logger.info(f'开始获取多显示器壁纸: {screen_sources}')
+
+    def _get_validator_cache(self, image_folder):
+        """获取壁纸目录对应的 HTTP 校验器缓存，目录变化时重新加载"""
+        expected_path = os.path.join(image_folder, CACHE_FILE_NAME)
+        if self.validator_cache is None or self.validator_cache.cache_path != expected_path:
+            self.validator_cache = ValidatorCache(expected_path)
+        return self.validator_cache
+
+    def _get_frame_hashes(self, image_folder, image_source):
+        """获取壁纸目录对应的帧哈希记录，关闭"跳过未变化的帧"或图片源不做感知跳过时为 None"""
+        if not self.cfg.get(self.cfg.skipUnchanged):
+            self.frame_hashes = None
+            return None
+        if not skips_unchanged_frames(image_source):
+            return None
+        expected_path = os.path.join(image_folder, HASH_FILE_NAME)
+        if self.frame_hashes is None or self.frame_hashes.store_path != expected_path:
+            self.frame_hashes = FrameHashStore(expected_path)
+        self.frame_hashes.threshold = self.cfg.get(self.cfg.frameHashThreshold)
+        return self.frame_hashes
+
+    def _get_archive(self, image_folder):
+        """获取壁纸目录对应的帧归档，并应用当前的保留策略；未开启保存历史壁纸或未选择归档方式时为 None"""
+        if not self.cfg.get(self.cfg.autoSave) or self.cfg.get(self.cfg.historyBackend) != 'archive':
+            return None
+        expected_dir = os.path.join(image_folder, ARCHIVE_DIR_NAME)
+        if self.archive is None or self.archive.archive_dir != expected_dir:
+            if self.archive is not None:
+                self.archive.close()
+            self.archive = FrameArchive(expected_dir)
+            self.archive.collect_garbage()
+        # 与文件方式相同的保留策略
+        self.archive.max_age_days = self.cfg.get(self.cfg.historyMaxDays)
+        self.archive.max_count = self.cfg.get(self.cfg.historyMaxCount)
+        self.archive.max_bytes = int(self.cfg.get(self.cfg.historyMaxSize)) * 1024 * 1024
+        return self.archive
+
+    def _get_history(self, image_folder):
+        """获取壁纸目录对应的历史壁纸索引，并应用当前的保留策略"""
+        expected_path = os.path.join(image_folder, HISTORY_DB_NAME)
+        if self.history is None or self.history.db_path != expected_path:
+            if self.history is not None:
+                self.history.close()
+            self.history = WallpaperHistory(expected_path)
+        self.history.max_age_days = self.cfg.get(self.cfg.historyMaxDays)
+        self.history.max_count = self.cfg.get(self.cfg.historyMaxCount)
+        self.history.max_bytes = int(self.cfg.get(self.cfg.historyMaxSize)) * 1024 * 1024
+        return self.history
+
+    def _get_tile_cache(self, image_folder):
+        """获取壁纸目录对应的瓦片缓存，缓存大小为 0 时关闭"""
+        cache_size_mb = self.cfg.get(self.cfg.tileCacheSize)
+        if not cache_size_mb:
+            self.tile_cache = None
+            return None
+        max_bytes = int(cache_size_mb) * 1024 * 1024
+        expected_dir = os.path.join(image_folder, CACHE_DIR_NAME)
+        if self.tile_cache is None or self.tile_cache.cache_dir != expected_dir:
+            self.tile_cache = TileCache(expected_dir, max_bytes=max_bytes)
+        self.tile_cache.max_bytes = max_bytes
+        return self.tile_cache
+
+    def _make_source_resolver(self, image_source):
+        """
+        根据图片源生成 URL 解析函数。
+        Himawari 图片源先探测最新可用时次，保证第一次请求就命中已发布的图片。
+        """
+        if image_source == 'Earth-H8':
+            return lambda: get_earth_h8_img_url(self.slot_finder.find_latest_slot())
+        elif image_source == 'Earth-H8-16':
+            level = self.cfg.get(self.cfg.himawariLevel)
+            return lambda: get_earth_h8_tile_urls(level, self.slot_finder.find_latest_slot())
+        elif image_source == 'Moon-NASA':
+            return get_moon_nasa_img_url
+        elif image_source == 'Sun-NASA':
+            return get_sun_nasa_img_url
+        return None
+
+    def _get_staging(self, image_folder):
+        """获取壁纸目录对应的预取暂存区"""
+        if self.staging is None or os.path.dirname(self.staging.stage_dir) != image_folder:
+            self.staging = StagingArea(image_folder)
+        return self.staging
+
+    def _schedule_prefetch(self):
+        """在下一次定时器触发前安排预取"""
+        self.prefetch_timer.stop()
+        if not self.timer_active:
+            return
+        # 多显示器模式直接在内存中渲染，不使用预取暂存区；幻灯片模式由缓冲区加载帧
+        if self.cfg.get(self.cfg.multiMonitor) and len(QApplication.screens()) > 1:
+            return
+        if self.cfg.get(self.cfg.slideshow):
+            return
+        image_source = self.cfg.get(self.cfg.imageSource)
+        delay_ms = get_prefetch_delay_ms(image_source, self._next_tick_time)
+        if delay_ms is not None:
+            self.prefetch_timer.start(delay_ms)
+
+    def _make_prefetch_resolver(self, image_source):
+        """
+        生成下一帧的 URL 解析函数；SDO 太阳为固定 URL，由条件请求处理，不做预取。
+        解析函数返回 None 表示下一次刷新要显示的时次尚未发布，本次不预取。
+        """
+        target_time = get_prefetch_target_time(image_source, self._next_tick_time)
+        if image_source == 'Moon-NASA':
+            # 月相帧预先生成，直接取下一次刷新对应的帧
+            return lambda: get_moon_nasa_img_url(target_time)
+        elif image_source in ('Earth-H8', 'Earth-H8-16'):
+            level = self.cfg.get(self.cfg.himawariLevel)
+
+            def resolve():
+                # 预取在发布延迟结束前开始，先用一个 HEAD 请求确认目标时次已发布；
+                # 未发布时不下载瓦片，避免 404 耗尽重试次数
+                if not self.slot_finder.is_published(target_time):
+                    return None
+                if image_source == 'Earth-H8':
+                    return get_earth_h8_img_url(target_time)
+                return get_earth_h8_tile_urls(level, target_time)
+            return resolve
+        return None
+
+    def run_prefetch(self):
+        """预取下一帧到暂存区"""
+        image_folder = self.cfg.get(self.cfg.imageFolder)
+        if not image_folder:
+            return
+        if self.refresh_jobs.is_busy():
+            return
+        if self.prefetch_thread is not None and self.prefetch_thread.isRunning():
+            return
+        image_source = self.cfg.get(self.cfg.imageSource)
+        source_resolver = self._make_prefetch_resolver(image_source)
+        if source_resolver is None:
+            return
+        # 预取结果不会立即显示，不使用条件请求缓存；是否与当前壁纸相同在取出时再判断
+        spider_options = self._get_spider_options(image_folder, image_source)
+        spider_options['validator_cache'] = None
+        spider_options['frame_hashes'] = None
+        self.prefetch_thread = WallpaperPrefetchThread(source_resolver, self._get_staging(image_folder),
+                                                       spider_options=spider_options, image_source=image_source)
+        self.prefetch_thread.start()
+
+    def start_backfill(self, hours=48, level=None):
+        """
+        补抓最近 hours 小时的 Himawari 时次到壁纸目录（如断网之后），中断后再次调用会跳过已完成的时次。
+
+        :param level: Himawari 级别，为空时 Earth-H8-16 图片源使用配置的级别，其余使用 1 级
+        :return: BackfillThread，未设置壁纸目录或已有补抓在进行时为 None
+        """
+        image_folder = self.cfg.get(self.cfg.imageFolder)
+        if not image_folder:
+            return None
+        if self.backfill_thread is not None and self.backfill_thread.isRunning():
+            return None
+        image_source = self.cfg.get(self.cfg.imageSource)
+        if level is None:
+            level = self.cfg.get(self.cfg.himawariLevel) if image_source == 'Earth-H8-16' else 1
+        source = 'Earth-H8' if level == 1 else 'Earth-H8-16'
+        history = self._get_history(image_folder) if self.cfg.get(self.cfg.autoSave) else None
+        spider_options = self._get_spider_options(image_folder, source)
+
+        def make_job():
+            # 补抓范围的终点为探测到的最新可用时次，不使用可能过期的缓存或尚未发布的估算时次
+            end = self.slot_finder.find_latest_slot()
+            start = end - datetime.timedelta(hours=hours)
+            logger.info(f'开始补抓 Himawari {level}d: {start} ~ {end}')
+            return BackfillJob(start, end, level, image_folder, history=history, spider_options=spider_options)
+
+        self.backfill_thread = BackfillThread(make_job)
+        self.backfill_thread.start()
+        return self.backfill_thread
+
+    def get_circuit_states(self):
+        """各下载主机的熔断器状态 {host: {'state', 'failures', 'retry_in'}}"""
+        return self.circuit_breakers.states()
+
+    def get_mirror_stats(self):
+        """各镜像的延迟统计 {prefix: {'p50', 'p90', 'samples', 'recent_failures'}}"""
+        return {prefix: stats
+                for mirror_set in self.mirrors.mirror_sets
+                for prefix, stats in mirror_set.snapshot().items()}
+
+    def on_image_source_changed(self):
+        """
+        切换图片源：取消旧图片源的刷新任务和幻灯片（不等待线程结束），并按新图片源的发布时刻重新对齐定时器；
+        新图片源的幻灯片在下一次刷新时建立。
+        """
+        self.refresh_jobs.cancel()
+        self.stop_slideshow()
+        if self.timer_active:
+            self._schedule_next_tick()
+
+    def _on_download_finished(self, thread, success: bool, message: str):
+        """下载线程退出后回调"""
+        # 没有等待中的任务时重新启用按钮
+        self.mw.setDesktopButton.setEnabled(not self.refresh_jobs.is_busy())
+        if thread.cancelled:
+            return
+        if success and isinstance(thread, WallpaperDownloadThread):
+            # 名称中没有时次的图片源（SDO 太阳）按开始下载时所在的发布周期记录
+            slot = thread.slot_time or get_tick_slot(thread.image_source, thread.started_at)
+            self.displayed_slot = (thread.image_source, slot)
+        if not success:
+            for host, state in self.get_circuit_states().items():
+                if state['state'] != 'closed':
+                    logger.warning(f"主机 {host} 熔断中（{state['state']}），约 {state['retry_in']:.0f} 秒后重试")
         # print(success, message)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : refresh_jobs
+# @Description:
+#
+#
+from PyQt5.QtCore import QObject, pyqtSignal
+import logging
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshJobManager(QObject):
+    """
+    壁纸刷新任务的单飞队列：同一时刻只有一个下载线程在运行。
+
+    运行期间提交的任务合并为一个待执行任务（只保留最新提交的那个），当前线程真正退出后才启动，
+    两个线程不会同时写入同一个壁纸文件。取消只置位线程的 cancel_event，不在界面线程中等待线程结束；
+    线程在下一个数据块、重试等待或写出文件之前自行退出。
+    """
+
+    # (线程, 是否成功, 消息)，在线程退出后发出
+    job_finished = pyqtSignal(object, bool, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.current = None
+        self.pending = None
+        self._results = {}
+
+    def is_busy(self):
+        """是否有正在运行或等待启动的任务"""
+        return self.current is not None or self.pending is not None
+
+    def submit(self, thread):
+        """
+        提交一个尚未启动的下载线程（需有 download_finished 信号和 cancel 方法）。
+
+        :return: 是否立即启动；否则作为待执行任务，替换之前等待中的任务
+        """
+        if self.current is None:
+            self._start(thread)
+            return True
+        if self.pending is not None:
+            metrics.incr('refresh.coalesced')
+            logger.info("已有刷新任务在等待，合并为最新的一次")
+        else:
+            logger.info("上一次刷新仍在进行，本次刷新将在其结束后执行")
+        self.pending = thread
+        return False
+
+    def cancel(self):
+        """丢弃等待中的任务并通知当前线程尽快退出（不等待）"""
+        self.pending = None
+        if self.current is not None:
+            metrics.incr('refresh.cancelled')
+            logger.info("取消正在进行的刷新任务")
+            self.current.cancel()
+
+    def _start(self, thread):
+        # 连接到本对象的方法，信号在界面线程中排队执行
+        thread.download_finished.connect(self._on_job_result)
+        thread.finished.connect(self._on_job_exited)
+        self.current = thread
+        thread.start()
+
+    def _on_job_result(self, success, message):
+        self._results[self.sender()] = (success, message)
+
+    def _on_job_exited(self):
+        """线程退出后启动待执行任务，再通知结果"""
+        thread = self.sender()
+        success, message = self._results.pop(thread, (False, "刷新任务异常结束"))
+        if thread is self.current:
+            self.current = None
+        pending, self.pending = self.pending, None
+        if pending is not None:
+            self._start(pending)
+        self.job_finished.emit(thread, success, message)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : backfill
+# @Description:
+#
+#
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+
+from app.utils.metrics import metrics
+from app.utils.slot_discovery import SLOT_INTERVAL
+from app.utils.wallpaper_sources import round_down_time, get_earth_h8_img_url, get_earth_h8_tile_urls
+from app.utils.wallpaper_spider import AutoWallpaperSpider
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FILE_NAME = '.pod_backfill.json'
+
+
+def iter_slots(start, end, interval=SLOT_INTERVAL):
+    """[start, end] 范围内的所有时次（UTC），start 向上取整到时次"""
+    slot = round_down_time(start)
+    if slot < start:
+        slot += interval
+    while slot <= end:
+        yield slot
+        slot += interval
+
+
+def get_slot_source(level, slot_time):
+    """某个级别、时次的 (img_urls, img_name, img_fill, image_source)，1 级使用单张图片的 URL 模板"""
+    if level == 1:
+        return get_earth_h8_img_url(slot_time) + ('Earth-H8',)
+    return get_earth_h8_tile_urls(level, slot_time) + ('Earth-H8-16',)
+
+
+class BackfillProgress:
+    """
+    补抓进度记录，保存在输出目录下，按级别记录已完成和失败的时次（以时次文件名为键）。
+    每个时次完成后立即写回，进程中断后重新运行时跳过已完成的时次；补抓范围的终点随最新时次变化，
+    与上次范围重叠的部分仍然有效，超出当前范围的记录由 prune 清理。
+    """
+
+    def __init__(self, progress_path):
+        self.progress_path = progress_path
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._load()
+
+    @classmethod
+    def for_folder(cls, folder):
+        return cls(os.path.join(folder, PROGRESS_FILE_NAME))
+
+    def _load(self):
+        if not os.path.exists(self.progress_path):
+            return
+        try:
+            with open(self.progress_path, 'r', encoding='utf-8') as f:
+                self._jobs = json.load(f).get('jobs', {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取补抓进度失败，将重新开始: {e}")
+            self._jobs = {}
+
+    def _save(self):
+        """写回磁盘（调用方需持有锁）"""
+        temp_path = f"{self.progress_path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'jobs': self._jobs}, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.progress_path)
+        except OSError as e:
+            logger.warning(f"保存补抓进度失败: {e}")
+
+    def done(self, job_id):
+        """任务中已完成的时次名称集合"""
+        with self._lock:
+            return set(self._jobs.get(job_id, {}).get('done', []))
+
+    def mark_done(self, job_id, slot_name):
+        with self._lock:
+            job = self._jobs.setdefault(job_id, {'done': [], 'failed': {}})
+            if slot_name not in job['done']:
+                job['done'].append(slot_name)
+            job['failed'].pop(slot_name, None)
+            self._save()
+
+    def mark_failed(self, job_id, slot_name, error):
+        with self._lock:
+            job = self._jobs.setdefault(job_id, {'done': [], 'failed': {}})
+            job['failed'][slot_name] = str(error)
+            self._save()
+
+    def failed(self, job_id):
+        """任务中失败的时次 {名称: 错误信息}"""
+        with self._lock:
+            return dict(self._jobs.get(job_id, {}).get('failed', {}))
+
+    def prune(self, job_id, slot_names):
+        """
+        只保留 slot_names 中的时次记录，丢弃已滑出补抓范围的时次，避免进度文件无限增长。
+
+        :return: 丢弃的记录数
+        """
+        slot_names = set(slot_names)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return 0
+            done = [name for name in job['done'] if name in slot_names]
+            failed = {name: error for name, error in job['failed'].items() if name in slot_names}
+            pruned = len(job['done']) - len(done) + len(job['failed']) - len(failed)
+            if pruned:
+                job['done'], job['failed'] = done, failed
+                self._save()
+        return pruned
+
+
+class BackfillJob:
+    """
+    Himawari 历史时次补抓：枚举时间范围内的时次，用有限的线程池并发下载合成，进度持久化，可中断续传。
+
+    每个时次由一个 AutoWallpaperSpider 下载（瓦片级并发由 spider_options 的 max_workers 控制），
+    只生成文件，不设置壁纸。已完成、或输出目录中已存在的时次直接跳过；失败的时次在下次运行时重试。
+    """
+
+    def __init__(self, start, end, level, output_dir, max_jobs=2, spider_options=None, history=None,
+                 progress=None, on_progress=None):
+        """
+        :param start: 起始时间（UTC，含）
+        :param end: 结束时间（UTC，含）
+        :param level: Himawari 级别，1 为单张图片，其余见 HIMAWARI_LEVELS
+        :param output_dir: 输出目录
+        :param max_jobs: 同时处理的时次数
+        :param spider_options: 传给 AutoWallpaperSpider 的共享资源和下载配置
+        :param history: WallpaperHistory 实例，补抓的帧写入历史索引
+        :param progress: BackfillProgress 实例，为空时使用输出目录下的进度文件
+        :param on_progress: 每个时次结束后调用 on_progress(report)，report 见 report()
+        """
+        if end < start:
+            raise ValueError(f"补抓时间范围无效: {start} ~ {end}")
+        self.start = start
+        self.end = end
+        self.level = level
+        self.output_dir = output_dir
+        self.max_jobs = max_jobs
+        self.spider_options = dict(spider_options or {})
+        # 补抓的帧保留原始分辨率，不做缩小、增强和感知哈希跳过；固定 URL 的条件请求也不适用
+        for key in ('stages', 'screen_size', 'resize_mode', 'render_to_memory', 'frame_hashes', 'fill_screen',
+                    'archive'):
+            self.spider_options.pop(key, None)
+        self.spider_options['validator_cache'] = None
+        self.history = history
+        self.progress = progress if progress is not None else BackfillProgress.for_folder(output_dir)
+        self.on_progress = on_progress
+        # 进度按级别记录：范围的终点每次运行都会变化，以范围为键的记录永远无法复用
+        self.job_id = f"{level}d"
+        os.makedirs(output_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats = {'total': 0, 'done': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+        self._started_at = None
+
+    def _slot_name(self, slot_time):
+        """时次对应的输出文件名，扩展名随编码器调整"""
+        img_name = get_slot_source(self.level, slot_time)[1]
+        encoder = self.spider_options.get('encoder')
+        return encoder.apply_extension(img_name) if encoder is not None else img_name
+
+    def pending_slots(self):
+        """需要下载的时次：未完成，且输出目录中没有同名文件"""
+        done = self.progress.done(self.job_id)
+        pending = []
+        for slot_time in iter_slots(self.start, self.end):
+            img_name = self._slot_name(slot_time)
+            if img_name in done or os.path.exists(os.path.join(self.output_dir, img_name)):
+                continue
+            pending.append(slot_time)
+        return pending
+
+    def report(self):
+        """
+        当前进度和吞吐量。
+
+        :return: {'total', 'done', 'skipped', 'failed', 'bytes', 'elapsed', 'slots_per_minute', 'mb_per_second'}
+        """
+        with self._lock:
+            report = dict(self._stats)
+        elapsed = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+        report['elapsed'] = elapsed
+        report['slots_per_minute'] = report['done'] / elapsed * 60 if elapsed > 0 else 0.0
+        report['mb_per_second'] = report['bytes'] / 1024 / 1024 / elapsed if elapsed > 0 else 0.0
+        return report
+
+    def _run_slot(self, slot_time, cancel_event):
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        img_urls, img_name, img_fill, image_source = get_slot_source(self.level, slot_time)
+        started = time.monotonic()
+        # img_fill 决定是否按瓦片合成；补抓的帧不填充到屏幕
+        spider = AutoWallpaperSpider(img_urls, img_name, self.output_dir, img_fill, fill_screen=False,
+                                     **self.spider_options)
+        spider.prepare()
+        size = os.path.getsize(spider.wallpaper_path)
+        metrics.observe('backfill.slot', time.monotonic() - started)
+        metrics.incr('backfill.bytes', size)
+        if self.history is not None:
+            try:
+                self.history.add(image_source, spider.wallpaper_path, slot_time=slot_time)
+            except Exception as e:
+                logger.warning(f"补抓的帧写入历史索引失败: {e}")
+        return size
+
+    def run(self, cancel_event=None):
+        """
+        执行补抓，直到全部时次结束或 cancel_event 被置位（已开始的时次会完成）。
+
+        :return: 最终的 report()
+        """
+        all_slots = list(iter_slots(self.start, self.end))
+        self.progress.prune(self.job_id, [self._slot_name(slot_time) for slot_time in all_slots])
+        pending = self.pending_slots()
+        with self._lock:
+            self._stats.update(total=len(all_slots), skipped=len(all_slots) - len(pending))
+        self._started_at = time.monotonic()
+        logger.info(f"开始补抓 {self.job_id} {self.start} ~ {self.end}: "
+                    f"共 {len(all_slots)} 个时次，待下载 {len(pending)} 个")
+
+        with ThreadPoolExecutor(max_workers=self.max_jobs) as executor:
+            futures = {executor.submit(self._run_slot, slot_time, cancel_event): slot_time for slot_time in pending}
+            for future in as_completed(futures):
+                slot_time = futures[future]
+                slot_name = self._slot_name(slot_time)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 例如维护时段（每天 02:40、14:40 UTC 左右）没有发布的时次
+                    logger.warning(f"补抓时次 {slot_time} 失败: {e}")
+                    self.progress.mark_failed(self.job_id, slot_name, e)
+                    with self._lock:
+                        self._stats['failed'] += 1
+                    metrics.incr('backfill.failed_slots')
+                else:
+                    if result is None:
+                        continue
+                    self.progress.mark_done(self.job_id, slot_name)
+                    with self._lock:
+                        self._stats['done'] += 1
+                        self._stats['bytes'] += result
+                report = self.report()
+                logger.info(f"补抓进度 {report['done'] + report['skipped'] + report['failed']}/{report['total']}，"
+                            f"{report['slots_per_minute']:.1f} 帧/分钟，{report['mb_per_second']:.2f} MB/s")
+                if self.on_progress is not None:
+                    self.on_progress(report)
+
+        report = self.report()
+        logger.info(f"补抓结束 {self.job_id} {self.start} ~ {self.end}: 完成 {report['done']}，跳过 {report['skipped']}，"
+                    f"失败 {report['failed']}，用时 {report['elapsed']:.0f} 秒")
+        return report
+
+
+if __name__ == '__main__':
+    # 补抓最近 N 小时：python -m app.utils.backfill <输出目录> [小时数] [级别]
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    output_dir = sys.argv[1]
+    hours = int(sys.argv[2]) if len(sys.argv) > 2 else 48
+    level = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    end_time = round_down_time(datetime.datetime.utcnow() - datetime.timedelta(minutes=30))
+    job = BackfillJob(end_time - datetime.timedelta(hours=hours), end_time, level, output_dir)
+    print(job.run())
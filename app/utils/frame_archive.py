@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : frame_archive
+# @Description:
+#
+#
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import logging
+
+from app.utils.tile_grid import TileGridComposer
+from app.utils.wallpaper_history import parse_history_name
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR_NAME = '.pod_archive'
+INDEX_FILE_NAME = 'index.sqlite3'
+OBJECTS_DIR_NAME = 'objects'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frames (
+    source TEXT NOT NULL,
+    slot_time INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    grid_rows INTEGER NOT NULL,
+    grid_cols INTEGER NOT NULL,
+    tile_size INTEGER NOT NULL,
+    blobs TEXT NOT NULL,
+    flat_size INTEGER NOT NULL,
+    PRIMARY KEY (source, slot_time)
+);
+CREATE INDEX IF NOT EXISTS frames_slot_time ON frames (slot_time);
+CREATE INDEX IF NOT EXISTS frames_name ON frames (name);
+"""
+
+
+class FrameArchive:
+    """
+    去重的帧归档：下载的原始瓦片/图片按内容哈希（SHA-256）保存一次，帧只记录由哪些内容块组成。
+
+    字节完全相同的内容只保存一份——SDO 太阳图片在两次更新之间、Himawari 高级别中纯黑的太空角落瓦片
+    在每个时次都完全相同。需要时按索引把瓦片重新合成为完整分辨率的帧，或原样取出单张图片。
+    """
+
+    def __init__(self, archive_dir, gc_grace_seconds=3600, max_age_days=0, max_count=0, max_bytes=0,
+                 evict_batch=100):
+        """
+        :param archive_dir: 归档目录
+        :param gc_grace_seconds: 没有被任何帧引用的内容块保留的秒数，避免清理正在下载中的帧的瓦片
+        :param max_age_days: 按时次保留的天数，0 表示不限（与 WallpaperHistory 相同的保留策略）
+        :param max_count: 最多保留的帧数，0 表示不限
+        :param max_bytes: 内容块最多占用的字节数（去重后），0 表示不限
+        :param evict_batch: 每次淘汰最多删除的帧数
+        """
+        self.archive_dir = archive_dir
+        self.objects_dir = os.path.join(archive_dir, OBJECTS_DIR_NAME)
+        self.gc_grace_seconds = gc_grace_seconds
+        self.max_age_days = max_age_days
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.evict_batch = evict_batch
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        # 由下载线程和预取线程共用，所有访问都在锁内进行
+        self._conn = sqlite3.connect(os.path.join(archive_dir, INDEX_FILE_NAME), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def for_folder(cls, folder, **kwargs):
+        """在壁纸目录下创建/加载归档"""
+        return cls(os.path.join(folder, ARCHIVE_DIR_NAME), **kwargs)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _blob_path(self, blob_hash):
+        return os.path.join(self.objects_dir, blob_hash[:2], blob_hash)
+
+    def put(self, source):
+        """
+        保存一个内容块，已存在相同内容时不再写入。
+
+        :param source: 文件路径或 BytesIO（如内存模式下的瓦片）
+        :return: 内容哈希
+        """
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                data = f.read()
+        else:
+            data = source.getbuffer()
+        blob_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(blob_hash)
+        with self._lock, self._conn:
+            exists = self._conn.execute('SELECT 1 FROM blobs WHERE hash = ?', (blob_hash,)).fetchone()
+            if exists and os.path.exists(path):
+                # 刷新时间，正在下载的帧复用的内容块在宽限期内不会因旧帧被淘汰而删除
+                self._conn.execute('UPDATE blobs SET created = ? WHERE hash = ?', (time.time(), blob_hash))
+                return blob_hash
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO blobs (hash, size, created) VALUES (?, ?, ?)',
+                               (blob_hash, len(data), time.time()))
+        return blob_hash
+
+    def add_frame(self, name, source, blobs, grid=(1, 1, 0), flat_size=0, slot_time=None):
+        """
+        记录一帧，按 (图片源, 时次) 区分；同一图片源、同一时次的帧已存在时用新的内容更新。
+        记录后按保留策略淘汰最旧的帧（不会淘汰刚记录的这一帧）。
+
+        SDO 太阳等名称固定的图片源按记录时间区分，每次更新都是新的一帧。
+
+        :param name: 帧名称（图片源给出的文件名，如 himawari8_4x4_2026_10_18_08_00.png）
+        :param source: 图片源名称
+        :param blobs: 按行优先顺序排列的内容哈希；单张图片为一个
+        :param grid: (行数, 列数, 瓦片边长)，单张图片为 (1, 1, 0)
+        :param flat_size: 按独立文件保存时该帧占用的字节数，用于统计节省的空间
+        :param slot_time: 图片时次（UTC），为空时从名称解析，仍无法确定时使用当前时间
+        """
+        if slot_time is None:
+            parsed = parse_history_name(name)
+            slot_time = parsed[1] if parsed is not None else datetime.datetime.utcnow()
+        timestamp = int(slot_time.replace(tzinfo=datetime.timezone.utc).timestamp())
+        rows, cols, tile_size = grid
+        blobs_text = json.dumps(list(blobs))
+        with self._lock, self._conn:
+            existing = self._conn.execute('SELECT blobs FROM frames WHERE source = ? AND slot_time = ?',
+                                          (source, timestamp)).fetchone()
+            if existing is not None:
+                if existing['blobs'] == blobs_text:
+                    return
+                logger.info(f"归档中已有 {source} {slot_time:%Y-%m-%d %H:%M} 的帧，用新内容更新: {name}")
+            self._conn.execute(
+                'INSERT OR REPLACE INTO frames (source, slot_time, name, grid_rows, grid_cols, tile_size, blobs, flat_size) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (source, timestamp, name, rows, cols, tile_size, blobs_text, flat_size))
+        self.evict(protect=(source, timestamp))
+
+    def _find_frame(self, name, slot_time=None):
+        """名称对应的帧；同名的帧有多个时（如 sun.jpg）取指定时次的，未指定时取最新的一帧（调用方需持有锁）"""
+        sql = 'SELECT * FROM frames WHERE name = ?'
+        params = [name]
+        if slot_time is not None:
+            sql += ' AND slot_time = ?'
+            params.append(int(slot_time.replace(tzinfo=datetime.timezone.utc).timestamp()))
+        sql += ' ORDER BY slot_time DESC LIMIT 1'
+        return self._conn.execute(sql, params).fetchone()
+
+    def has_frame(self, name, slot_time=None):
+        with self._lock:
+            return self._find_frame(name, slot_time) is not None
+
+    def restore(self, name, output_path, slot_time=None):
+        """
+        还原一帧：单张图片原样写出；瓦片按条带重新合成为完整分辨率的 PNG。
+
+        :param slot_time: 同名的帧有多个时指定时次（UTC），为空时还原最新的一帧
+        :return: output_path
+        """
+        with self._lock:
+            row = self._find_frame(name, slot_time)
+        if row is None:
+            raise KeyError(f"归档中没有该帧: {name}")
+        blob_paths = [self._blob_path(blob_hash) for blob_hash in json.loads(row['blobs'])]
+        temp_path = f"{output_path}.part"
+        try:
+            if len(blob_paths) == 1:
+                shutil.copyfile(blob_paths[0], temp_path)
+            else:
+                composer = TileGridComposer(row['grid_rows'], row['grid_cols'], row['tile_size'])
+                composer.compose_to_png(blob_paths, temp_path)
+            os.replace(temp_path, output_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return output_path
+
+    def _eviction_candidates(self, protect):
+        """按保留策略需要淘汰的最旧的帧（最多 evict_batch 个），调用方需持有锁"""
+        batch = self.evict_batch
+        source, timestamp = protect
+        where = 'NOT (source = ? AND slot_time = ?)'
+        if self.max_age_days:
+            cutoff = time.time() - self.max_age_days * 86400
+            rows = self._conn.execute(f'SELECT rowid, blobs FROM frames WHERE slot_time < ? AND {where} '
+                                      'ORDER BY slot_time LIMIT ?', (cutoff, source, timestamp, batch)).fetchall()
+            if rows:
+                return rows
+        count = self._conn.execute('SELECT COUNT(*) FROM frames').fetchone()[0]
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+        excess_count = count - self.max_count if self.max_count else 0
+        excess_bytes = total - self.max_bytes if self.max_bytes else 0
+        if excess_count <= 0 and excess_bytes <= 0:
+            return []
+        rows = self._conn.execute(f'SELECT rowid, blobs FROM frames WHERE {where} ORDER BY slot_time LIMIT ?',
+                                  (source, timestamp, batch)).fetchall()
+        selected = []
+        counted = set()
+        for row in rows:
+            if excess_count <= 0 and excess_bytes <= 0:
+                break
+            selected.append(row)
+            excess_count -= 1
+            # 内容块可能被较新的帧共用，这里按上限估算；不足的部分留给下一次淘汰
+            for blob_hash in set(json.loads(row['blobs'])) - counted:
+                counted.add(blob_hash)
+                size = self._conn.execute('SELECT size FROM blobs WHERE hash = ?', (blob_hash,)).fetchone()
+                excess_bytes -= size[0] if size is not None else 0
+        return selected
+
+    def evict(self, protect=(None, None)):
+        """
+        按保留策略淘汰一批最旧的帧，再删除它们不再被引用的内容块。
+
+        :param protect: 不淘汰的帧 (图片源, 时次秒数)，如刚记录的帧
+        :return: 淘汰的帧数
+        """
+        with self._lock:
+            rows = self._eviction_candidates(protect)
+            if not rows:
+                return 0
+            with self._conn:
+                self._conn.executemany('DELETE FROM frames WHERE rowid = ?', [(row['rowid'],) for row in rows])
+            # 同时清理之前淘汰时还在宽限期内的内容块
+            removed = self._remove_unreferenced()
+        logger.info(f"已淘汰 {len(rows)} 帧归档，删除 {removed} 个内容块")
+        return len(rows)
+
+    def _remove_unreferenced(self):
+        """删除不被任何帧引用、且超过宽限期的内容块，返回删除的个数（调用方需持有锁）"""
+        referenced = set()
+        for (blobs,) in self._conn.execute('SELECT blobs FROM frames'):
+            referenced.update(json.loads(blobs))
+        cutoff = time.time() - self.gc_grace_seconds
+        orphans = [blob_hash for (blob_hash,) in
+                   self._conn.execute('SELECT hash FROM blobs WHERE created < ?', (cutoff,))
+                   if blob_hash not in referenced]
+        for blob_hash in orphans:
+            try:
+                os.remove(self._blob_path(blob_hash))
+            except FileNotFoundError:
+                pass
+        with self._conn:
+            self._conn.executemany('DELETE FROM blobs WHERE hash = ?', [(blob_hash,) for blob_hash in orphans])
+        return len(orphans)
+
+    def collect_garbage(self):
+        """
+        删除不被任何帧引用、且超过保留时间的内容块（帧下载失败时已写入的瓦片、淘汰时仍在宽限期内的内容块）。
+
+        :return: 删除的内容块数
+        """
+        with self._lock:
+            removed = self._remove_unreferenced()
+        if removed:
+            logger.info(f"已清理 {removed} 个未引用的归档内容块")
+        return removed
+
+    def stats(self):
+        """
+        归档占用与按独立文件保存的对比。
+
+        :return: {'frames', 'blobs', 'referenced_bytes'（各帧内容块之和，去重前）, 'stored_bytes'（去重后）,
+                  'flat_bytes'（按独立文件保存的总大小）, 'saved_bytes', 'saved_ratio'}
+        """
+        with self._lock:
+            sizes = dict(self._conn.execute('SELECT hash, size FROM blobs').fetchall())
+            frames = self._conn.execute('SELECT blobs, flat_size FROM frames').fetchall()
+        referenced_bytes = 0
+        flat_bytes = 0
+        for row in frames:
+            blob_bytes = sum(sizes.get(blob_hash, 0) for blob_hash in json.loads(row['blobs']))
+            referenced_bytes += blob_bytes
+            flat_bytes += row['flat_size'] or blob_bytes
+        stored_bytes = sum(sizes.values())
+        saved_bytes = flat_bytes - stored_bytes
+        return {
+            'frames': len(frames),
+            'blobs': len(sizes),
+            'referenced_bytes': referenced_bytes,
+            'stored_bytes': stored_bytes,
+            'flat_bytes': flat_bytes,
+            'saved_bytes': saved_bytes,
+            'saved_ratio': saved_bytes / flat_bytes if flat_bytes else 0.0,
+        }
+
+
+if __name__ == '__main__':
+    # 统计壁纸目录下归档节省的空间：python -m app.utils.frame_archive <壁纸目录>
+    import sys
+
+    archive = FrameArchive.for_folder(sys.argv[1])
+    report = archive.stats()
+    mb = 1024 * 1024
+    print(f"帧数: {report['frames']}，内容块: {report['blobs']}")
+    print(f"按独立文件保存: {report['flat_bytes'] / mb:.1f} MB")
+    print(f"去重前的原始内容: {report['referenced_bytes'] / mb:.1f} MB")
+    print(f"归档实际占用: {report['stored_bytes'] / mb:.1f} MB")
+    print(f"节省: {report['saved_bytes'] / mb:.1f} MB ({report['saved_ratio']:.1%})")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : frame_hash
+# @Description:
+#
+#
+import json
+import os
+import threading
+import logging
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+HASH_FILE_NAME = '.pod_frame_hash.json'
+
+
+class FrameHash:
+    """
+    帧的感知哈希：差值哈希（dHash）加平均颜色。
+
+    dHash 只反映明暗结构，纯色或大面积平坦的图像（如夜间的 Himawari）哈希都接近 0，
+    因此同时比较平均颜色，避免把颜色不同的两帧当成同一帧。
+    """
+
+    def __init__(self, bits, mean):
+        self.bits = bits
+        self.mean = tuple(mean)
+
+    def __repr__(self):
+        return f"FrameHash({self.bits:016x}, mean={self.mean})"
+
+    def distance(self, other):
+        """(dHash 汉明距离, 平均颜色各通道的最大差值)"""
+        return bin(self.bits ^ other.bits).count('1'), max(abs(a - b) for a, b in zip(self.mean, other.mean))
+
+    def to_dict(self):
+        return {'hash': f'{self.bits:016x}', 'mean': list(self.mean)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(int(data['hash'], 16), data['mean'])
+
+
+def dhash(img, hash_size=8):
+    """
+    计算帧哈希：缩小到 (hash_size+1)×hash_size，比较每行相邻像素的明暗，得到 hash_size² 位的整数。
+    外观相同的帧哈希相同或只差几位，与编码格式和轻微噪声无关。
+    """
+    small = img.convert('RGB') if img.mode != 'RGB' else img
+    small = small.resize((hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0)
+    gray = small.convert('L').tobytes()
+    rgb = small.tobytes()
+    small.close()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (gray[offset + col] > gray[offset + col + 1])
+    count = len(rgb) // 3
+    mean = [round(sum(rgb[channel::3]) / count) for channel in range(3)]
+    return FrameHash(bits, mean)
+
+
+def dhash_file(path, hash_size=8):
+    """计算图片文件的帧哈希；JPEG 使用草稿模式按 1/8 解码"""
+    with Image.open(path) as img:
+        img.draft('RGB', (hash_size * 8, hash_size * 8))
+        return dhash(img, hash_size)
+
+
+class FrameHashStore:
+    """
+    记录当前壁纸的路径和感知哈希，保存在壁纸目录下。
+
+    新帧与当前壁纸的哈希距离在阈值内时（如变化很慢的月相和太阳），
+    跳过编码写出和系统壁纸调用，避免桌面无意义的重绘和闪烁。
+    """
+
+    def __init__(self, store_path, threshold=2, color_threshold=8):
+        """
+        :param store_path: 记录文件路径（JSON）
+        :param threshold: dHash 汉明距离不超过该值视为同一帧（64 位哈希）
+        :param color_threshold: 平均颜色各通道差值不超过该值（0~255）
+        """
+        self.store_path = store_path
+        self.threshold = threshold
+        self.color_threshold = color_threshold
+        self._lock = threading.Lock()
+        self._current = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.store_path):
+            return
+        try:
+            with open(self.store_path, 'r', encoding='utf-8') as f:
+                self._current = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取帧哈希记录失败，将忽略: {e}")
+            self._current = {}
+
+    def is_unchanged(self, frame_hash):
+        """
+        新帧是否与当前壁纸相同。
+
+        :return: 相同则返回当前壁纸路径，否则返回 None
+        """
+        with self._lock:
+            current = dict(self._current)
+        path = current.get('path')
+        if not path or 'hash' not in current or not os.path.exists(path):
+            return None
+        try:
+            distance, color_distance = FrameHash.from_dict(current).distance(frame_hash)
+        except (KeyError, TypeError, ValueError):
+            return None
+        if distance > self.threshold or color_distance > self.color_threshold:
+            return None
+        logger.info(f"新帧与当前壁纸的哈希距离为 {distance}、颜色差 {color_distance}，视为未变化")
+        return path
+
+    def update(self, wallpaper_path, frame_hash):
+        """
+        壁纸设置成功后记录当前壁纸。
+
+        :param frame_hash: 当前壁纸的 FrameHash；为 None（未计算）时只记录路径，下一帧一定会被设置
+        """
+        with self._lock:
+            self._current = {'path': wallpaper_path}
+            if frame_hash is not None:
+                self._current.update(frame_hash.to_dict())
+            data = dict(self._current)
+        temp_path = f"{self.store_path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.store_path)
+        except OSError as e:
+            logger.warning(f"保存帧哈希记录失败: {e}")
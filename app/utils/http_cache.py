@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : http_cache
+# @Description:
+#
+#
+import json
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE_NAME = '.pod_http_cache.json'
+
+
+class ValidatorCache:
+    """
+    HTTP 校验器缓存：按 URL 保存 ETag / Last-Modified，用于发送条件请求。
+
+    同时记录上一次成功设置为壁纸的 URL 列表和文件路径，
+    只有当前壁纸确实来自同一组 URL 时才发送条件请求，
+    否则 304 响应会让我们误以为屏幕上的图片是最新的。
+    """
+
+    def __init__(self, cache_path):
+        """
+        :param cache_path: 缓存文件路径（JSON）
+        """
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._validators = {}
+        self._current = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._validators = data.get('validators', {})
+            self._current = data.get('current', {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取 HTTP 校验器缓存失败，将忽略旧缓存: {e}")
+            self._validators = {}
+            self._current = {}
+
+    def save(self):
+        """写回磁盘（先写临时文件再替换，避免中途退出损坏缓存）"""
+        with self._lock:
+            data = {'validators': self._validators, 'current': self._current}
+        temp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"保存 HTTP 校验器缓存失败: {e}")
+
+    def is_current(self, urls, wallpaper_path):
+        """当前壁纸文件是否由这组 URL 生成且仍然存在"""
+        with self._lock:
+            current = dict(self._current)
+        return (current.get('urls') == list(urls)
+                and current.get('path') == wallpaper_path
+                and os.path.exists(wallpaper_path))
+
+    def conditional_headers(self, url):
+        """根据已保存的校验器生成 If-None-Match / If-Modified-Since 请求头"""
+        with self._lock:
+            entry = self._validators.get(url) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    @staticmethod
+    def extract(response):
+        """从响应中提取校验器，没有校验器时返回 None"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return None
+        return {'etag': etag, 'last_modified': last_modified}
+
+    def commit(self, urls, wallpaper_path, validators):
+        """
+        壁纸设置成功后记录本次结果。
+        条件请求只针对当前壁纸的 URL，不属于本次 URL 列表的校验器不再有用，一并删除。
+
+        :param urls: 本次使用的 URL 列表
+        :param wallpaper_path: 最终壁纸路径
+        :param validators: {url: {'etag': ..., 'last_modified': ...}}
+        """
+        with self._lock:
+            kept = {url: self._validators[url] for url in urls if url in self._validators}
+            for url, entry in validators.items():
+                if url not in urls:
+                    continue
+                if entry:
+                    kept[url] = entry
+                else:
+                    kept.pop(url, None)
+            self._validators = kept
+            self._current = {'urls': list(urls), 'path': wallpaper_path}
+        self.save()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : http_session
+# @Description:
+#
+#
+import requests
+from requests.adapters import HTTPAdapter
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 每个主机保留的最大连接数，与 4x4 瓦片数量一致
+DEFAULT_POOL_SIZE = 16
+
+
+def create_http_session(pool_size=DEFAULT_POOL_SIZE):
+    """
+    创建长期复用的 HTTP 会话。
+
+    会话在多个瓦片以及多次定时刷新之间共享，保持 keep-alive 连接并复用 TLS 会话，
+    避免每次下载都重新建立 TCP 连接和 TLS 握手。
+
+    :param pool_size: 每个主机的连接池大小，通常等于单次刷新的瓦片数量
+    :return: requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,  # 缓存的主机连接池数量（NICT、NASA 等）
+        pool_maxsize=pool_size,  # 每个主机的最大连接数
+        pool_block=False
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    logger.info(f"已创建共享 HTTP 会话，连接池大小: {pool_size}")
+    return session
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : image_encoder
+# @Description:
+#
+#
+import io
+import os
+import time
+import logging
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# 输出格式：PNG（可调压缩级别）、JPEG / WebP（可调质量）、无损 WebP
+OUTPUT_FORMATS = ['png', 'jpeg', 'webp', 'webp_lossless']
+
+FORMAT_EXTENSIONS = {
+    'png': '.png',
+    'jpeg': '.jpg',
+    'webp': '.webp',
+    'webp_lossless': '.webp',
+}
+
+# Pillow 的格式名称
+PIL_FORMATS = {
+    'png': 'PNG',
+    'jpeg': 'JPEG',
+    'webp': 'WEBP',
+    'webp_lossless': 'WEBP',
+}
+
+
+class ImageEncoder:
+    """
+    最终壁纸的编码器。
+
+    默认 PNG 压缩级别下合成图的编码是整条流水线中最慢的步骤之一，
+    可按图片源选择更快的压缩级别或有损格式。
+    """
+
+    def __init__(self, output_format='png', quality=90, png_compress_level=6):
+        """
+        :param output_format: OUTPUT_FORMATS 之一
+        :param quality: JPEG / WebP 质量 1~100
+        :param png_compress_level: PNG 压缩级别 0~9，越低越快、文件越大
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        self.output_format = output_format
+        self.quality = quality
+        self.png_compress_level = png_compress_level
+
+    @classmethod
+    def for_name(cls, img_name, **kwargs):
+        """按图片名的扩展名选择格式（未配置编码器时保持原有输出格式）"""
+        ext = os.path.splitext(img_name)[1].lower()
+        output_format = 'jpeg' if ext in ('.jpg', '.jpeg') else 'webp' if ext == '.webp' else 'png'
+        return cls(output_format, **kwargs)
+
+    @property
+    def extension(self):
+        return FORMAT_EXTENSIONS[self.output_format]
+
+    @property
+    def pil_format(self):
+        return PIL_FORMATS[self.output_format]
+
+    def __repr__(self):
+        if self.output_format == 'png':
+            return f"png(level={self.png_compress_level})"
+        if self.output_format == 'webp_lossless':
+            return "webp(lossless)"
+        return f"{self.output_format}(q={self.quality})"
+
+    def apply_extension(self, img_name):
+        """将图片名的扩展名替换为输出格式对应的扩展名"""
+        return os.path.splitext(img_name)[0] + self.extension
+
+    def matches(self, pil_format):
+        """
+        已有图片（如下载的单张图片）是否已经是输出格式，是则可以直接使用，无需重新编码。
+
+        :param pil_format: Image.format，如 'PNG'、'JPEG'
+        """
+        return pil_format == self.pil_format
+
+    def save_options(self):
+        """传给 Image.save 的参数"""
+        if self.output_format == 'png':
+            return {'compress_level': self.png_compress_level}
+        if self.output_format == 'jpeg':
+            return {'quality': self.quality, 'optimize': False}
+        if self.output_format == 'webp':
+            return {'quality': self.quality, 'method': 4}
+        return {'lossless': True, 'quality': self.quality, 'method': 4}
+
+    def _prepare(self, img):
+        # JPEG 不支持透明通道和调色板
+        if self.output_format == 'jpeg' and img.mode not in ('RGB', 'L'):
+            return img.convert('RGB')
+        return img
+
+    def save(self, img, fp):
+        """编码写入文件路径或文件对象"""
+        prepared = self._prepare(img)
+        try:
+            prepared.save(fp, format=self.pil_format, **self.save_options())
+        finally:
+            if prepared is not img:
+                prepared.close()
+
+    def encode(self, img, path):
+        """
+        编码写出最终图像：先写入临时文件再替换，避免中途失败留下不完整的壁纸。
+        """
+        temp_path = path + '.part'
+        try:
+            self.save(img, temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+def benchmark_encoders(img, encoders, repeat=1):
+    """
+    比较各编码器的耗时和文件大小。
+
+    :param img: 待编码的图像
+    :param encoders: ImageEncoder 列表
+    :param repeat: 每个编码器重复次数，取最短耗时
+    :return: [(encoder, 秒, 字节数)]
+    """
+    results = []
+    for encoder in encoders:
+        best = None
+        size = 0
+        for _ in range(repeat):
+            buffer = io.BytesIO()
+            started = time.perf_counter()
+            encoder.save(img, buffer)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            size = buffer.tell()
+        results.append((encoder, best, size))
+    return results
+
+
+BENCHMARK_ENCODERS = [
+    ImageEncoder('png', png_compress_level=1),
+    ImageEncoder('png', png_compress_level=6),
+    ImageEncoder('png', png_compress_level=9),
+    ImageEncoder('jpeg', quality=85),
+    ImageEncoder('jpeg', quality=95),
+    ImageEncoder('webp', quality=85),
+    ImageEncoder('webp_lossless'),
+]
+
+
+if __name__ == '__main__':
+    # 基准测试：下载各图片源的当前图片，比较各编码器的耗时和文件大小
+    import tempfile
+
+    from app.utils.wallpaper_spider import AutoWallpaperSpider
+    from app.utils.wallpaper_sources import (
+        get_earth_h8_img_url,
+        get_earth_h8_4x4_img_urls,
+        get_moon_nasa_img_url,
+        get_sun_nasa_img_url,
+        get_source_stages,
+    )
+
+    sources = {
+        'Earth-H8': get_earth_h8_img_url,
+        'Earth-H8-16': get_earth_h8_4x4_img_urls,
+        'Moon-NASA': get_moon_nasa_img_url,
+        'Sun-NASA': get_sun_nasa_img_url,
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        for source, get_urls in sources.items():
+            img_urls, img_name, img_fill = get_urls()
+            spider = AutoWallpaperSpider(img_urls, img_name, work_dir, img_fill, stages=get_source_stages(source),
+                                         encoder=ImageEncoder('png', png_compress_level=1))
+            try:
+                spider.prepare()
+            except Exception as e:
+                print(f"{source}: 下载失败，跳过 ({e})")
+                continue
+            with Image.open(spider.wallpaper_path) as source_img:
+                source_img.load()
+                print(f"\n{source} {source_img.size[0]}x{source_img.size[1]}")
+                for encoder, seconds, size in benchmark_encoders(source_img, BENCHMARK_ENCODERS, repeat=3):
+                    print(f"  {str(encoder):<18} {seconds * 1000:8.1f} ms  {size / 1024:9.1f} KB")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : image_enhance
+# @Description:
+#
+#
+import logging
+
+from PIL import Image
+
+from app.utils.image_pipeline import ImageStage
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+    logger.info("未找到 numpy 模块，图像增强阶段不可用。")
+
+# ITU-R BT.601 亮度权重
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+def is_enhance_available():
+    """图像增强依赖 numpy，未安装时不可用"""
+    return np is not None
+
+
+class EnhanceStage(ImageStage):
+    """
+    Himawari 图像增强：自动色阶（只统计地球圆盘内的像素）、伽马校正和饱和度调整。
+
+    圆盘掩膜和色阶统计用 numpy 在采样数组上一次算出；色阶和伽马合并为一张 256 项查找表，
+    由 Image.point 在 C 层映射，饱和度用 Image.blend 向灰度图外插，全程没有逐像素的 Python 循环。
+    """
+
+    name = 'enhance'
+    order = 20
+
+    def __init__(self, gamma=1.0, saturation=1.0, auto_levels=True, low_percentile=0.5, high_percentile=99.5,
+                 disk_radius=0.49, sample_step=4):
+        """
+        :param gamma: 伽马值，大于 1 提亮暗部
+        :param saturation: 饱和度倍数，1 为不变
+        :param auto_levels: 是否按百分位自动拉伸色阶
+        :param low_percentile: 映射为黑色的亮度百分位
+        :param high_percentile: 映射为白色的亮度百分位
+        :param disk_radius: 地球圆盘半径占图像短边的比例，统计色阶时排除圆盘外的太空背景；为 None 时统计整幅图像
+        :param sample_step: 统计色阶时的采样步长，每 sample_step×sample_step 个像素取一个
+        """
+        if np is None:
+            raise RuntimeError("图像增强需要 numpy，请先安装 numpy。")
+        self.gamma = gamma
+        self.saturation = saturation
+        self.auto_levels = auto_levels
+        self.low_percentile = low_percentile
+        self.high_percentile = high_percentile
+        self.disk_radius = disk_radius
+        self.sample_step = sample_step
+
+    def applies_to(self, size):
+        return self.auto_levels or self.gamma != 1.0 or self.saturation != 1.0
+
+    def _disk_mask(self, height, width):
+        """采样网格上的地球圆盘掩膜"""
+        step = self.sample_step
+        radius = self.disk_radius * min(width, height)
+        ys = (np.arange(0, height, step, dtype=np.float32) - (height - 1) / 2) ** 2
+        xs = (np.arange(0, width, step, dtype=np.float32) - (width - 1) / 2) ** 2
+        return ys[:, None] + xs[None, :] <= radius * radius
+
+    def _levels(self, arr):
+        """圆盘内亮度的低、高百分位"""
+        if not self.auto_levels:
+            return 0.0, 255.0
+        sample = arr[::self.sample_step, ::self.sample_step]
+        luma = sample.astype(np.float32) @ np.asarray(LUMA_WEIGHTS, dtype=np.float32)
+        if self.disk_radius is not None:
+            luma = luma[self._disk_mask(*arr.shape[:2])]
+        if luma.size == 0:
+            return 0.0, 255.0
+        low, high = np.percentile(luma, [self.low_percentile, self.high_percentile])
+        if high - low < 1:
+            return 0.0, 255.0
+        return float(low), float(high)
+
+    def _lookup_table(self, low, high):
+        """色阶 + 伽马的查找表"""
+        values = np.arange(256, dtype=np.float32)
+        normalized = np.clip((values - low) / (high - low), 0.0, 1.0)
+        if self.gamma != 1.0:
+            normalized **= 1.0 / self.gamma
+        return np.round(normalized * 255).astype(np.uint8).tolist()
+
+    def _saturate(self, img):
+        """以亮度为中心按倍数拉伸各通道：luma + saturation × (rgb - luma)"""
+        gray = img.convert('L').convert('RGB')
+        try:
+            # alpha 大于 1 时 blend 向 img 方向外插，结果自动截断到 0~255
+            return Image.blend(gray, img, self.saturation)
+        finally:
+            gray.close()
+
+    def apply(self, img):
+        rgb = img if img.mode == 'RGB' else img.convert('RGB')
+        low, high = self._levels(np.asarray(rgb))
+        logger.info(f"图像增强: 色阶 {low:.1f}~{high:.1f}, gamma={self.gamma}, 饱和度={self.saturation}")
+        result = rgb.point(self._lookup_table(low, high) * 3)
+        if rgb is not img:
+            rgb.close()
+        if self.saturation != 1.0:
+            saturated = self._saturate(result)
+            result.close()
+            result = saturated
+        return result
+
+
+if __name__ == '__main__':
+    # 基准测试：2200×2200 合成帧（4d 级别）上各步骤的耗时
+    import time
+
+    size = 2200
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:size, 0:size]
+    disk = (yy - size / 2) ** 2 + (xx - size / 2) ** 2 <= (0.49 * size) ** 2
+    frame = (rng.integers(10, 120, (size, size, 3)) * disk[..., None]).astype(np.uint8)
+    frame_img = Image.fromarray(frame, 'RGB')
+
+    configs = {
+        'auto_levels': EnhanceStage(),
+        'auto_levels+gamma': EnhanceStage(gamma=1.3),
+        'auto_levels+gamma+saturation': EnhanceStage(gamma=1.3, saturation=1.2),
+    }
+    for label, stage in configs.items():
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            stage.apply(frame_img).close()
+            timings.append(time.perf_counter() - started)
+        print(f"{label:<30} 最短 {min(timings) * 1000:7.1f} ms  平均 {sum(timings) / len(timings) * 1000:7.1f} ms")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : image_pipeline
+# @Description:
+#
+#
+import logging
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# 可选的重采样滤镜
+RESAMPLE_FILTERS = {
+    'nearest': Image.NEAREST,
+    'bilinear': Image.BILINEAR,
+    'bicubic': Image.BICUBIC,
+    'lanczos': Image.LANCZOS,
+}
+
+
+class ImageStage:
+    """
+    后处理阶段：接收一幅内存中的图像，返回处理后的图像。
+
+    各阶段只做像素运算，不读写文件；解码由调用方负责，编码由 ImageEncoder 在全部阶段完成后执行一次。
+    """
+
+    name = 'stage'
+    # 执行顺序：几何裁剪 (0) → 缩小到屏幕 (10) → 像素增强 (20) → 填充 (30)
+    # 增强放在缩小之后，只处理屏幕尺寸的像素；缩小作为第一个阶段时还能逐瓦片预先 reduce
+    order = 0
+
+    def output_size(self, size):
+        """该阶段输出图像的尺寸，不适用时原样返回"""
+        return size
+
+    def applies_to(self, size):
+        """对给定尺寸的图像是否需要执行"""
+        return True
+
+    def reduce_factor(self, size):
+        """作为第一个阶段时，输入可以预先按整数倍缩小的倍数（如逐瓦片 reduce），1 表示不能"""
+        return 1
+
+    def draft(self, img):
+        """作为第一个阶段时，在解码前设置解码器的草稿模式（如 JPEG 按 1/2、1/4、1/8 解码）"""
+
+    def apply(self, img):
+        raise NotImplementedError
+
+
+class CropStage(ImageStage):
+    """按边界裁剪，边界为 None 时取图像边缘（如裁掉 SDO 太阳图片底部的说明文字）"""
+
+    name = 'crop'
+
+    def __init__(self, left=0, top=0, right=None, bottom=None):
+        self.left = left
+        self.top = top
+        self.right = right
+        self.bottom = bottom
+
+    def _box(self, size):
+        width, height = size
+        right = width if self.right is None else min(self.right, width)
+        bottom = height if self.bottom is None else min(self.bottom, height)
+        return self.left, self.top, right, bottom
+
+    def output_size(self, size):
+        left, top, right, bottom = self._box(size)
+        return right - left, bottom - top
+
+    def applies_to(self, size):
+        return self._box(size) != (0, 0) + tuple(size)
+
+    def apply(self, img):
+        return img.crop(self._box(img.size))
+
+
+class ResizeStage(ImageStage):
+    """
+    按屏幕分辨率一次重采样到最终尺寸（只缩小不放大）。
+
+    fit 模式完整放入屏幕，cover 模式铺满屏幕（对应系统的"填充/缩放"样式）。
+    缩小倍数较大时先用 reduce 做整数倍盒式缩小，再用所选滤镜重采样剩余部分。
+    """
+
+    name = 'resize'
+    order = 10
+
+    def __init__(self, screen_size, mode='fit', resample='lanczos', reducing_gap=2.0):
+        """
+        :param screen_size: 屏幕物理分辨率 (width, height)
+        :param mode: 'fit' 或 'cover'
+        :param resample: RESAMPLE_FILTERS 中的滤镜名称
+        :param reducing_gap: 整数倍 reduce 之后至少保留的缩小倍数，越大质量越接近直接重采样
+        """
+        if resample not in RESAMPLE_FILTERS:
+            raise ValueError(f"不支持的重采样滤镜: {resample}")
+        self.screen_size = tuple(screen_size)
+        self.mode = mode
+        self.resample = resample
+        self.reducing_gap = reducing_gap
+
+    def output_size(self, size):
+        width, height = size
+        screen_width, screen_height = self.screen_size
+        if self.mode == 'cover':
+            scale = max(screen_width / width, screen_height / height)
+        else:
+            scale = min(screen_width / width, screen_height / height)
+        if scale >= 1:
+            return tuple(size)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def applies_to(self, size):
+        return self.output_size(size) != tuple(size)
+
+    def reduce_factor(self, size):
+        target_width, target_height = self.output_size(size)
+        ratio = min(size[0] / target_width, size[1] / target_height)
+        return max(1, int(ratio / self.reducing_gap))
+
+    def draft(self, img):
+        if img.format == 'JPEG':
+            # 草稿模式按 1/2、1/4、1/8 解码，保证结果不小于请求的尺寸
+            img.draft('RGB', self.output_size(img.size))
+
+    def apply(self, img):
+        return img.resize(self.output_size(img.size), RESAMPLE_FILTERS[self.resample],
+                          reducing_gap=self.reducing_gap)
+
+
+class FillStage(ImageStage):
+    """
+    居中填充到屏幕分辨率（Windows 的 img_fill 模式）。
+    远大于屏幕的合成图（8d 及以上级别）居中填充只会截取中心一小块，跳过并交给系统"适应"样式缩放。
+    """
+
+    name = 'fill'
+    order = 30
+
+    def __init__(self, screen_size, color='black', max_area_ratio=4):
+        self.screen_size = tuple(screen_size)
+        self.color = color
+        self.max_area_ratio = max_area_ratio
+
+    def output_size(self, size):
+        return self.screen_size if self.applies_to(size) else size
+
+    def applies_to(self, size):
+        width, height = size
+        screen_width, screen_height = self.screen_size
+        if (width, height) == self.screen_size:
+            return False
+        return width * height <= screen_width * screen_height * self.max_area_ratio
+
+    def apply(self, img):
+        screen_width, screen_height = self.screen_size
+        fill_img = Image.new(img.mode, self.screen_size, color=self.color)
+        fill_img.paste(img, ((screen_width - img.size[0]) // 2, (screen_height - img.size[1]) // 2))
+        return fill_img
+
+
+class ImagePipeline:
+    """
+    由多个 ImageStage 组成的后处理流水线（合成 → 裁剪 → 填充），之后交给 ImageEncoder 编码。
+
+    图像只解码一次，在内存中依次经过各阶段，最后编码一次写出。
+    """
+
+    def __init__(self, stages=None):
+        self.stages = sorted(stages or [], key=lambda stage: stage.order)
+
+    def active_stages(self, size):
+        """对给定尺寸的输入图像，实际需要执行的阶段列表"""
+        active = []
+        for stage in self.stages:
+            if stage.applies_to(size):
+                active.append(stage)
+                size = stage.output_size(size)
+        return active
+
+    def reduce_factor(self, size):
+        """输入可以预先按整数倍缩小的倍数，由第一个实际执行的阶段决定"""
+        active = self.active_stages(size)
+        return active[0].reduce_factor(size) if active else 1
+
+    def draft(self, img):
+        """在解码前让第一个实际执行的阶段设置草稿模式"""
+        active = self.active_stages(img.size)
+        if active:
+            active[0].draft(img)
+
+    def is_noop(self, size):
+        """对给定尺寸的输入图像是否无需任何处理（此时可直接使用下载/合成的文件，跳过解码和编码）"""
+        return not self.active_stages(size)
+
+    def run(self, img):
+        """
+        依次执行各阶段。
+
+        :param img: 输入图像，被替换的中间图像会被关闭
+        :return: 处理后的图像
+        """
+        for stage in self.stages:
+            if not stage.applies_to(img.size):
+                continue
+            result = stage.apply(img)
+            logger.info(f"后处理阶段 {stage.name}: {img.size} -> {result.size}")
+            if result is not img:
+                img.close()
+            img = result
+        return img
+
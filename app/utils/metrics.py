@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : metrics
+# @Description:
+#
+#
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    """
+    进程内的简单指标：计数器和耗时统计（次数、累计、最近一次、最大值）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+
+    def incr(self, name, value=1):
+        """计数器加 value"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        """记录一次耗时（秒）"""
+        with self._lock:
+            stat = self._timings.setdefault(name, {'count': 0, 'total': 0.0, 'last': 0.0, 'max': 0.0})
+            stat['count'] += 1
+            stat['total'] += seconds
+            stat['last'] = seconds
+            stat['max'] = max(stat['max'], seconds)
+
+    def snapshot(self):
+        """当前所有指标的快照"""
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'timings': {name: dict(stat) for name, stat in self._timings.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+# 全局指标实例
+metrics = Metrics()
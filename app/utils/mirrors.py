@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : mirrors
+# @Description:
+#
+#
+from collections import deque
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Himawari 的两个镜像，URL 路径部分完全一致，只有前缀不同
+HIMAWARI_MIRRORS = [
+    'https://himawari8-dl.nict.go.jp/himawari.asia',
+    'https://himawari8.nict.go.jp',
+]
+
+
+class MirrorStats:
+    """单个镜像的延迟统计"""
+
+    def __init__(self, max_samples=50):
+        self.latencies = deque(maxlen=max_samples)
+        # 近期失败计数，成功一次减半，用于降低故障镜像的优先级
+        self.recent_failures = 0.0
+
+    def percentile(self, p):
+        """延迟的 p 分位数（0~1），没有样本时返回 None"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(p * len(ordered)))
+        return ordered[index]
+
+
+class MirrorSet:
+    """
+    一组内容相同的镜像主机。
+
+    记录每个镜像的下载延迟，优先使用更快的镜像；
+    首选镜像在其延迟分位数阈值内没有完成时，向另一个镜像发起对冲请求，先返回者胜出。
+    """
+
+    def __init__(self, prefixes, hedge_percentile=0.9, min_samples=5, default_hedge_delay=3.0,
+                 min_hedge_delay=0.5, max_hedge_delay=15.0):
+        """
+        :param prefixes: 镜像 URL 前缀列表，第一个为默认首选
+        :param hedge_percentile: 对冲阈值使用的延迟分位数
+        :param min_samples: 样本不足时使用 default_hedge_delay
+        :param default_hedge_delay: 默认对冲等待时间（秒）
+        :param min_hedge_delay: 对冲等待时间下限（秒）
+        :param max_hedge_delay: 对冲等待时间上限（秒）
+        """
+        self.prefixes = list(prefixes)
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self._lock = threading.Lock()
+        self._stats = {prefix: MirrorStats() for prefix in self.prefixes}
+
+    def match(self, url):
+        """返回 URL 所属的镜像前缀，不属于该镜像组时返回 None"""
+        for prefix in self.prefixes:
+            if url.startswith(prefix + '/'):
+                return prefix
+        return None
+
+    def rewrite(self, url, prefix):
+        """将 URL 改写到指定镜像"""
+        current = self.match(url)
+        if current is None:
+            return url
+        return prefix + url[len(current):]
+
+    def _score(self, prefix):
+        stats = self._stats[prefix]
+        median = stats.percentile(0.5)
+        if median is None:
+            # 没有样本的镜像按默认对冲等待时间估计，保证默认首选排在前面
+            median = self.default_hedge_delay + self.prefixes.index(prefix) * 1e-3
+        return median * (1 + stats.recent_failures)
+
+    def ordered(self):
+        """按预计延迟从快到慢排列的镜像前缀"""
+        with self._lock:
+            return sorted(self.prefixes, key=self._score)
+
+    def hedge_delay(self, prefix):
+        """首选镜像在多少秒内未完成时发起对冲请求"""
+        with self._lock:
+            stats = self._stats[prefix]
+            if len(stats.latencies) < self.min_samples:
+                return self.default_hedge_delay
+            delay = stats.percentile(self.hedge_percentile)
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, delay))
+
+    def record(self, url, latency=None, ok=True):
+        """记录一次请求结果"""
+        prefix = self.match(url)
+        if prefix is None:
+            return
+        with self._lock:
+            stats = self._stats[prefix]
+            if ok:
+                stats.latencies.append(latency)
+                stats.recent_failures /= 2
+            else:
+                stats.recent_failures += 1
+
+    def snapshot(self):
+        """各镜像的统计快照 {prefix: {'p50', 'p90', 'samples', 'recent_failures'}}"""
+        with self._lock:
+            return {
+                prefix: {
+                    'p50': stats.percentile(0.5),
+                    'p90': stats.percentile(0.9),
+                    'samples': len(stats.latencies),
+                    'recent_failures': stats.recent_failures,
+                }
+                for prefix, stats in self._stats.items()
+            }
+
+
+class MirrorRegistry:
+    """所有图片源的镜像组，由 MainController 持有，延迟统计在多次刷新之间保留"""
+
+    def __init__(self, mirror_sets=None):
+        self.mirror_sets = mirror_sets if mirror_sets is not None else [MirrorSet(HIMAWARI_MIRRORS)]
+
+    def find(self, url):
+        """查找 URL 所属的镜像组，没有镜像时返回 None"""
+        for mirror_set in self.mirror_sets:
+            if mirror_set.match(url) is not None:
+                return mirror_set
+        return None
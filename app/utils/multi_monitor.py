@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : multi_monitor
+# @Description:
+#
+#
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from PIL import Image
+
+from app.utils.image_encoder import ImageEncoder
+from app.utils.image_pipeline import ResizeStage, RESAMPLE_FILTERS
+from app.utils.wallpaper_sources import get_source_stages
+from app.utils.wallpaper_spider import AutoWallpaperSpider, DownloadCancelledError, IS_WINDOWS, IS_MACOS, IS_LINUX
+
+logger = logging.getLogger(__name__)
+
+WORK_DIR_NAME = '.multi_monitor'
+
+
+class ScreenGeometry:
+    """单个显示器在虚拟桌面中的位置和尺寸（物理像素）"""
+
+    def __init__(self, name, x, y, width, height):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def __repr__(self):
+        return f"ScreenGeometry({self.name!r}, {self.width}x{self.height}+{self.x}+{self.y})"
+
+
+def get_virtual_bounds(screens):
+    """所有显示器组成的虚拟桌面边界 (left, top, right, bottom)"""
+    return (
+        min(screen.x for screen in screens),
+        min(screen.y for screen in screens),
+        max(screen.x + screen.width for screen in screens),
+        max(screen.y + screen.height for screen in screens),
+    )
+
+
+class MultiMonitorRenderer:
+    """
+    多显示器渲染器。
+
+    每个图片源只解码一次，同一幅内存图像按各显示器的分辨率分别缩放居中，
+    输出一幅覆盖整个虚拟桌面的拼接图（span），或每个显示器一幅图像（per_monitor）。
+    """
+
+    def __init__(self, screens, mode='span', resample='lanczos', background='black'):
+        """
+        :param screens: ScreenGeometry 列表
+        :param mode: 'span' 或 'per_monitor'
+        :param resample: RESAMPLE_FILTERS 中的滤镜名称
+        :param background: 图像未覆盖区域的颜色
+        """
+        if mode not in ('span', 'per_monitor'):
+            raise ValueError(f"不支持的多显示器模式: {mode}")
+        self.screens = list(screens)
+        self.mode = mode
+        self.resample = resample
+        self.background = background
+
+    def render_screen(self, img, screen):
+        """将图像缩放（只缩小不放大）并居中放到一个显示器大小的画布上"""
+        target = ResizeStage(screen.size, mode='fit', resample=self.resample).output_size(img.size)
+        canvas = Image.new('RGB', screen.size, color=self.background)
+        if target != img.size:
+            scaled = img.resize(target, RESAMPLE_FILTERS[self.resample], reducing_gap=2.0)
+        else:
+            scaled = img
+        canvas.paste(scaled, ((screen.width - target[0]) // 2, (screen.height - target[1]) // 2))
+        if scaled is not img:
+            scaled.close()
+        return canvas
+
+    def render(self, images):
+        """
+        :param images: 与 screens 一一对应的图像，同一图片源的显示器共享同一幅图像
+        :return: span 模式返回一幅图像；per_monitor 模式返回与 screens 对应的图像列表
+        """
+        per_screen = []
+        try:
+            for img, screen in zip(images, self.screens):
+                per_screen.append(self.render_screen(img, screen))
+        except Exception:
+            for screen_img in per_screen:
+                screen_img.close()
+            raise
+        if self.mode == 'per_monitor':
+            return per_screen
+        left, top, right, bottom = get_virtual_bounds(self.screens)
+        span = Image.new('RGB', (right - left, bottom - top), color=self.background)
+        for screen, screen_img in zip(self.screens, per_screen):
+            span.paste(screen_img, (screen.x - left, screen.y - top))
+            screen_img.close()
+        return span
+
+
+class MultiMonitorWallpaper:
+    """
+    多显示器壁纸：每个显示器可以使用不同的图片源，各图片源并发下载，
+    渲染后按平台能力设置——Windows 和 GNOME 使用跨屏拼接图，macOS 逐个桌面设置。
+    """
+
+    def __init__(self, screens, screen_sources, source_resolvers, wallpaper_dir, spider_options=None,
+                 resample='lanczos', encoder=None, enhance=None):
+        """
+        :param screens: ScreenGeometry 列表
+        :param screen_sources: 与 screens 对应的图片源名称
+        :param source_resolvers: {图片源名称: 无参可调用对象，返回 (img_urls, img_name, img_fill)}
+        :param wallpaper_dir: 壁纸保存目录，下载和中间文件位于其下的 .multi_monitor 目录
+        :param spider_options: 传给 AutoWallpaperSpider 的共享资源和下载配置
+        :param resample: 重采样滤镜
+        :param encoder: 最终壁纸的 ImageEncoder，为空时使用 PNG
+        :param enhance: Himawari 图像增强参数，见 wallpaper_sources.get_source_stages
+        """
+        self.screens = list(screens)
+        self.screen_sources = list(screen_sources)
+        self.source_resolvers = source_resolvers
+        self.wallpaper_dir = wallpaper_dir
+        self.work_dir = os.path.join(wallpaper_dir, WORK_DIR_NAME)
+        self.spider_options = dict(spider_options or {})
+        # 后处理阶段、缩放尺寸和编码由本类按图片源和显示器决定
+        for key in ('stages', 'encoder', 'screen_size', 'resample', 'frame_hashes', 'archive'):
+            self.spider_options.pop(key, None)
+        # 需要完整解码的图像，不使用条件请求
+        self.spider_options['validator_cache'] = None
+        self.resample = resample
+        self.enhance = enhance
+        self.encoder = encoder if encoder is not None else ImageEncoder('png')
+        self.mode = 'per_monitor' if IS_MACOS else 'span'
+        self.wallpaper_paths = []
+
+    def _screen_size_for(self, source):
+        """使用该图片源的所有显示器中最大的宽、高，图片源按此尺寸缩小一次即可满足每个显示器"""
+        screens = [screen for screen, name in zip(self.screens, self.screen_sources) if name == source]
+        return max(screen.width for screen in screens), max(screen.height for screen in screens)
+
+    def _prepare_source(self, source):
+        """下载并处理一个图片源，返回内存中的图像"""
+        img_urls, img_name, img_fill = self.source_resolvers[source]()
+        spider = AutoWallpaperSpider(img_urls, img_name, self.work_dir, img_fill, stages=get_source_stages(source, self.enhance),
+                                     screen_size=self._screen_size_for(source), resample=self.resample,
+                                     resize_mode='fit', render_to_memory=True, **self.spider_options)
+        spider.prepare()
+        return spider.image
+
+    def _check_cancelled(self):
+        """spider_options 中的 cancel_event 已置位时抛出 DownloadCancelledError，不再写出和设置壁纸"""
+        cancel_event = self.spider_options.get('cancel_event')
+        if cancel_event is not None and cancel_event.is_set():
+            raise DownloadCancelledError("刷新任务已取消")
+
+    def _cleanup_work_dir(self):
+        """删除工作目录中残留的下载文件（某个图片源失败时，其余图片源已下载的瓦片）"""
+        if not os.path.isdir(self.work_dir):
+            return
+        for file_name in os.listdir(self.work_dir):
+            path = os.path.join(self.work_dir, file_name)
+            if not os.path.isfile(path):
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"清理多显示器临时文件 {path} 失败: {e}")
+
+    def prepare(self):
+        """
+        并发下载各图片源，渲染并编码写出。
+        任一图片源失败时关闭其余图片源已解码的图像、清理工作目录，再抛出第一个异常。
+
+        :return: 写出的壁纸文件路径列表
+        """
+        sources = list(dict.fromkeys(self.screen_sources))
+        images = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            futures = {source: executor.submit(self._prepare_source, source) for source in sources}
+            for source, future in futures.items():
+                # result() 会重新抛出下载中的异常；等待全部结束，成功的图像也要释放
+                try:
+                    images[source] = future.result()
+                except Exception as e:
+                    error = error or e
+        if error is not None:
+            for img in images.values():
+                img.close()
+            self._cleanup_work_dir()
+            raise error
+
+        renderer = MultiMonitorRenderer(self.screens, mode=self.mode, resample=self.resample)
+        try:
+            rendered = renderer.render([images[source] for source in self.screen_sources])
+        finally:
+            for img in images.values():
+                img.close()
+
+        if self.mode == 'span':
+            rendered = [rendered]
+        self.wallpaper_paths = []
+        try:
+            self._check_cancelled()
+            for index, img in enumerate(rendered):
+                name = 'pod_span' if self.mode == 'span' else f'pod_monitor_{index}'
+                path = os.path.join(self.wallpaper_dir, name + self.encoder.extension)
+                self.encoder.encode(img, path)
+                self.wallpaper_paths.append(path)
+        finally:
+            for img in rendered:
+                img.close()
+        logger.info(f"多显示器壁纸已生成（{self.mode}）: {self.wallpaper_paths}")
+        return self.wallpaper_paths
+
+    def run(self):
+        """生成并设置多显示器壁纸"""
+        logger.info(f"多显示器壁纸: {list(zip(self.screens, self.screen_sources))}")
+        paths = self.prepare()
+        self._check_cancelled()
+        if self.mode == 'span':
+            set_spanned_wallpaper(paths[0])
+        else:
+            set_monitor_wallpapers(paths)
+
+
+def set_spanned_wallpaper(image_path):
+    """将一幅覆盖整个虚拟桌面的拼接图设为壁纸（Windows 的"跨区"样式、GNOME 的 spanned 样式）"""
+    if IS_WINDOWS:
+        import win32api
+        import win32con
+        import win32gui
+        key = win32api.RegOpenKeyEx(win32con.HKEY_CURRENT_USER, r"Control Panel\Desktop", 0, win32con.KEY_SET_VALUE)
+        win32api.RegSetValueEx(key, "WallpaperStyle", 0, win32con.REG_SZ, "22")  # 跨区
+        win32api.RegSetValueEx(key, "TileWallpaper", 0, win32con.REG_SZ, "0")
+        win32gui.SystemParametersInfo(win32con.SPI_SETDESKWALLPAPER, image_path, 1 + 2)
+    elif IS_LINUX:
+        subprocess.run(["gsettings", "set", "org.gnome.desktop.background", "picture-uri", f"file://{image_path}"],
+                       check=True, capture_output=True)
+        subprocess.run(["gsettings", "set", "org.gnome.desktop.background", "picture-options", "spanned"],
+                       check=True, capture_output=True)
+    else:
+        raise NotImplementedError("当前操作系统不支持跨屏拼接壁纸。")
+    logger.info(f"跨屏壁纸已设置: {image_path}")
+
+
+def set_monitor_wallpapers(image_paths):
+    """
+    逐个显示器设置壁纸（macOS）。
+    System Events 的 desktop 顺序与 Qt 的屏幕顺序通常一致（主屏在前），但系统并不保证。
+    """
+    if not IS_MACOS:
+        raise NotImplementedError("当前操作系统不支持逐个显示器设置壁纸。")
+    for index, image_path in enumerate(image_paths, start=1):
+        script = f"""
+        tell application "System Events"
+            if (count of desktops) >= {index} then
+                set picture of desktop {index} to "{image_path}"
+            end if
+        end tell
+        """
+        subprocess.run(["osascript", "-e", script], check=True, capture_output=True, text=True)
+    logger.info(f"各显示器壁纸已设置: {image_paths}")
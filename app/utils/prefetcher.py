@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : prefetcher
+# @Description:
+#
+#
+import datetime
+import os
+import threading
+import logging
+
+from app.utils.scheduler import get_delay_ms, get_tick_slot
+
+logger = logging.getLogger(__name__)
+
+STAGING_DIR_NAME = '.staging'
+
+# 预取需要提前多少分钟开始，保证定时器触发前合成完毕（4x4 瓦片需要更长时间）
+PREFETCH_LEAD_MINUTES = {
+    'Earth-H8': 1,
+    'Earth-H8-16': 3,
+    'Moon-NASA': 1,
+}
+
+
+class StagingArea:
+    """
+    预取暂存区。
+
+    预取线程在 work 子目录中合成壁纸，完成后通过 commit 原子地移入暂存区；
+    定时器触发时 take 取出对应图片名的文件，只需替换文件并调用系统壁纸设置。
+    """
+
+    def __init__(self, folder):
+        """
+        :param folder: 壁纸保存目录，暂存区位于其下的 .staging 目录
+        """
+        self.stage_dir = os.path.join(folder, STAGING_DIR_NAME)
+        self.work_dir = os.path.join(self.stage_dir, 'work')
+        self._lock = threading.Lock()
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    def _path_for(self, img_name):
+        return os.path.join(self.stage_dir, img_name)
+
+    def has(self, img_name):
+        """暂存区中是否已有该图片"""
+        return os.path.exists(self._path_for(img_name))
+
+    def commit(self, prepared_path, img_name):
+        """将 work 目录中合成完毕的文件移入暂存区，并清理其他旧的暂存文件"""
+        with self._lock:
+            os.replace(prepared_path, self._path_for(img_name))
+            for file_name in os.listdir(self.stage_dir):
+                path = os.path.join(self.stage_dir, file_name)
+                if file_name != img_name and os.path.isfile(path):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        logger.warning(f"清理旧的预取文件失败: {e}")
+        logger.info(f"预取完成，已暂存: {img_name}")
+
+    def take(self, img_name):
+        """
+        取出暂存的图片。
+
+        :return: 暂存文件路径，调用方负责移动到最终位置；未命中返回 None
+        """
+        with self._lock:
+            path = self._path_for(img_name)
+            if os.path.exists(path):
+                return path
+        return None
+
+
+def get_prefetch_delay_ms(image_source, next_tick_time, now=None):
+    """
+    计算距离下一次预取的毫秒数：在下一次刷新前 PREFETCH_LEAD_MINUTES 分钟开始。
+
+    :param image_source: 图片源名称
+    :param next_tick_time: 下一次刷新的时间（UTC），即 get_next_tick_time 的结果，已包含图片源的发布延迟
+    :param now: 当前 UTC 时间，默认为 datetime.utcnow()
+    :return: 毫秒数；该图片源不支持预取时返回 None
+    """
+    if image_source not in PREFETCH_LEAD_MINUTES or next_tick_time is None:
+        return None
+    start_time = next_tick_time - datetime.timedelta(minutes=PREFETCH_LEAD_MINUTES[image_source])
+    return get_delay_ms(start_time, now)
+
+
+def get_prefetch_target_time(image_source, next_tick_time):
+    """
+    预取的目标时次：下一次刷新时应当显示的帧，与定时器使用相同的发布周期和发布延迟（见 scheduler.get_tick_slot）。
+    """
+    return get_tick_slot(image_source, next_tick_time)
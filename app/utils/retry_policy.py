@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : retry_policy
+# @Description:
+#
+#
+import random
+import threading
+import time
+from urllib.parse import urlparse
+import logging
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.RequestException):
+    """主机熔断中，请求被直接拒绝"""
+
+
+class RetryPolicy:
+    """
+    下载重试策略：指数退避 + 随机抖动 + 每个瓦片的截止时间。
+    """
+
+    def __init__(self, max_attempts=6, base_delay=1.0, max_delay=30.0, multiplier=2.0, jitter=0.5,
+                 deadline=120.0, connect_timeout=5.0, read_timeout=20.0):
+        """
+        :param max_attempts: 单个瓦片的最大尝试次数
+        :param base_delay: 首次重试前的等待时间（秒）
+        :param max_delay: 单次等待时间上限（秒）
+        :param multiplier: 每次重试等待时间的增长倍数
+        :param jitter: 抖动比例，0~1，实际等待时间在 [delay*(1-jitter), delay] 之间随机
+        :param deadline: 单个瓦片从开始下载起的截止时间（秒），超过后不再重试
+        :param connect_timeout: 建立连接超时（秒）
+        :param read_timeout: 读取数据超时（秒）
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    @property
+    def timeout(self):
+        """传给 requests 的 (连接超时, 读取超时)"""
+        return self.connect_timeout, self.read_timeout
+
+    def start(self):
+        """开始下载一个瓦片，返回截止时刻（time.monotonic）"""
+        return time.monotonic() + self.deadline
+
+    def next_delay(self, attempt, deadline):
+        """
+        计算第 attempt 次失败后的等待时间。
+
+        :param attempt: 已失败的次数（从 1 开始）
+        :param deadline: start() 返回的截止时刻
+        :return: 等待秒数；已达到最大次数或等待后会超过截止时间时返回 None
+        """
+        if attempt >= self.max_attempts:
+            return None
+        delay = min(self.max_delay, self.base_delay * (self.multiplier ** (attempt - 1)))
+        delay *= 1 - self.jitter * random.random()
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+
+class CircuitBreaker:
+    """
+    单个主机的熔断器。
+
+    连续失败达到阈值后进入 open 状态，期间所有请求直接失败；
+    经过 reset_timeout 后进入 half_open，放行一个探测请求，成功则恢复 closed。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, host, failure_threshold=3, reset_timeout=120.0):
+        """
+        :param host: 主机名
+        :param failure_threshold: 连续失败多少次后熔断
+        :param reset_timeout: 熔断持续时间（秒）
+        """
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        # 发出探测请求的线程，只有它能释放探测名额
+        self._probe_thread = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self):
+        """当前是否允许发出请求"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_thread = threading.get_ident()
+                return True
+            return False
+
+    def release_probe(self):
+        """
+        请求结束后释放当前线程持有的探测名额（无论成功与否）。
+        探测请求因取消、解码或校验错误等非网络异常结束时，既没有 record_success 也没有 record_failure，
+        不释放的话熔断器会一直停留在 half_open 且不再放行任何请求。
+        """
+        with self._lock:
+            if self._probe_in_flight and self._probe_thread == threading.get_ident():
+                self._probe_in_flight = False
+                self._probe_thread = None
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"主机 {self.host} 已恢复，熔断器关闭")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"主机 {self.host} 连续失败 {self._failures} 次，熔断 {self.reset_timeout} 秒")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self):
+        """熔断器状态快照，供界面/日志展示"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = 0.0
+            if state == self.OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            return {'state': state, 'failures': self._failures, 'retry_in': retry_in}
+
+
+class CircuitBreakerRegistry:
+    """按主机管理熔断器，由 MainController 持有并在多次刷新之间共享"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=120.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def for_url(self, url):
+        """获取 URL 所在主机的熔断器"""
+        host = urlparse(url).netloc
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(host, self.failure_threshold, self.reset_timeout)
+                self._breakers[host] = breaker
+            return breaker
+
+    def states(self):
+        """所有主机的熔断器状态 {host: snapshot}"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {host: breaker.snapshot() for host, breaker in breakers.items()}
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : scheduler
+# @Description:
+#
+#
+import datetime
+import math
+import logging
+
+from app.utils.wallpaper_sources import SOURCE_CADENCES
+
+logger = logging.getLogger(__name__)
+
+
+def get_tick_step(image_source, interval_minutes):
+    """刷新步长（分钟）：不短于图片源的发布周期，并取周期的整数倍，使每次刷新都落在发布时刻上"""
+    period = SOURCE_CADENCES[image_source]['period']
+    return max(period, math.ceil(interval_minutes / period) * period)
+
+
+def get_next_tick_time(image_source, interval_minutes, now=None, previous_tick=None):
+    """
+    下一次刷新的时间（UTC）：从当天 0 点起按步长对齐的时次，加上图片源的发布延迟。
+
+    例如 Himawari 周期 10 分钟、延迟 20 分钟，10 分钟间隔的刷新落在每个 xx:x0 时次发布之后，
+    而不是从程序启动时刻开始计时、总是落后最新数据将近一个时次。
+
+    :param interval_minutes: 配置的刷新间隔（分钟）
+    :param now: 当前 UTC 时间，默认为 datetime.utcnow()
+    :param previous_tick: 刚刚触发的刷新时间；定时器可能提前几毫秒触发，结果严格晚于它，同一次刷新不会再安排一次
+    """
+    now = now or datetime.datetime.utcnow()
+    if previous_tick is not None:
+        now = max(now, previous_tick)
+    step = datetime.timedelta(minutes=get_tick_step(image_source, interval_minutes))
+    latency = datetime.timedelta(minutes=SOURCE_CADENCES[image_source]['latency'])
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    index = math.floor((now - day_start - latency) / step) + 1
+    return day_start + latency + step * index
+
+
+def get_tick_slot(image_source, tick_time):
+    """某次刷新应当显示的时次：刷新时间减去发布延迟，向下取整到发布周期"""
+    period = SOURCE_CADENCES[image_source]['period']
+    published = tick_time - datetime.timedelta(minutes=SOURCE_CADENCES[image_source]['latency'])
+    day_start = published.replace(hour=0, minute=0, second=0, microsecond=0)
+    minutes = (published - day_start) // datetime.timedelta(minutes=1)
+    return day_start + datetime.timedelta(minutes=minutes - minutes % period)
+
+
+def get_delay_ms(target_time, now=None):
+    """距离 target_time 的毫秒数（向上取整，定时器不会早于 target_time 触发），已过去时为 0"""
+    now = now or datetime.datetime.utcnow()
+    return max(0, math.ceil((target_time - now).total_seconds() * 1000))
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : slideshow
+# @Description:
+#
+#
+import bisect
+import datetime
+import itertools
+import os
+import threading
+import logging
+
+from app.utils.image_encoder import ImageEncoder
+from app.utils.wallpaper_sources import SOURCE_CADENCES, round_down_time, get_earth_h8_img_url, \
+    get_earth_h8_tile_urls, get_moon_nasa_img_url, get_source_stages
+from app.utils.wallpaper_spider import AutoWallpaperSpider, DownloadCancelledError
+
+logger = logging.getLogger(__name__)
+
+SLIDESHOW_DIR_NAME = '.slideshow'
+
+# 槽位文件序号在所有缓冲区之间递增：已停止的缓冲区的加载线程退出前仍可能写入一帧，不能覆盖新缓冲区的文件
+_frame_sequence = itertools.count()
+
+
+def get_slideshow_frames(image_source, end, hours, level=4):
+    """
+    幻灯片需要的帧：end 之前 hours 小时内该图片源的各个时次，按时间升序。
+
+    :param end: 最新的时次（UTC），如 Himawari 最新的可用时次
+    :param level: Earth-H8-16 的瓦片级别
+    :return: [(slot_time, 无参可调用对象，返回 (img_urls, img_name, img_fill)), ...]；
+             SDO 太阳只有最新一张图片，不支持幻灯片，返回空列表
+    """
+    if image_source == 'Earth-H8':
+        resolve = get_earth_h8_img_url
+        end = round_down_time(end)
+    elif image_source == 'Earth-H8-16':
+        def resolve(slot_time):
+            return get_earth_h8_tile_urls(level, slot_time)
+        end = round_down_time(end)
+    elif image_source == 'Moon-NASA':
+        resolve = get_moon_nasa_img_url
+        end = end.replace(minute=0, second=0, microsecond=0)
+    else:
+        return []
+    period = datetime.timedelta(minutes=SOURCE_CADENCES[image_source]['period'])
+    count = int(datetime.timedelta(hours=hours) / period) + 1
+    slot_times = [end - period * i for i in reversed(range(count))]
+    return [(slot_time, (lambda t=slot_time: resolve(t))) for slot_time in slot_times]
+
+
+class SlideshowBuffer:
+    """
+    幻灯片环形缓冲区：最多 capacity 帧，每帧已缩小到屏幕尺寸并编码为槽位文件，按时次升序循环播放。
+
+    系统设置壁纸的接口只接受文件路径，因此帧保存在壁纸目录下的 .slideshow 中（由系统页缓存常驻内存）；
+    每次切换只调用一次系统接口，没有下载和解码。每次写入使用新的文件名，
+    避免 macOS/GNOME 因路径未变而不刷新，也避免改写正在显示的文件。
+    """
+
+    def __init__(self, work_dir, capacity, encoder=None):
+        """
+        :param work_dir: 槽位文件目录
+        :param capacity: 最多保留的帧数
+        :param encoder: ImageEncoder 实例，为空时使用 JPEG（系统设置壁纸时解码最快）
+        """
+        self.work_dir = work_dir
+        self.capacity = capacity
+        self.encoder = encoder if encoder is not None else ImageEncoder('jpeg')
+        self._lock = threading.Lock()
+        # 按时次升序：[(key, path), ...]
+        self._frames = []
+        self._cursor = -1
+        os.makedirs(work_dir, exist_ok=True)
+        # 上次运行留下的槽位文件不再有对应的时次，全部清理
+        for file_name in os.listdir(work_dir):
+            self._remove_quietly(os.path.join(work_dir, file_name))
+
+    @staticmethod
+    def _remove_quietly(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def __len__(self):
+        with self._lock:
+            return len(self._frames)
+
+    def keys(self):
+        with self._lock:
+            return [key for key, _ in self._frames]
+
+    def has(self, key):
+        with self._lock:
+            return any(frame_key == key for frame_key, _ in self._frames)
+
+    def push(self, key, img):
+        """
+        编码一帧写入槽位；超过容量时淘汰最旧的帧。比缓冲区中所有帧都旧、且缓冲区已满时丢弃。
+
+        :param key: 帧的时次
+        :param img: 已缩小到屏幕尺寸的图像（不会被关闭）
+        :return: 是否写入
+        """
+        with self._lock:
+            if len(self._frames) >= self.capacity and key < self._frames[0][0]:
+                return False
+        path = os.path.join(self.work_dir, f"frame_{next(_frame_sequence)}{self.encoder.extension}")
+        self.encoder.encode(img, path)
+        removed = []
+        with self._lock:
+            index = bisect.bisect_left([frame_key for frame_key, _ in self._frames], key)
+            if index < len(self._frames) and self._frames[index][0] == key:
+                removed.append(self._frames[index][1])
+                self._frames[index] = (key, path)
+            else:
+                self._frames.insert(index, (key, path))
+                if index <= self._cursor:
+                    self._cursor += 1
+            while len(self._frames) > self.capacity:
+                removed.append(self._frames.pop(0)[1])
+                self._cursor -= 1
+        for old_path in removed:
+            self._remove_quietly(old_path)
+        return True
+
+    def evict_before(self, key):
+        """淘汰时次早于 key 的帧（播放窗口向前移动时）"""
+        with self._lock:
+            count = bisect.bisect_left([frame_key for frame_key, _ in self._frames], key)
+            removed = [path for _, path in self._frames[:count]]
+            del self._frames[:count]
+            self._cursor -= count
+        for old_path in removed:
+            self._remove_quietly(old_path)
+
+    def advance(self):
+        """
+        下一帧的路径（到最新一帧后回到最旧一帧）。
+
+        :return: 槽位文件路径，缓冲区为空时返回 None
+        """
+        with self._lock:
+            if not self._frames:
+                return None
+            self._cursor = (self._cursor + 1) % len(self._frames) if self._cursor >= 0 else 0
+            return self._frames[self._cursor][1]
+
+    def clear(self):
+        with self._lock:
+            removed = [path for _, path in self._frames]
+            self._frames = []
+            self._cursor = -1
+        for old_path in removed:
+            self._remove_quietly(old_path)
+
+
+def load_slideshow_frames(buffer, image_source, frames, screen_size, spider_options=None, cancel_event=None):
+    """
+    下载缓冲区中还没有的帧，缩小到屏幕尺寸后写入缓冲区（在后台线程中调用）。
+
+    与多显示器渲染相同，每帧只在内存中解码和缩小一次（render_to_memory），再由缓冲区编码一次。
+    新的帧优先加载，播放窗口内最新的画面最先可用。
+
+    :param frames: get_slideshow_frames 的结果
+    :param screen_size: 屏幕物理分辨率
+    :param spider_options: 传给 AutoWallpaperSpider 的共享资源和下载配置
+    :param cancel_event: threading.Event，置位后正在下载的帧在下一个数据块或重试等待时中止
+    :return: 新写入的帧数
+    """
+    options = dict(spider_options or {})
+    for key in ('stages', 'encoder', 'screen_size', 'resize_mode', 'render_to_memory', 'frame_hashes',
+                'archive', 'fill_screen'):
+        options.pop(key, None)
+    options['validator_cache'] = None
+    options['cancel_event'] = cancel_event
+    stages = get_source_stages(image_source)
+    loaded = 0
+    for slot_time, resolver in reversed(frames):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        if buffer.has(slot_time):
+            continue
+        img_urls, img_name, img_fill = resolver()
+        try:
+            spider = AutoWallpaperSpider(img_urls, img_name, buffer.work_dir, img_fill, stages=stages,
+                                         screen_size=screen_size, resize_mode='fit', render_to_memory=True, **options)
+            spider.prepare()
+        except DownloadCancelledError:
+            break
+        except Exception as e:
+            # 缺失的时次（如维护时段）跳过，幻灯片照常播放其余的帧
+            logger.warning(f"幻灯片帧 {img_name} 加载失败: {e}")
+            continue
+        try:
+            if buffer.push(slot_time, spider.image):
+                loaded += 1
+        finally:
+            spider.image.close()
+    logger.info(f"幻灯片已加载 {loaded} 帧，共 {len(buffer)} 帧")
+    return loaded
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : slot_discovery
+# @Description:
+#
+#
+import datetime
+import threading
+import logging
+
+import requests
+
+from app.utils.wallpaper_sources import SOURCE_CADENCES, round_down_time, get_default_h8_slot, get_earth_h8_img_url
+
+logger = logging.getLogger(__name__)
+
+SLOT_INTERVAL = datetime.timedelta(minutes=10)
+# 时次在此之前不会发布，比它更新的候选时次无需探测
+PUBLICATION_LATENCY = datetime.timedelta(minutes=SOURCE_CADENCES['Earth-H8']['latency'])
+
+
+class HimawariSlotFinder:
+    """
+    Himawari 最新可用时次探测。
+
+    用 HEAD 请求探测单个 1d 瓦片是否已经发布，并缓存最新的可用时次。
+    再次探测时只检查比缓存更新的候选时次，通常只需要一两个 HEAD 请求。
+    """
+
+    def __init__(self, session=None, max_lookback=12, timeout=(5, 10), circuit_breakers=None):
+        """
+        :param session: 共享的 requests.Session
+        :param max_lookback: 没有缓存时最多向前探测的时次数（每个时次 10 分钟）
+        :param timeout: 探测请求超时 (连接, 读取)
+        :param circuit_breakers: CircuitBreakerRegistry 实例，主机熔断时直接使用兜底时次
+        """
+        self.session = session if session is not None else requests.Session()
+        self.max_lookback = max_lookback
+        self.timeout = timeout
+        self.circuit_breakers = circuit_breakers
+        self._lock = threading.Lock()
+        self._latest_slot = None
+
+    @property
+    def latest_known_slot(self):
+        """最近一次确认可用的时次，没有时为 None"""
+        with self._lock:
+            return self._latest_slot
+
+    def _probe(self, slot_time):
+        """探测某个时次的图片是否已经发布"""
+        probe_url = get_earth_h8_img_url(slot_time)[0][0]
+        breaker = self.circuit_breakers.for_url(probe_url) if self.circuit_breakers is not None else None
+        if breaker is not None and not breaker.allow_request():
+            raise requests.ConnectionError(f"主机 {breaker.host} 处于熔断状态")
+        try:
+            response = self.session.head(probe_url, timeout=self.timeout, verify=False, allow_redirects=True)
+        except requests.RequestException:
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+        if breaker is not None:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        return response.status_code == 200
+
+    def is_published(self, slot_time):
+        """
+        探测某个时次是否已经发布（一个 HEAD 请求），已发布时更新缓存的最新时次。
+        用于预取：目标时次可能早于 PUBLICATION_LATENCY 发布，find_latest_slot 不会探测它。
+
+        :return: 是否已发布；网络异常时为 False
+        """
+        known = self.latest_known_slot
+        if known is not None and slot_time <= known:
+            return True
+        try:
+            published = self._probe(slot_time)
+        except requests.RequestException as e:
+            logger.warning(f"探测 Himawari 时次失败: {e}")
+            return False
+        if published:
+            with self._lock:
+                if self._latest_slot is None or slot_time > self._latest_slot:
+                    self._latest_slot = slot_time
+        return published
+
+    def find_latest_slot(self, now=None):
+        """
+        获取最新的可用时次。
+
+        从当前时间减去发布延迟后对应的时次开始向前探测（更新的时次必然尚未发布），遇到缓存的已知可用时次即停止；
+        网络异常时返回已知时次，都没有时退回 get_default_h8_slot 的估算值。
+
+        :param now: 当前 UTC 时间，默认为 datetime.utcnow()
+        :return: 可用时次（UTC datetime）
+        """
+        now = now or datetime.datetime.utcnow()
+        known = self.latest_known_slot
+        candidate = round_down_time(now - PUBLICATION_LATENCY)
+        oldest = known if known is not None else candidate - SLOT_INTERVAL * self.max_lookback
+
+        try:
+            while candidate > oldest or (known is None and candidate == oldest):
+                if self._probe(candidate):
+                    with self._lock:
+                        if self._latest_slot is None or candidate > self._latest_slot:
+                            self._latest_slot = candidate
+                    logger.info(f"Himawari 最新可用时次: {candidate:%Y-%m-%d %H:%M}")
+                    return candidate
+                candidate -= SLOT_INTERVAL
+        except requests.RequestException as e:
+            logger.warning(f"探测 Himawari 时次失败: {e}")
+
+        if known is not None:
+            return known
+        fallback = get_default_h8_slot()
+        logger.warning(f"未探测到可用时次，使用估算时次: {fallback:%Y-%m-%d %H:%M}")
+        return fallback
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : tile_cache
+# @Description:
+#
+#
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = '.tile_cache'
+INDEX_FILE_NAME = 'index.json'
+TILE_SUFFIX = '.tile'
+
+
+class TileCache:
+    """
+    以 URL 为键的磁盘瓦片缓存，按总字节数限制容量并进行 LRU 淘汰。
+
+    Himawari 瓦片 URL 完全由时间、级别和 x/y 决定，同一 URL 的内容不会变化，
+    因此合并失败或中途中断后重试时，只需要重新下载缺失的瓦片。
+    """
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024):
+        """
+        :param cache_dir: 缓存目录
+        :param max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, INDEX_FILE_NAME)
+        self._lock = threading.Lock()
+        # key -> {'url': ..., 'size': ..., 'last_access': ...}
+        self._entries = {}
+        self._total_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _path_for_key(self, key):
+        return os.path.join(self.cache_dir, key + TILE_SUFFIX)
+
+    def _load(self):
+        """读取索引，并与目录中实际存在的文件对齐（进程被中断时索引可能落后于文件）"""
+        entries = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f).get('entries', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取瓦片缓存索引失败，将根据目录重建: {e}")
+                entries = {}
+
+        on_disk = {}
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(TILE_SUFFIX):
+                key = file_name[:-len(TILE_SUFFIX)]
+                try:
+                    on_disk[key] = os.path.getsize(os.path.join(self.cache_dir, file_name))
+                except OSError:
+                    continue
+
+        self._entries = {}
+        for key, size in on_disk.items():
+            entry = entries.get(key) or {'url': None, 'last_access': 0}
+            entry['size'] = size
+            self._entries[key] = entry
+        self._total_bytes = sum(entry['size'] for entry in self._entries.values())
+
+    def flush(self):
+        """将索引写回磁盘"""
+        with self._lock:
+            data = {'entries': dict(self._entries)}
+        temp_path = f"{self.index_path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            logger.warning(f"保存瓦片缓存索引失败: {e}")
+
+    def get(self, url):
+        """
+        查询缓存。
+
+        :return: 缓存文件路径，未命中时返回 None
+        """
+        key = self._key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            path = self._path_for_key(key)
+            if not os.path.exists(path):
+                self._total_bytes -= entry['size']
+                del self._entries[key]
+                return None
+            entry['last_access'] = time.time()
+            entry['url'] = url
+            return path
+
+    def put(self, url, src_path):
+        """
+        将已下载的文件移入缓存。
+
+        :param url: 瓦片 URL
+        :param src_path: 已下载的文件，调用后该文件被移动到缓存目录
+        :return: 缓存中的文件路径
+        """
+        key = self._key(url)
+        path = self._path_for_key(key)
+        size = os.path.getsize(src_path)
+        with self._lock:
+            os.replace(src_path, path)
+            old = self._entries.get(key)
+            if old is not None:
+                self._total_bytes -= old['size']
+            self._entries[key] = {'url': url, 'size': size, 'last_access': time.time()}
+            self._total_bytes += size
+            self._evict(protect=key)
+        return path
+
+    def _evict(self, protect=None):
+        """按最近访问时间淘汰，直到总大小不超过上限（调用方需持有锁）"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1]['last_access']):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if key == protect:
+                continue
+            try:
+                os.remove(self._path_for_key(key))
+            except OSError as e:
+                logger.warning(f"淘汰缓存瓦片失败: {e}")
+                continue
+            self._total_bytes -= entry['size']
+            del self._entries[key]
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : tile_grid
+# @Description:
+#
+#
+import math
+import struct
+import zlib
+import logging
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def get_grid_shape(tile_count):
+    """
+    根据瓦片数量推算网格行列数（Himawari 各级别均为 N×N）。
+
+    :return: (rows, cols)
+    """
+    side = math.isqrt(tile_count)
+    if side * side != tile_count:
+        raise ValueError(f"瓦片数量 {tile_count} 无法组成 N×N 网格")
+    return side, side
+
+
+class StreamingPngWriter:
+    """
+    逐行写出 RGB PNG 文件，内存中只保留当前条带和 zlib 压缩状态。
+
+    每行使用 None 过滤器（filter type 0），压缩率略低于 Pillow 的自适应过滤，
+    但不需要持有整幅图像，适合 8d 及以上级别的超大合成图。
+    """
+
+    def __init__(self, path, width, height, compress_level=6):
+        """
+        :param path: 输出文件路径
+        :param width: 图像宽度
+        :param height: 图像高度
+        :param compress_level: zlib 压缩级别 0~9
+        """
+        self.path = path
+        self.width = width
+        self.height = height
+        self.stride = width * 3
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self._file = open(path, 'wb')
+        self._file.write(PNG_SIGNATURE)
+        # 位深 8，颜色类型 2 (RGB)，压缩/过滤/隔行方式均为 0
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def _write_chunk(self, chunk_type, data):
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type)) & 0xffffffff))
+
+    def write_strip(self, strip):
+        """
+        写入一个条带。
+
+        :param strip: 宽度等于图像宽度的 RGB 图像
+        """
+        if strip.mode != 'RGB' or strip.size[0] != self.width:
+            raise ValueError(f"条带尺寸/模式不匹配: {strip.mode} {strip.size}")
+        raw = strip.tobytes()
+        rows = strip.size[1]
+        filtered = bytearray()
+        for row in range(rows):
+            filtered.append(0)
+            filtered += raw[row * self.stride:(row + 1) * self.stride]
+        compressed = self._compressor.compress(bytes(filtered))
+        if compressed:
+            self._write_chunk(b'IDAT', compressed)
+        self.rows_written += rows
+
+    def close(self):
+        """写入剩余压缩数据和 IEND"""
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"写入行数 {self.rows_written} 与图像高度 {self.height} 不一致")
+            self._write_chunk(b'IDAT', self._compressor.flush())
+            self._write_chunk(b'IEND', b'')
+        finally:
+            self._file.close()
+
+    def abort(self):
+        """放弃写入（调用方负责删除不完整的文件）"""
+        if not self._file.closed:
+            self._file.close()
+
+
+class TileGridComposer:
+    """
+    任意 N×N 级别的瓦片合成器。
+
+    按行条带合成：每次只解码一行瓦片并粘贴到一个条带中，随即写出，
+    内存占用只与网格宽度相关，不随行数增长。
+    """
+
+    def __init__(self, rows, cols, tile_size=550):
+        self.rows = rows
+        self.cols = cols
+        self.tile_size = tile_size
+
+    @property
+    def size(self):
+        return self.cols * self.tile_size, self.rows * self.tile_size
+
+    def compose_row(self, row_tiles):
+        """
+        将一行瓦片合成为条带。
+
+        :param row_tiles: 本行的瓦片文件路径（或可被 Image.open 打开的对象），从左到右
+        :return: RGB 条带图像
+        """
+        strip = Image.new('RGB', (self.cols * self.tile_size, self.tile_size))
+        for col, tile in enumerate(row_tiles):
+            with Image.open(tile) as tile_img:
+                strip.paste(tile_img, (col * self.tile_size, 0))
+        return strip
+
+    def compose_to_png(self, tile_paths, output_path, compress_level=6):
+        """
+        按行条带合成并流式写出 PNG。
+
+        :param tile_paths: 按行优先顺序排列的瓦片路径
+        :param output_path: 输出 PNG 路径
+        """
+        width, height = self.size
+        writer = StreamingPngWriter(output_path, width, height, compress_level=compress_level)
+        try:
+            for row in range(self.rows):
+                row_tiles = tile_paths[row * self.cols:(row + 1) * self.cols]
+                strip = self.compose_row(row_tiles)
+                writer.write_strip(strip)
+                strip.close()
+            writer.close()
+        except BaseException:
+            writer.abort()
+            raise
+        logger.info(f"已按条带合成 {self.rows}x{self.cols} 瓦片: {output_path}")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : tile_validator
+# @Description:
+#
+#
+import hashlib
+import struct
+import zlib
+import logging
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SOI = b'\xff\xd8\xff'
+JPEG_EOI = b'\xff\xd9'
+
+
+class InvalidTileError(requests.RequestException):
+    """下载的图片数据无效（结构损坏或为占位图），只重试当前瓦片"""
+
+
+class CorruptTileError(InvalidTileError):
+    """图片结构损坏：签名不符、块校验失败或数据被截断"""
+
+
+class PlaceholderTileError(InvalidTileError):
+    """服务器以 200 返回了已知的占位图（如 NICT 的 "No Image"）"""
+
+
+class TileValidator:
+    """
+    边下载边校验图片数据。
+
+    PNG 逐块解析长度、类型和 CRC，必须以 IHDR 开始、以 IEND 结束；JPEG 检查 SOI 和 EOI 标记。
+    同时计算 SHA-1，与已知占位图的哈希比较。签名不符时在第一个数据块就失败，不必下载完整响应。
+    """
+
+    def __init__(self, placeholder_hashes=()):
+        """
+        :param placeholder_hashes: 已知占位图的 SHA-1（十六进制），可从日志中记录的 digest 收集
+        """
+        self.placeholder_hashes = set(placeholder_hashes)
+        self.kind = None
+        self.received = 0
+        self._sha1 = hashlib.sha1()
+        self._head = bytearray()
+        self._tail = b''
+        # PNG 解析状态：header（块长度+类型）/ data / crc
+        self._state = 'header'
+        self._pending = bytearray()
+        self._chunk_type = None
+        self._chunk_remaining = 0
+        self._chunk_crc = 0
+        self._chunk_count = 0
+        self._iend = False
+
+    @property
+    def digest(self):
+        return self._sha1.hexdigest()
+
+    def feed(self, data):
+        """校验一个数据块，结构错误时抛出 CorruptTileError"""
+        self._sha1.update(data)
+        self.received += len(data)
+        if self.kind is None:
+            self._head += data
+            if len(self._head) < len(PNG_SIGNATURE):
+                return
+            head = bytes(self._head)
+            self._head = bytearray()
+            if head.startswith(PNG_SIGNATURE):
+                self.kind = 'png'
+                data = head[len(PNG_SIGNATURE):]
+            elif head.startswith(JPEG_SOI):
+                self.kind = 'jpeg'
+                data = head
+            else:
+                raise CorruptTileError(f"不是 PNG/JPEG 数据: {head[:16]!r}")
+        if self.kind == 'png':
+            self._feed_png(data)
+        else:
+            self._tail = (self._tail + data)[-len(JPEG_EOI):]
+
+    def _feed_png(self, data):
+        pos = 0
+        size = len(data)
+        while pos < size and not self._iend:
+            if self._state == 'header':
+                take = data[pos:pos + 8 - len(self._pending)]
+                self._pending += take
+                pos += len(take)
+                if len(self._pending) < 8:
+                    continue
+                length, chunk_type = struct.unpack('>I4s', bytes(self._pending))
+                self._pending = bytearray()
+                if not chunk_type.isalpha() or length > 0x7fffffff:
+                    raise CorruptTileError(f"PNG 块头无效: {chunk_type!r} ({length} 字节)")
+                if self._chunk_count == 0 and chunk_type != b'IHDR':
+                    raise CorruptTileError(f"PNG 第一个块不是 IHDR: {chunk_type!r}")
+                self._chunk_type = chunk_type
+                self._chunk_remaining = length
+                self._chunk_crc = zlib.crc32(chunk_type)
+                self._state = 'data' if length else 'crc'
+            elif self._state == 'data':
+                take = data[pos:pos + self._chunk_remaining]
+                self._chunk_crc = zlib.crc32(take, self._chunk_crc)
+                self._chunk_remaining -= len(take)
+                pos += len(take)
+                if not self._chunk_remaining:
+                    self._state = 'crc'
+            else:
+                take = data[pos:pos + 4 - len(self._pending)]
+                self._pending += take
+                pos += len(take)
+                if len(self._pending) < 4:
+                    continue
+                (expected_crc,) = struct.unpack('>I', bytes(self._pending))
+                self._pending = bytearray()
+                if expected_crc != self._chunk_crc & 0xffffffff:
+                    raise CorruptTileError(f"PNG 块 {self._chunk_type!r} CRC 校验失败")
+                self._chunk_count += 1
+                self._iend = self._chunk_type == b'IEND'
+                self._state = 'header'
+
+    def finish(self):
+        """数据接收完毕后的最终检查，无效时抛出 CorruptTileError / PlaceholderTileError"""
+        if self.kind is None:
+            raise CorruptTileError(f"图片数据过短: {self.received} 字节")
+        if self.kind == 'png' and not self._iend:
+            raise CorruptTileError("PNG 数据被截断（缺少 IEND）")
+        if self.kind == 'jpeg' and self._tail != JPEG_EOI:
+            raise CorruptTileError("JPEG 数据被截断（缺少 EOI）")
+        if self.digest in self.placeholder_hashes:
+            raise PlaceholderTileError(f"服务器返回了占位图 (sha1={self.digest})")
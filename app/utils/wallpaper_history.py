@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# _*_ coding:utf-8 _*_
+#
+# @Version : 1.0
+# @Time    : 2026/10/18
+# @Author  : 圈圈烃
+# @File    : wallpaper_history
+# @Description:
+#
+#
+import datetime
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_NAME = '.pod_history.sqlite3'
+
+# 历史壁纸文件名中的时次：himawari8_{level}x{level}_YYYY_MM_DD_HH_MM.png
+HIMAWARI_NAME_PATTERN = re.compile(r'^himawari8_(\d+)x\1_(\d{4}_\d{2}_\d{2}_\d{2}_\d{2})\.\w+$')
+# moon_{自年初起的小时数}.jpg
+MOON_NAME_PATTERN = re.compile(r'^moon_(\d+)\.\w+$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    slot_time INTEGER NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    hash TEXT
+);
+CREATE INDEX IF NOT EXISTS frames_slot_time ON frames (slot_time);
+CREATE INDEX IF NOT EXISTS frames_source_slot_time ON frames (source, slot_time);
+"""
+
+
+def _to_timestamp(dt):
+    """UTC datetime（naive 视为 UTC）转为整数秒"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return int(dt.timestamp())
+
+
+def _from_timestamp(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).replace(tzinfo=None)
+
+
+def parse_history_name(img_name, now=None):
+    """
+    从历史壁纸文件名解析图片源和时次。
+
+    月相文件名只记录自年初起的小时数，按当前年份换算；超过当前时间时视为上一年。
+    :return: (source, slot_time)，无法识别时返回 None
+    """
+    match = HIMAWARI_NAME_PATTERN.match(img_name)
+    if match:
+        source = 'Earth-H8' if match.group(1) == '1' else 'Earth-H8-16'
+        return source, datetime.datetime.strptime(match.group(2), '%Y_%m_%d_%H_%M')
+    match = MOON_NAME_PATTERN.match(img_name)
+    if match:
+        now = now or datetime.datetime.utcnow()
+        hours = int(match.group(1)) - 1
+        slot_time = datetime.datetime(now.year, 1, 1) + datetime.timedelta(hours=hours)
+        if slot_time > now:
+            slot_time = datetime.datetime(now.year - 1, 1, 1) + datetime.timedelta(hours=hours)
+        return 'Moon-NASA', slot_time
+    return None
+
+
+class WallpaperHistory:
+    """
+    历史壁纸索引：用 SQLite 记录每一帧的图片源、时次、路径、大小和哈希，并按保留策略淘汰。
+
+    时次以整数秒保存并建有索引，按时间范围查询不需要遍历壁纸目录；
+    淘汰每次最多删除 evict_batch 帧，避免一次清理上万个文件阻塞下载线程，余下的留给后续调用。
+    """
+
+    def __init__(self, db_path, max_age_days=0, max_count=0, max_bytes=0, evict_batch=100):
+        """
+        :param db_path: 索引数据库路径
+        :param max_age_days: 按时次保留的天数，0 表示不限
+        :param max_count: 最多保留的帧数，0 表示不限
+        :param max_bytes: 最多占用的字节数，0 表示不限
+        :param evict_batch: 每次淘汰最多删除的帧数
+        """
+        self.db_path = db_path
+        self.max_age_days = max_age_days
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.evict_batch = evict_batch
+        self._lock = threading.Lock()
+        is_new = not os.path.exists(db_path)
+        # 由下载线程和界面线程共用，所有访问都在锁内进行
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+        if is_new:
+            self.import_folder(os.path.dirname(db_path))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def import_folder(self, folder):
+        """
+        索引目录中已有的历史壁纸（首次创建索引时调用一次），文件名无法识别的文件不会被收录，也不会被淘汰。
+
+        :return: 收录的帧数
+        """
+        rows = []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                parsed = parse_history_name(entry.name)
+                if parsed is None:
+                    continue
+                source, slot_time = parsed
+                rows.append((source, _to_timestamp(slot_time), entry.path, entry.stat().st_size, None))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO frames (source, slot_time, path, size, hash) VALUES (?, ?, ?, ?, ?)', rows)
+        if rows:
+            logger.info(f"已索引 {len(rows)} 张历史壁纸: {folder}")
+        return len(rows)
+
+    def add(self, source, path, slot_time=None, frame_hash=None):
+        """
+        记录一帧，并按保留策略淘汰最旧的帧（不会删除刚记录的这一帧）。
+
+        :param source: 图片源名称
+        :param path: 壁纸文件路径
+        :param slot_time: 图片时次（UTC），为空时从文件名解析，仍无法确定时使用当前时间
+        :param frame_hash: 帧的感知哈希（FrameHash），可为空
+        """
+        if slot_time is None:
+            parsed = parse_history_name(os.path.basename(path))
+            slot_time = parsed[1] if parsed is not None else datetime.datetime.utcnow()
+        hash_text = frame_hash.to_dict()['hash'] if frame_hash is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO frames (source, slot_time, path, size, hash) VALUES (?, ?, ?, ?, ?)',
+                (source, _to_timestamp(slot_time), path, os.path.getsize(path), hash_text))
+        self.evict(protect=path)
+
+    def query(self, start=None, end=None, source=None, limit=None):
+        """
+        按时次范围查询，结果按时次升序排列。
+
+        :param start: 起始时次（含），为空时不限
+        :param end: 结束时次（不含），为空时不限
+        :param source: 只查询某个图片源
+        :param limit: 最多返回的帧数
+        :return: [{'source', 'slot_time', 'path', 'size', 'hash'}, ...]
+        """
+        sql = 'SELECT source, slot_time, path, size, hash FROM frames WHERE 1=1'
+        params = []
+        if source is not None:
+            sql += ' AND source = ?'
+            params.append(source)
+        if start is not None:
+            sql += ' AND slot_time >= ?'
+            params.append(_to_timestamp(start))
+        if end is not None:
+            sql += ' AND slot_time < ?'
+            params.append(_to_timestamp(end))
+        sql += ' ORDER BY slot_time, id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row, slot_time=_from_timestamp(row['slot_time'])) for row in rows]
+
+    def latest(self, source=None):
+        """最新的一帧，没有时返回 None"""
+        sql = 'SELECT source, slot_time, path, size, hash FROM frames'
+        params = []
+        if source is not None:
+            sql += ' WHERE source = ?'
+            params.append(source)
+        sql += ' ORDER BY slot_time DESC, id DESC LIMIT 1'
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        return dict(row, slot_time=_from_timestamp(row['slot_time'])) if row is not None else None
+
+    def stats(self):
+        """{'count': 帧数, 'bytes': 总字节数}"""
+        with self._lock:
+            count, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM frames').fetchone()
+        return {'count': count, 'bytes': total}
+
+    def _eviction_candidates(self, protect):
+        """按保留策略需要淘汰的最旧的帧（最多 evict_batch 个），调用方需持有锁"""
+        batch = self.evict_batch
+        if self.max_age_days:
+            cutoff = time.time() - self.max_age_days * 86400
+            rows = self._conn.execute('SELECT id, path, size FROM frames WHERE slot_time < ? AND path != ? '
+                                      'ORDER BY slot_time, id LIMIT ?', (cutoff, protect, batch)).fetchall()
+            if rows:
+                return rows
+        count, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM frames').fetchone()
+        excess_count = count - self.max_count if self.max_count else 0
+        excess_bytes = total - self.max_bytes if self.max_bytes else 0
+        if excess_count <= 0 and excess_bytes <= 0:
+            return []
+        rows = self._conn.execute('SELECT id, path, size FROM frames WHERE path != ? ORDER BY slot_time, id LIMIT ?',
+                                  (protect, batch)).fetchall()
+        selected = []
+        for row in rows:
+            if excess_count <= 0 and excess_bytes <= 0:
+                break
+            selected.append(row)
+            excess_count -= 1
+            excess_bytes -= row['size']
+        return selected
+
+    def evict(self, protect=None):
+        """
+        按保留策略淘汰一批最旧的帧，同时删除文件；只删除文件已删除或已不存在的记录。
+
+        :param protect: 不淘汰的文件路径（如当前壁纸）
+        :return: 淘汰的帧数
+        """
+        with self._lock:
+            rows = self._eviction_candidates(protect or '')
+            if not rows:
+                return 0
+            removed = []
+            removed_bytes = 0
+            for row in rows:
+                try:
+                    os.remove(row['path'])
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    # 删除失败（如文件被占用）时保留索引记录，下次淘汰时重试，避免文件脱离索引无法回收
+                    logger.warning(f"删除历史壁纸 {row['path']} 失败: {e}")
+                    continue
+                removed.append(row)
+                removed_bytes += row['size']
+            with self._conn:
+                self._conn.executemany('DELETE FROM frames WHERE id = ?', [(row['id'],) for row in removed])
+        if removed:
+            logger.info(f"已淘汰 {len(removed)} 张历史壁纸，释放 {removed_bytes / 1024 / 1024:.1f} MB")
+        return len(removed)
@@ -11,6 +11,30 @@
 import datetime
 import math
 
+import logging
+
+from app.utils.image_pipeline import CropStage
+from app.utils.image_enhance import EnhanceStage, is_enhance_available
+
+logger = logging.getLogger(__name__)
+
+# Himawari 瓦片级别：{level}d 目录，每个级别为 level×level 个 550 像素瓦片（20d 为 11000×11000）
+HIMAWARI_LEVELS = [1, 2, 4, 8, 16, 20]
+HIMAWARI_TILE_SIZE = 550
+
+# 各图片源的发布周期和发布延迟（分钟）
+# Himawari 每 10 分钟一个时次，通常在时次之后 15~20 分钟发布；
+# NASA 月相为预先生成的逐小时帧；SDO 最新图片约每 15 分钟更新一次
+SOURCE_CADENCES = {
+    'Earth-H8': {'period': 10, 'latency': 20},
+    'Earth-H8-16': {'period': 10, 'latency': 20},
+    'Moon-NASA': {'period': 60, 'latency': 0},
+    'Sun-NASA': {'period': 15, 'latency': 0},
+}
+
+# SDO 太阳图片底部 985 像素以下为说明文字
+SDO_CAPTION_TOP = 985
+
 
 def round_down_time(dt):
     """
@@ -24,12 +48,30 @@ def round_down_time(dt):
     return rounded
 
 
-def get_earth_h8_img_url():
+def is_cacheable_url(url):
     """
-    获取 Himawari 8 地球单张图片 URL 和名称
+    判断 URL 对应的内容是否固定不变，可以放入瓦片缓存。
+    Himawari 瓦片 URL 由时间、级别和 x/y 唯一确定；SDO 等固定 URL 的内容会随时间变化，不能缓存。
+    """
+    return 'himawari' in url and '/img/D531106/' in url
+
+
+def get_default_h8_slot():
+    """
+    估算 Himawari 8 最新时次：当前 UTC 时间减去 30 分钟并向下取整到 10 分钟。
+    无法探测实际发布情况时作为兜底。
     """
     utc_time = datetime.datetime.utcnow() - datetime.timedelta(minutes=30)  # 获取GMT时间并减去30分钟
-    rounded_time = round_down_time(utc_time)
+    return round_down_time(utc_time)
+
+
+def get_earth_h8_img_url(slot_time=None):
+    """
+    获取 Himawari 8 地球单张图片 URL 和名称
+
+    :param slot_time: 图片时次（UTC），为空时使用 get_default_h8_slot 估算
+    """
+    rounded_time = round_down_time(slot_time) if slot_time else get_default_h8_slot()
     utc_time_str = rounded_time.strftime("%Y/%m/%d/%H%M")  # 时间格式化
     img_name = f'himawari8_1x1_{rounded_time.strftime("%Y_%m_%d_%H_%M")}.png'
     # img_url = f'https://himawari8.nict.go.jp/img/D531106/1d/550/{utc_time_str}00_0_0.png'
@@ -37,32 +79,48 @@ def get_earth_h8_img_url():
     return [img_url], img_name, False
 
 
-def get_earth_h8_4x4_img_urls():
+def get_earth_h8_tile_urls(level=4, slot_time=None):
     """
-    获取 Himawari 8 地球 4x4 瓦片图片 URL 列表和名称
+    获取 Himawari 8 地球 N×N 瓦片图片 URL 列表和名称
+
+    :param level: 缩放级别，对应 NICT 的 {level}d 目录，生成 level×level 个 550 像素瓦片
+    :param slot_time: 图片时次（UTC），为空时使用 get_default_h8_slot 估算
     """
-    utc_time = datetime.datetime.utcnow() - datetime.timedelta(minutes=30)  # 获取GMT时间并减去30分钟
-    rounded_time = round_down_time(utc_time)
+    if level not in HIMAWARI_LEVELS:
+        raise ValueError(f"不支持的 Himawari 级别: {level}，可选: {HIMAWARI_LEVELS}")
+    rounded_time = round_down_time(slot_time) if slot_time else get_default_h8_slot()
     delat_utc_today = rounded_time.strftime("%Y/%m/%d/%H%M")  # 时间格式化
 
     img_urls = []
     # Himawari 8 images are typically 550x550 pixels per tile
-    # For a 4x4 grid, total size would be 2200x2200
-    for x in range(4):  # y corresponds to rows
-        for y in range(4):  # x corresponds to columns
-            # base_url = f'https://himawari8.nict.go.jp/img/D531106/4d/550/{delat_utc_today}00_{y}_{x}.png'
-            base_url = f'https://himawari8-dl.nict.go.jp/himawari.asia/img/D531106/4d/550/{delat_utc_today}00_{y}_{x}.png'
+    # 瓦片按行优先排列：URL 中第一个数字为列，第二个为行
+    for row in range(level):
+        for col in range(level):
+            # base_url = f'https://himawari8.nict.go.jp/img/D531106/{level}d/550/{delat_utc_today}00_{col}_{row}.png'
+            base_url = f'https://himawari8-dl.nict.go.jp/himawari.asia/img/D531106/{level}d/550/{delat_utc_today}00_{col}_{row}.png'
             img_urls.append(base_url)
-    img_name = f'himawari8_4x4_{rounded_time.strftime("%Y_%m_%d_%H_%M")}.png'
+    img_name = f'himawari8_{level}x{level}_{rounded_time.strftime("%Y_%m_%d_%H_%M")}.png'
     return img_urls, img_name, True  # True indicates that these tiles need to be combined
 
 
-def get_moon_nasa_img_url():
+def get_earth_h8_4x4_img_urls(slot_time=None):
+    """
+    获取 Himawari 8 地球 4x4 瓦片图片 URL 列表和名称
+
+    :param slot_time: 图片时次（UTC），为空时使用 get_default_h8_slot 估算
+    """
+    return get_earth_h8_tile_urls(4, slot_time)
+
+
+def get_moon_nasa_img_url(utc_time=None):
     """
     获取 NASA 月球图片 URL 和名称
+
+    :param utc_time: 需要的图片时间（UTC），为空时使用当前时间。月相帧是预先生成的，可以提前获取
     """
-    year = datetime.datetime.utcnow().year
-    time_diff = datetime.datetime.utcnow() - datetime.datetime(year, 1, 1, 0)
+    utc_time = utc_time or datetime.datetime.utcnow()
+    year = utc_time.year
+    time_diff = utc_time - datetime.datetime(year, 1, 1, 0)
     time_diff_hours = math.floor(time_diff.days * 24 + time_diff.seconds / 3600) + 1
     img_name = f'moon_{time_diff_hours}.jpg'
     if year == 2024:
@@ -84,6 +142,35 @@ def get_sun_nasa_img_url():
     return [img_url], img_name, False
 
 
+def skips_unchanged_frames(image_source):
+    """
+    图片源是否按感知哈希跳过"看起来未变化"的新帧。
+
+    Himawari 每个时次都是一次新的观测，云层在 10 分钟内只移动几个像素，缩小到 8×8 的 dHash
+    分辨不出来，阈值为 0 也会被当成同一帧而跳过；其新帧已由时次（文件名）区分，因此不做感知跳过。
+    """
+    return image_source not in ('Earth-H8', 'Earth-H8-16')
+
+
+def get_source_stages(image_source, enhance=None):
+    """
+    图片源声明的后处理阶段（合成之后、编码之前执行），见 image_pipeline。
+    填充等与平台相关的阶段由 AutoWallpaperSpider 自行追加。
+
+    :param enhance: Himawari 图像增强参数（传给 EnhanceStage），为空时不增强
+    """
+    if image_source == 'Sun-NASA':
+        # 裁掉底部说明文字：1024x1024 -> 1024x985
+        return [CropStage(bottom=SDO_CAPTION_TOP)]
+    if image_source in ('Earth-H8', 'Earth-H8-16') and enhance is not None:
+        if not is_enhance_available():
+            logger.warning("未安装 numpy，跳过 Himawari 图像增强。")
+            return []
+        # 原始 Himawari 图像偏暗、对比度低
+        return [EnhanceStage(**enhance)]
+    return []
+
+
 if __name__ == '__main__':
     img_url, img_name, img_fill = get_earth_h8_4x4_img_urls()
     print(img_url, img_name, img_fill)
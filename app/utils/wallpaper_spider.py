@@ -9,13 +9,28 @@
 #
 #
 import requests
+import io
 import os
+import shutil
 import time
+import threading
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from PIL import Image
 import sys  # 导入 sys 模块用于判断操作系统
 import subprocess  # 导入 subprocess 用于执行外部命令，如 AppleScript、gsettings
 import logging
 
+from app.utils.http_session import create_http_session
+from app.utils.wallpaper_sources import is_cacheable_url, HIMAWARI_TILE_SIZE
+from app.utils.tile_grid import TileGridComposer, StreamingPngWriter, get_grid_shape
+from app.utils.image_pipeline import ImagePipeline, ResizeStage, FillStage
+from app.utils.image_encoder import ImageEncoder
+from app.utils.metrics import metrics
+from app.utils.retry_policy import RetryPolicy, CircuitOpenError
+from app.utils.tile_validator import TileValidator, InvalidTileError, CorruptTileError
+from app.utils.frame_hash import dhash, dhash_file
+
 logger = logging.getLogger(__name__)
 
 # 判断操作系统
@@ -39,8 +54,30 @@ else:
     print("警告：当前操作系统既非 Windows、macOS 也非 Linux。壁纸设置功能可能无法使用。")
 
 
+# 瓦片数量超过该值（即 4x4 以上级别）时按条带合成，内存占用不随网格增长
+STRIP_COMPOSE_MIN_TILES = 16
+
+
+class IncompleteDownloadError(requests.RequestException):
+    """下载的数据长度与 Content-Length 不一致"""
+
+
+class DownloadCancelledError(requests.RequestException):
+    """下载被主动取消"""
+
+
+# _fetch_once 的返回状态
+DOWNLOADED = 'downloaded'
+NOT_MODIFIED = 'not_modified'
+
+
 class AutoWallpaperSpider:
-    def __init__(self, img_urls, img_name, wallpaper_dir, img_fill=False):
+    def __init__(self, img_urls, img_name, wallpaper_dir, img_fill=False, max_workers=4, session=None,
+                 chunk_size=64 * 1024, validator_cache=None, tile_cache=None, retry_policy=None,
+                 circuit_breakers=None, mirrors=None, in_memory=False, stages=None,
+                 encoder=None, screen_size=None, resample='lanczos', resize_mode=None, render_to_memory=False,
+                 validate_tiles=True, placeholder_hashes=None, frame_hashes=None, fill_screen=None,
+                 archive=None, cancel_event=None):
         """
         初始化 AutoWallpaperSpider 类。
 
@@ -48,18 +85,92 @@ class AutoWallpaperSpider:
         :param img_name: 最终壁纸文件名称
         :param wallpaper_dir: 壁纸存储目录
         :param img_fill: 是否填充图像以匹配屏幕分辨率
+        :param max_workers: 并发下载瓦片的最大线程数
+        :param session: 共享的 requests.Session，为空时为本次运行单独创建
+        :param chunk_size: 流式写入磁盘时每个数据块的字节数
+        :param validator_cache: ValidatorCache 实例，用于固定 URL 图片源的条件请求
+        :param tile_cache: TileCache 实例，用于缓存内容固定的瓦片（如 Himawari）
+        :param retry_policy: RetryPolicy 实例，为空时使用默认策略
+        :param circuit_breakers: CircuitBreakerRegistry 实例，按主机熔断
+        :param mirrors: MirrorRegistry 实例，为空时不使用镜像对冲
+        :param in_memory: 瓦片保存在内存缓冲区中直接解码，不写临时文件
+        :param stages: 图片源声明的后处理阶段（见 wallpaper_sources.get_source_stages）
+        :param encoder: ImageEncoder 实例，为空时按 img_name 的扩展名选择格式；img_name 的扩展名随编码器调整
+        :param screen_size: 屏幕物理分辨率 (width, height)，由界面线程通过 Qt 读取；不为空时大图缩小到屏幕尺寸再交给系统
+        :param resample: 缩小时使用的重采样滤镜，见 image_pipeline.RESAMPLE_FILTERS
+        :param resize_mode: 缩小方式 'fit' / 'cover'，为空时按平台和 img_fill 决定
+        :param render_to_memory: 处理结果保留在 self.image 中，不编码写出（供多显示器渲染器使用）
+        :param validate_tiles: 边下载边校验 PNG/JPEG 结构，损坏或占位的瓦片单独重试
+        :param placeholder_hashes: 已知占位图的 SHA-1 集合
+        :param frame_hashes: FrameHashStore 实例，新帧与当前壁纸看起来相同时跳过编码和系统壁纸调用
+        :param fill_screen: 是否居中填充到屏幕分辨率，为空时按平台和 img_fill 决定（Windows 且 img_fill）
+        :param archive: FrameArchive 实例，下载的原始瓦片/图片按内容哈希存入归档，结果见 source_blobs
+        :param cancel_event: threading.Event，置位后在下一个数据块、重试等待或写出文件之前抛出 DownloadCancelledError
         """
         # 确保 img_urls 总是列表
         self.img_urls = [img_urls] if isinstance(img_urls, str) else img_urls
-        self.img_name = img_name
+        self.encoder = encoder if encoder is not None else ImageEncoder.for_name(img_name)
+        self.img_name = self.encoder.apply_extension(img_name)
         self.img_fill = img_fill
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.validator_cache = validator_cache
+        self.tile_cache = tile_cache
+        # 属于瓦片缓存的文件，清理临时文件时不能删除
+        self._cached_paths = set()
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.circuit_breakers = circuit_breakers
+        self.mirrors = mirrors
+        self.in_memory = in_memory
+        self._hedge_executor = None
+        # 本次下载得到的 ETag / Last-Modified，壁纸设置成功后才写入缓存
+        self._validators = {}
+        # 服务器返回 304 时置为 True，后续流程全部跳过
+        self.not_modified = False
+        # 优先使用调用方持有的长连接会话，以便在多次刷新之间复用连接
+        self.session = session if session is not None else create_http_session(pool_size=max(1, len(self.img_urls)))
         self.wallpaper_dir = wallpaper_dir
         self.wallpaper_paths = []
         # self.wallpaper_path 在 merge_images 中确定最终路径
         self.wallpaper_path = ""
-        self.grid_rows = 4
-        self.grid_cols = 4
-        self.tile_size = 550
+        # 网格行列数由瓦片数量决定，支持 Himawari 任意 N×N 级别
+        if len(self.img_urls) > 1:
+            self.grid_rows, self.grid_cols = get_grid_shape(len(self.img_urls))
+        else:
+            self.grid_rows = self.grid_cols = 1
+        self.tile_size = HIMAWARI_TILE_SIZE
+        # 瓦片流水线各阶段耗时（秒），见 download_and_merge
+        self.timings = {}
+        self.render_to_memory = render_to_memory
+        self.validate_tiles = validate_tiles
+        self.placeholder_hashes = set(placeholder_hashes or ())
+        self.frame_hashes = frame_hashes
+        # 最终帧的感知哈希；与当前壁纸相同时 unchanged 置为 True，后续流程全部跳过
+        self.frame_hash = None
+        self.unchanged = False
+        # 与新帧看起来相同的当前壁纸路径
+        self.unchanged_path = None
+        self.archive = archive
+        self.cancel_event = cancel_event
+        # 各瓦片/图片在归档中的内容哈希（按 img_urls 顺序），全部下载成功后才完整
+        self.source_blobs = [None] * len(self.img_urls)
+        # render_to_memory 模式下的处理结果
+        self.image = None
+        # 后处理阶段：图片源声明的阶段 + 缩小到屏幕分辨率 + Windows 的 img_fill 模式需要的居中填充
+        # macOS/Linux 的填充模式在 set_desktop_wallpaper 中通过各自命令控制
+        stages = list(stages or [])
+        if screen_size is not None:
+            # macOS 的 fill、GNOME 的 zoom 样式会铺满屏幕，需要保留覆盖整个屏幕的分辨率
+            if resize_mode is None:
+                resize_mode = 'cover' if self.img_fill and (IS_MACOS or IS_LINUX) else 'fit'
+            stages.append(ResizeStage(screen_size, mode=resize_mode, resample=resample))
+        if fill_screen is None:
+            fill_screen = IS_WINDOWS and self.img_fill and not render_to_memory
+        if fill_screen:
+            if screen_size is None:
+                screen_size = (win32api.GetSystemMetrics(0), win32api.GetSystemMetrics(1))
+            stages.append(FillStage(screen_size))
+        self.pipeline = ImagePipeline(stages)
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
@@ -74,40 +185,538 @@ class AutoWallpaperSpider:
         os.makedirs(self.wallpaper_dir, exist_ok=True)
         print(f"壁纸存储目录: {self.wallpaper_dir}")
 
-    def download_images(self, max_attempts=10):
-        """下载图片，支持失败重试"""
-        print("开始图片下载过程...")
-        self.wallpaper_paths = []
+    def _check_cancelled(self):
+        """任务已被取消时抛出 DownloadCancelledError；在每次写出文件和设置壁纸之前调用"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise DownloadCancelledError("刷新任务已取消")
 
-        for index, img_url in enumerate(self.img_urls):
-            temp_path = os.path.join(
-                self.wallpaper_dir,
-                f"temp_{index}_{self.img_name}"
-            )
-            print(f"正在下载图片: {img_url}")
+    def _download_tile(self, index, img_url):
+        """
+        下载单张图片/瓦片，失败时按重试策略只重试当前瓦片。
 
-            for attempt in range(1, max_attempts + 1):
-                print(f"尝试下载图片 ({attempt}/{max_attempts})...")
-                try:
-                    response = requests.get(img_url, timeout=20, verify=False, headers=self.headers)
+        :param index: 瓦片序号，用于确定临时文件名及其在网格中的位置
+        :param img_url: 图片 URL
+        :return: 下载后的临时文件路径；内存模式下为 BytesIO
+        """
+        temp_path = os.path.join(
+            self.wallpaper_dir,
+            f"temp_{index}_{self.img_name}"
+        )
+        # 内存模式：瓦片直接从下载缓冲区交给解码器，不产生临时文件
+        temp_target = io.BytesIO() if self.in_memory else temp_path
+        use_cache = self.tile_cache is not None and is_cacheable_url(img_url)
+        if use_cache:
+            cached_path = self.tile_cache.get(img_url)
+            if cached_path is not None:
+                print(f"瓦片缓存命中 [{index}]: {img_url}")
+                self._cached_paths.add(cached_path)
+                return cached_path
+
+        print(f"正在下载图片: {img_url}")
+        request_headers = self._build_request_headers(img_url)
+
+        max_attempts = self.retry_policy.max_attempts
+        # 每个瓦片从开始下载起单独计算截止时间：16d/20d 有数百个瓦片，共享的截止时间会在整体耗时较长时
+        # 让排在后面的瓦片一次失败就放弃整次刷新
+        deadline = self.retry_policy.start()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._check_cancelled()
+            print(f"尝试下载图片 [{index}] ({attempt}/{max_attempts})...")
+            try:
+                status, validators, result = self._fetch_with_hedge(img_url, temp_target, request_headers)
+                if status == NOT_MODIFIED:
+                    print(f"图片未修改 (304): {img_url}")
+                    return None
+                if self._uses_conditional_requests():
+                    self._validators[img_url] = validators
+
+                if self.in_memory:
+                    # 内存模式下不写入瓦片缓存，唯一的磁盘写入是最终壁纸
+                    result.seek(0)
+                    print(f"成功下载图片到内存 [{index}]: {img_url}")
+                    return result
+                if use_cache:
+                    result = self.tile_cache.put(img_url, result)
+                    self._cached_paths.add(result)
+                print(f"成功下载图片到: {result}")
+                return result
+
+            except CircuitOpenError as e:
+                # 主机已知不可用时直接失败，不再占用下载线程
+                print(f"下载失败 [{index}]: {e}")
+                raise
+            except requests.RequestException as e:
+                # 任务被取消导致的中断不再重试
+                self._check_cancelled()
+                print(f"下载失败 [{index}]: {e}")
+                delay = self.retry_policy.next_delay(attempt, deadline)
+                if delay is None:
+                    print(f"在 {attempt} 次尝试后放弃下载 {img_url}。")
+                    raise  # 达到最大重试次数或总截止时间，抛出异常
+                print(f"{delay:.1f} 秒后重试...")
+                if self.cancel_event is not None:
+                    # 等待期间被取消时立即结束，不必等满重试间隔
+                    self.cancel_event.wait(delay)
+                else:
+                    time.sleep(delay)
+
+    def _fetch_once(self, url, target_path, headers, cancel_event=None):
+        """
+        发起一次请求并流式写入 target_path，同时更新熔断器和镜像延迟统计。
+
+        :return: (状态, 校验器)，状态为 DOWNLOADED 或 NOT_MODIFIED
+        """
+        breaker = self.circuit_breakers.for_url(url) if self.circuit_breakers is not None else None
+        if breaker is not None and not breaker.allow_request():
+            raise CircuitOpenError(f"主机 {breaker.host} 处于熔断状态，跳过下载: {url}")
+        mirror_set = self.mirrors.find(url) if self.mirrors is not None else None
+
+        started = time.monotonic()
+        try:
+            with self.session.get(url, timeout=self.retry_policy.timeout, verify=False,
+                                  headers=headers, stream=True) as response:
+                if response.status_code == 304:
+                    status, validators = NOT_MODIFIED, None
+                else:
                     response.raise_for_status()  # 检查HTTP响应状态码
+                    self._stream_to_file(response, target_path, cancel_event)
+                    status = DOWNLOADED
+                    validators = self.validator_cache.extract(response) if self.validator_cache is not None else None
+            if breaker is not None:
+                breaker.record_success()
+            if mirror_set is not None:
+                mirror_set.record(url, latency=time.monotonic() - started, ok=True)
+        except DownloadCancelledError:
+            # 对冲请求中落败的一方被取消，不代表主机有问题
+            if breaker is not None:
+                breaker.record_success()
+            raise
+        except requests.RequestException as e:
+            host_failure = self._is_host_failure(e)
+            if breaker is not None:
+                # 4xx（如时次尚未发布的 404）说明主机本身可用，不计入熔断
+                if host_failure:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if mirror_set is not None and host_failure:
+                mirror_set.record(url, ok=False)
+            raise
+        finally:
+            # 探测请求以任何方式结束（如解码、校验错误）都要释放名额，避免主机永远停留在 half_open
+            if breaker is not None:
+                breaker.release_probe()
+        return status, validators
 
-                    with open(temp_path, 'wb') as file:
-                        file.write(response.content)
+    def _fetch_with_hedge(self, img_url, target, headers):
+        """
+        下载图片；URL 属于镜像组时先请求最快的镜像，
+        超过其延迟分位数阈值仍未完成（或已失败）时向另一个镜像发起对冲请求，先成功者胜出。
 
-                    self.wallpaper_paths.append(temp_path)
-                    print(f"成功下载图片到: {temp_path}")
-                    break  # 下载成功，跳出重试循环
+        :param target: 目标文件路径或 BytesIO
+        :return: (状态, 校验器, 实际写入的目标)
+        """
+        mirror_set = self.mirrors.find(img_url) if self.mirrors is not None else None
+        if mirror_set is None or len(mirror_set.prefixes) < 2 or self._hedge_executor is None:
+            return self._fetch_once(img_url, target, headers) + (target,)
+
+        prefixes = mirror_set.ordered()
+        candidates = [mirror_set.rewrite(img_url, prefix) for prefix in prefixes[:2]]
+        if isinstance(target, str):
+            part_paths = [f"{target}.m{i}" for i in range(len(candidates))]
+        else:
+            part_paths = [io.BytesIO() for _ in candidates]
+        cancel_event = threading.Event()
+        futures = {}
+
+        def submit(i):
+            future = self._hedge_executor.submit(
+                self._fetch_once, candidates[i], part_paths[i], headers, cancel_event
+            )
+            futures[future] = i
+
+        submit(0)
+        done, _ = wait(futures, timeout=mirror_set.hedge_delay(prefixes[0]))
+        first_failed = bool(done) and next(iter(done)).exception() is not None
+        if not done or first_failed:
+            if not done:
+                print(f"镜像 {prefixes[0]} 超过 {mirror_set.hedge_delay(prefixes[0]):.1f} 秒未完成，"
+                      f"向 {prefixes[1]} 发起对冲请求")
+            submit(1)
+
+        last_error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is not None:
+                    # 优先抛出非熔断的异常，保证还能按重试策略重试
+                    if last_error is None or isinstance(last_error, CircuitOpenError):
+                        last_error = error
+                    continue
+                # 胜出：取消其他请求，清理落败者可能写出的文件
+                cancel_event.set()
+                winner = futures[future]
+                for other, i in futures.items():
+                    if i != winner:
+                        other.add_done_callback(lambda _, path=part_paths[i]: self._remove_quietly(path))
+                status, validators = future.result()
+                if status == DOWNLOADED and isinstance(target, str):
+                    os.replace(part_paths[winner], target)
+                    return status, validators, target
+                return status, validators, part_paths[winner]
+        raise last_error
+
+    @staticmethod
+    def _is_host_failure(error):
+        """判断异常是否意味着主机不可用（连接失败、超时、5xx、数据被截断或损坏）；占位图不算"""
+        if isinstance(error, requests.HTTPError):
+            response = error.response
+            return response is None or response.status_code >= 500 or response.status_code == 429
+        return isinstance(error, (requests.ConnectionError, requests.Timeout,
+                                  requests.exceptions.ChunkedEncodingError, IncompleteDownloadError,
+                                  CorruptTileError))
+
+    def _uses_conditional_requests(self):
+        """
+        是否使用条件请求：只有固定 URL 的单图源（如 SDO 太阳）需要。
+        瓦片和带时次的 URL 内容不会变化，记录它们的校验器只会让缓存文件无限增长。
+        """
+        return (self.validator_cache is not None and len(self.img_urls) == 1
+                and not is_cacheable_url(self.img_urls[0]))
+
+    def _build_request_headers(self, img_url):
+        """
+        生成请求头。对固定 URL 的单图源（如 SDO 太阳），
+        当前壁纸确实来自该 URL 时附带条件请求头，服务器未更新时返回 304。
+        """
+        headers = dict(self.headers)
+        if not self._uses_conditional_requests():
+            return headers
+        final_path = os.path.join(self.wallpaper_dir, self.img_name)
+        if self.validator_cache.is_current(self.img_urls, final_path):
+            headers.update(self.validator_cache.conditional_headers(img_url))
+            # 条件请求时不能声明 max-age=0，否则部分 CDN 会忽略校验器
+            headers.pop('Cache-Control', None)
+        return headers
+
+    def _stream_to_file(self, response, target_path, cancel_event=None):
+        """
+        将响应体按块流式写入磁盘，边接收边校验 Content-Length 和图片结构。
+        先写入 .part 文件，完整接收并校验通过后再替换为目标文件，避免留下半截图片或占位图。
 
-                except requests.RequestException as e:
-                    print(f"下载失败: {e}")
-                    if attempt == max_attempts:
-                        print(f"在 {max_attempts} 次尝试后放弃下载 {img_url}。")
-                        raise  # 达到最大重试次数，抛出异常
-                    print("2 秒后重试...")
-                    time.sleep(2)
+        :param response: 以 stream=True 发起的响应
+        :param target_path: 目标文件路径；为 BytesIO 时直接写入内存缓冲区
+        :param cancel_event: threading.Event，置位后中止接收（对冲请求落败时使用）
+        """
+        # 响应经过压缩时 Content-Length 是压缩后的长度，无法与解码后的字节数比较
+        expected = None
+        if not response.headers.get('Content-Encoding'):
+            content_length = response.headers.get('Content-Length')
+            if content_length and content_length.isdigit():
+                expected = int(content_length)
+        validator = TileValidator(self.placeholder_hashes) if self.validate_tiles else None
+
+        if not isinstance(target_path, str):
+            # 内存缓冲区：重试时先清空上一次写入的内容
+            target_path.seek(0)
+            target_path.truncate()
+            try:
+                self._copy_chunks(response, target_path, expected, cancel_event, validator)
+            except BaseException:
+                target_path.seek(0)
+                target_path.truncate()
+                raise
+            return
+
+        part_path = f"{target_path}.part"
+        try:
+            with open(part_path, 'wb') as file:
+                self._copy_chunks(response, file, expected, cancel_event, validator)
+            os.replace(part_path, target_path)
+        except BaseException:
+            self._remove_quietly(part_path)
+            raise
+
+    def _copy_chunks(self, response, file, expected, cancel_event, validator=None):
+        """按块复制响应体到 file，并校验接收字节数；validator 不为空时同时校验图片结构"""
+        try:
+            self._copy_validated_chunks(response, file, expected, cancel_event, validator)
+        except InvalidTileError as e:
+            e.response = response
+            metrics.incr('download.corrupt_tiles' if isinstance(e, CorruptTileError) else 'download.placeholder_tiles')
+            if validator is not None:
+                logger.warning(f"无效的图片数据 (sha1={validator.digest}): {response.url}: {e}")
+            raise
+
+    def _copy_validated_chunks(self, response, file, expected, cancel_event, validator):
+        received = 0
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            if not chunk:
+                continue
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadCancelledError("下载已取消", response=response)
+            self._check_cancelled()
+            received += len(chunk)
+            if expected is not None and received > expected:
+                raise IncompleteDownloadError(
+                    f"接收数据超出 Content-Length: {received} > {expected}", response=response
+                )
+            if validator is not None:
+                validator.feed(chunk)
+            file.write(chunk)
+        if expected is not None and received != expected:
+            raise IncompleteDownloadError(
+                f"图片数据不完整: 已接收 {received} 字节，预期 {expected} 字节", response=response
+            )
+        if validator is not None:
+            validator.finish()
+
+    def _iter_downloads(self):
+        """
+        并发下载所有图片/瓦片，按完成顺序逐个产出 (index, path)。
+        任一瓦片最终失败、或调用方提前关闭生成器时，取消剩余任务并清理临时文件。
+        """
+        workers = max(1, min(self.max_workers, len(self.img_urls)))
+        if self.mirrors is not None:
+            # 对冲请求使用独立线程池，每个瓦片最多同时占用两个连接
+            self._hedge_executor = ThreadPoolExecutor(max_workers=workers * 2, thread_name_prefix='pod-hedge')
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pod-download') as executor:
+                futures = {
+                    executor.submit(self._download_tile, index, img_url): index
+                    for index, img_url in enumerate(self.img_urls)
+                }
+                try:
+                    for future in as_completed(futures):
+                        yield futures[future], future.result()
+                except BaseException:
+                    # 任一瓦片最终失败：取消尚未开始的任务并清理已下载的临时文件
+                    # 已进入瓦片缓存的文件会保留，下次重试只需下载缺失的瓦片
+                    for pending in futures:
+                        pending.cancel()
+                    executor.shutdown(wait=True)
+                    for future, index in futures.items():
+                        if future.done() and not future.cancelled() and future.exception() is None:
+                            self._release_tile(future.result())
+                    raise
+        finally:
+            if self._hedge_executor is not None:
+                # 落败的对冲请求会在下一个数据块时退出，无需等待
+                self._hedge_executor.shutdown(wait=False)
+                self._hedge_executor = None
+            # 内存模式不写入瓦片缓存，也不回写索引
+            if self.tile_cache is not None and not self.in_memory:
+                self.tile_cache.flush()
+
+    def download_images(self):
+        """
+        并发下载图片，支持按瓦片失败重试。
+        下载结果按 img_urls 的顺序保存在 wallpaper_paths 中，保证 merge_images 能把瓦片放回正确的网格位置。
+        """
+        print(f"开始图片下载过程（并发数: {self.max_workers}）...")
+        self.wallpaper_paths = []
+        results = [None] * len(self.img_urls)
+        with closing(self._iter_downloads()) as downloads:
+            for index, path in downloads:
+                results[index] = path
+
+        if results and all(path is None for path in results):
+            self.not_modified = True
+            print("所有图片均未修改，沿用当前壁纸。")
+            return
+        self.wallpaper_paths = results
         print("所有图片/瓦片下载完成。")
 
+    def download_and_merge(self):
+        """
+        瓦片图源的流水线：下载与合成重叠进行。
+        每个瓦片到达后立即解码并粘贴到画布（或在整行到齐后写出条带），
+        最后一个瓦片到达后只剩少量合成和编码工作。各阶段耗时记录在 self.timings 中。
+        """
+        print(f"开始下载并合成瓦片（并发数: {self.max_workers}）...")
+        self.wallpaper_path = os.path.join(self.wallpaper_dir, self.img_name)  # 确定最终壁纸路径
+        # 条带先写入 .part 文件，当前壁纸在新帧完整写出前保持不变
+        part_path = f"{self.wallpaper_path}.part"
+
+        composer = TileGridComposer(self.grid_rows, self.grid_cols, self.tile_size)
+        use_strips = self._use_strips(composer.size)
+        writer = None
+        canvas = None
+        reduce_factor = 1
+        if use_strips:
+            width, height = composer.size
+            writer = StreamingPngWriter(part_path, width, height,
+                                        compress_level=self.encoder.png_compress_level)
+        else:
+            reduce_factor = self._tile_reduce_factor(composer.size)
+            canvas = self._new_canvas(reduce_factor)
+
+        tiles = [None] * len(self.img_urls)
+        arrived = [False] * len(self.img_urls)
+        next_row = 0
+        compose_busy = 0.0
+        last_busy = 0.0
+        started = time.monotonic()
+        last_arrival = started
+        try:
+            with closing(self._iter_downloads()) as downloads:
+                for index, tile in downloads:
+                    last_arrival = time.monotonic()
+                    tiles[index] = tile
+                    arrived[index] = True
+                    if self.archive is not None:
+                        self.source_blobs[index] = self.archive.put(tile)
+                    if use_strips:
+                        # 条带必须按行顺序写出：从 next_row 开始，凡是整行到齐的都立即写出
+                        while next_row < self.grid_rows:
+                            row_range = range(next_row * self.grid_cols, (next_row + 1) * self.grid_cols)
+                            if not all(arrived[i] for i in row_range):
+                                break
+                            strip = composer.compose_row([tiles[i] for i in row_range])
+                            writer.write_strip(strip)
+                            strip.close()
+                            for i in row_range:
+                                self._release_tile(tiles[i])
+                                tiles[i] = None
+                            next_row += 1
+                    else:
+                        self._paste_tile(canvas, index, tile, reduce_factor)
+                        # 已粘贴的瓦片立即释放（删除临时文件或内存缓冲区）
+                        self._release_tile(tile)
+                        tiles[index] = None
+                    last_busy = time.monotonic() - last_arrival
+                    compose_busy += last_busy
+
+            tail_started = time.monotonic()
+            if use_strips:
+                writer.close()
+                self._check_cancelled()
+                os.replace(part_path, self.wallpaper_path)
+            else:
+                # 后处理阶段在同一幅画布上执行，只编码一次
+                self._finish_image(canvas)
+                canvas = None
+            finished = time.monotonic()
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            self._remove_quietly(part_path)
+            raise
+        finally:
+            if canvas is not None:
+                canvas.close()
+
+        self.wallpaper_paths = []
+
+        download_time = last_arrival - started
+        self.timings = {
+            'download': download_time,  # 从开始到最后一个瓦片到达
+            'compose_busy': compose_busy,  # 解码 + 粘贴的累计耗时
+            'compose_overlapped': compose_busy - last_busy,  # 在最后一个瓦片到达前完成的合成耗时
+            'tail': last_busy + finished - tail_started,  # 最后一个瓦片到达后的收尾（合成 + 后处理 + 编码写出）耗时
+            'total': finished - started,
+        }
+        for name, seconds in self.timings.items():
+            metrics.observe(f'pipeline.{name}', seconds)
+        print("瓦片流水线耗时: " + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in self.timings.items()))
+        print(f"图片已成功合并到: {self.wallpaper_path}")
+
+    def _remove_temp(self, path):
+        """删除本次运行产生的临时文件，瓦片缓存中的文件保留"""
+        if path in self._cached_paths:
+            return
+        self._remove_quietly(path)
+
+    def _release_tile(self, tile):
+        """释放已使用完的瓦片：临时文件删除，内存缓冲区关闭"""
+        if isinstance(tile, str):
+            self._remove_temp(tile)
+        elif tile is not None:
+            tile.close()
+
+    @staticmethod
+    def _remove_quietly(path):
+        """删除临时文件，忽略不存在等错误"""
+        if not isinstance(path, str):
+            return
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            print(f"清理临时文件 {path} 出错: {e}")
+
+    def _use_strips(self, size):
+        """
+        是否按行条带合成并流式写出：8d 及以上级别、PNG 输出，且没有需要整幅图像的后处理阶段。
+        """
+        return (not self.render_to_memory
+                and self.grid_rows * self.grid_cols > STRIP_COMPOSE_MIN_TILES
+                and self.encoder.output_format == 'png'
+                and self.pipeline.is_noop(size))
+
+    def _tile_reduce_factor(self, size):
+        """
+        合成前逐瓦片整数倍缩小的倍数：后处理的第一个阶段是缩小到屏幕分辨率时，瓦片先 reduce 再粘贴，
+        画布不必按原始分辨率分配（20d 级别为 11000×11000）。取瓦片边长的约数以保证拼接无缝。
+        """
+        factor = self.pipeline.reduce_factor(size)
+        return max(d for d in range(1, factor + 1) if self.tile_size % d == 0)
+
+    def _new_canvas(self, reduce_factor=1):
+        tile_size = self.tile_size // reduce_factor
+        return Image.new('RGB', (tile_size * self.grid_cols, tile_size * self.grid_rows))
+
+    def _paste_tile(self, canvas, index, tile, reduce_factor=1):
+        """将第 index 个瓦片（按 reduce_factor 缩小后）粘贴到画布的网格位置"""
+        tile_size = self.tile_size // reduce_factor
+        x = (index % self.grid_cols) * tile_size
+        y = (index // self.grid_cols) * tile_size
+        with Image.open(tile) as tile_img:
+            if reduce_factor > 1:
+                reduced = tile_img.reduce(reduce_factor)
+                canvas.paste(reduced, (x, y))
+                reduced.close()
+            else:
+                canvas.paste(tile_img, (x, y))
+
+    def _finish_image(self, img):
+        """在内存中依次执行后处理阶段，按配置的编码器编码一次写出最终壁纸"""
+        if self.render_to_memory:
+            img = self.pipeline.run(img)
+            img.load()  # 单张图片可能仍是惰性解码状态，源文件随后会被释放
+            self.image = img
+            return
+        try:
+            img = self.pipeline.run(img)
+            if self._is_unchanged_frame(img):
+                return
+            self._check_cancelled()
+            self.encoder.encode(img, self.wallpaper_path)
+        finally:
+            img.close()
+
+    def _is_unchanged_frame(self, img):
+        """计算最终帧的感知哈希；与当前壁纸看起来相同时标记 unchanged，跳过编码和系统壁纸调用"""
+        if self.frame_hashes is None:
+            return False
+        self.frame_hash = dhash(img)
+        self.unchanged_path = self.frame_hashes.is_unchanged(self.frame_hash)
+        if self.unchanged_path is None:
+            return False
+        self.unchanged = True
+        metrics.incr('wallpaper.unchanged_skips')
+        print("新帧与当前壁纸相同，跳过编码和壁纸设置。")
+        return True
+
+    @property
+    def is_tiled(self):
+        """是否为需要合并的多瓦片图源"""
+        return len(self.img_urls) > 1 and self.img_fill
+
     def merge_images(self):
         """
         如果 img_fill 为 True 且存在多个 URL，则将多张图片合并为网格布局。
@@ -127,158 +736,104 @@ class AutoWallpaperSpider:
                     print(f"删除已存在合并图片文件 {self.wallpaper_path} 出错: {e}")
                     raise
 
-            img_width = self.tile_size * self.grid_cols
-            img_height = self.tile_size * self.grid_rows
-
-            merged_img = Image.new('RGB', (img_width, img_height))
-
-            # 假定 wallpaper_paths 已经排序或者顺序正确
-            # 如果需要，这里可以添加排序逻辑，例如：
-            # self.wallpaper_paths.sort(key=lambda x: int(x.split('_')[1]))
-
-            for index, img_path in enumerate(self.wallpaper_paths):
+            composer = TileGridComposer(self.grid_rows, self.grid_cols, self.tile_size)
+            if self._use_strips(composer.size):
+                # 8d 及以上级别：按行条带合成并流式写出，避免同时持有整幅画布和全部瓦片
                 try:
-                    with Image.open(img_path) as from_image:
-                        x = (index % self.grid_cols) * self.tile_size
-                        y = (index // self.grid_cols) * self.tile_size
-                        merged_img.paste(from_image, (x, y))
-                except IOError as e:
-                    print(f"打开图片 {img_path} 进行合并时出错: {e}")
+                    composer.compose_to_png(self.wallpaper_paths, self.wallpaper_path,
+                                            compress_level=self.encoder.png_compress_level)
+                except (IOError, ValueError) as e:
+                    print(f"按条带合成图片时出错: {e}")
+                    self._remove_quietly(self.wallpaper_path)
                     raise
-
-            merged_img.save(self.wallpaper_path)
+            else:
+                self._merge_on_canvas()
             print(f"图片已成功合并到: {self.wallpaper_path}")
 
             # 清理临时文件
             for path in self.wallpaper_paths:
-                try:
-                    os.remove(path)
-                    print(f"已清理临时文件: {path}")
-                except OSError as e:
-                    print(f"清理临时文件 {path} 出错: {e}")
+                self._release_tile(path)
         else:  # 处理单张图片的情况
-            if self.wallpaper_paths:
-                # 检查目标文件是否存在，如果存在则删除
-                if os.path.exists(self.wallpaper_path):
-                    try:
-                        os.remove(self.wallpaper_path)
-                        print(f"已删除已存在的最终图片文件: {self.wallpaper_path}")
-                    except OSError as e:
-                        print(f"删除已存在最终图片文件 {self.wallpaper_path} 出错: {e}")
-                        raise
-
-                # 只有当临时文件路径和最终目标路径不同时才重命名
-                if self.wallpaper_paths[0] != self.wallpaper_path:
-                    try:
-                        os.rename(self.wallpaper_paths[0], self.wallpaper_path)
-                        print(f"已将下载的图片重命名为最终路径: {self.wallpaper_path}")
-                    except OSError as e:
-                        print(f"重命名图片 {self.wallpaper_paths[0]} 到 {self.wallpaper_path} 出错: {e}")
-                        raise
-                else:
-                    print(f"图片已直接下载到最终路径: {self.wallpaper_path}，无需重命名。")
-            else:
-                print("没有可合并或设置的图片。")
-                raise RuntimeError("下载后未找到可用的图片路径。")
-
-    def fill_image(self):
-        """
-        如果需要，将图片填充至匹配桌面分辨率。
-        仅适用于 Windows 系统且 img_fill 为 True 时。
-        对于 macOS/Linux，如果需要填充，通常在系统壁纸设置中处理。
-        """
-        # 此处填充逻辑主要针对 Windows，macOS/Linux 可以在其各自的设置命令中选择填充模式
-        if not IS_WINDOWS or not self.img_fill:
-            if not IS_WINDOWS:
-                print("跳过图像填充：当前不是 Windows 系统。")
-            else:
-                print("跳过图像填充：img_fill 为 False。")
-            return
+            self._use_single_image()
 
-        if not self.wallpaper_path or not os.path.exists(self.wallpaper_path):
-            print(f"无法填充图像：壁纸路径无效或文件不存在: {self.wallpaper_path}")
-            return
+    def _merge_on_canvas(self):
+        """在一整幅画布上合并瓦片（4x4 及以下级别，或需要缩小到屏幕分辨率时）"""
+        reduce_factor = self._tile_reduce_factor((self.tile_size * self.grid_cols, self.tile_size * self.grid_rows))
+        merged_img = self._new_canvas(reduce_factor)
 
-        print("开始图像填充过程 (Windows)...")
-        try:
-            with Image.open(self.wallpaper_path) as img_content:
-                img_width, img_height = img_content.size
-
-                # 获取屏幕分辨率 (仅限 Windows)
-                if IS_WINDOWS:
-                    monitor_width = win32api.GetSystemMetrics(0)
-                    monitor_height = win32api.GetSystemMetrics(1)
-                else:  # 非Windows系统无法获取，此处应已return，以防万一
-                    print("错误：无法获取屏幕分辨率。")
-                    return
+        # 假定 wallpaper_paths 已经排序或者顺序正确
+        # 如果需要，这里可以添加排序逻辑，例如：
+        # self.wallpaper_paths.sort(key=lambda x: int(x.split('_')[1]))
 
-                if img_width == monitor_width and img_height == monitor_height:
-                    print("图像已匹配屏幕分辨率，无需填充。")
-                    return
+        for index, img_path in enumerate(self.wallpaper_paths):
+            try:
+                self._paste_tile(merged_img, index, img_path, reduce_factor)
+            except IOError as e:
+                print(f"打开图片 {img_path} 进行合并时出错: {e}")
+                raise
 
-                fill_img = Image.new(img_content.mode, (monitor_width, monitor_height), color='black')
-
-                paste_x = (monitor_width - img_width) // 2
-                paste_y = (monitor_height - img_height) // 2
-
-                fill_img.paste(img_content, (paste_x, paste_y))
-                # 在保存填充图片之前，如果目标文件已存在，则先删除它
-                if os.path.exists(self.wallpaper_path):
-                    try:
-                        os.remove(self.wallpaper_path)
-                        print(f"已删除已存在的填充图片文件: {self.wallpaper_path}")
-                    except OSError as e:
-                        print(f"删除已存在填充图片文件 {self.wallpaper_path} 出错: {e}")
-                        raise
-                fill_img.save(self.wallpaper_path)
-            print(f"{self.wallpaper_path} 成功填充至 {monitor_width}x{monitor_height}。")
-        except Exception as e:
-            print(f"图像填充过程中出错: {e}")
-            raise
+        self._finish_image(merged_img)
 
-    def process_sun_image(self):
+    def _use_single_image(self):
         """
-        处理太阳图片：裁剪掉左下角 985 像素以下的部分。
-        将 1024x1024 的图片裁剪为 1024x985。
+        单张图片的情况：没有需要执行的后处理阶段、且下载的图片已是输出格式时，直接将其作为最终壁纸（不解码、不重新编码），
+        否则解码一次，在内存中执行各阶段后编码写出。
         """
-        # 检查是否是太阳图片的 URL (此处通过检查 URL 中是否包含 'sdo' 简单判断)
-        # 更严谨的判断应从调用方传递一个 flag
-        if not self.img_urls or 'sdo' not in self.img_urls[0]:  # 确保 img_urls 非空且包含 'sdo'
-            print("跳过太阳图片处理：当前图片无需裁剪。")
-            return
+        if self.wallpaper_paths:
+            source = self.wallpaper_paths[0]
+            # 只读取文件头，像素数据在第一个阶段执行时才解码；关闭图像会关闭其文件对象，内存缓冲区另开一个视图
+            img = Image.open(source if isinstance(source, str) else io.BytesIO(source.getbuffer()))
+            if (self.render_to_memory or not self.pipeline.is_noop(img.size)
+                    or not self.encoder.matches(img.format)):
+                self.pipeline.draft(img)
+                self._finish_image(img)
+                self._release_tile(source)
+                print(f"图片已处理并保存到: {self.wallpaper_path}")
+                return
+            if self.frame_hashes is not None:
+                img.draft('RGB', (64, 64))
+                unchanged = self._is_unchanged_frame(img)
+                img.close()
+                if unchanged:
+                    self._release_tile(source)
+                    return
+            else:
+                img.close()
 
-        if not self.wallpaper_path or not os.path.exists(self.wallpaper_path):
-            print(f"无法处理太阳图片：壁纸路径无效或文件不存在: {self.wallpaper_path}")
-            return
+            # 检查目标文件是否存在，如果存在则删除
+            if os.path.exists(self.wallpaper_path):
+                try:
+                    os.remove(self.wallpaper_path)
+                    print(f"已删除已存在的最终图片文件: {self.wallpaper_path}")
+                except OSError as e:
+                    print(f"删除已存在最终图片文件 {self.wallpaper_path} 出错: {e}")
+                    raise
 
-        print("开始处理太阳图片（裁剪左下角文字）...")
-        try:
-            with Image.open(self.wallpaper_path) as img:
-                width, height = img.size
-                if width != 1024 or height != 1024:
-                    print(f"警告：太阳图片尺寸为 {width}x{height}，预期 1024x1024。可能无法正确裁剪。")
-
-                # 定义裁剪区域 (left, upper, right, lower)
-                # 保留从顶部到 985 像素高度的部分
-                # 左上角坐标 (0, 0)，右下角坐标 (width, 985)
-                cropped_img = img.crop((0, 0, width, 985))
-
-                # 在保存裁剪图片之前，如果目标文件已存在，则先删除它
-                if os.path.exists(self.wallpaper_path):
-                    try:
-                        os.remove(self.wallpaper_path)
-                        print(f"已删除已存在的太阳裁剪图片文件: {self.wallpaper_path}")
-                    except OSError as e:
-                        print(f"删除已存在太阳裁剪图片文件 {self.wallpaper_path} 出错: {e}")
-                        raise
-
-                cropped_img.save(self.wallpaper_path)
-                print(f"太阳图片已成功裁剪并保存为 {cropped_img.size}。")
-        except Exception as e:
-            print(f"处理太阳图片时出错: {e}")
-            raise
+            # 内存模式：直接把下载缓冲区写为最终壁纸
+            if not isinstance(self.wallpaper_paths[0], str):
+                with open(self.wallpaper_path, 'wb') as file:
+                    file.write(self.wallpaper_paths[0].getbuffer())
+                print(f"已将内存中的图片写入最终路径: {self.wallpaper_path}")
+            # 瓦片缓存中的文件需要保留，复制而不是重命名
+            elif self.wallpaper_paths[0] in self._cached_paths:
+                shutil.copyfile(self.wallpaper_paths[0], self.wallpaper_path)
+                print(f"已从瓦片缓存复制图片到最终路径: {self.wallpaper_path}")
+            # 只有当临时文件路径和最终目标路径不同时才重命名
+            elif self.wallpaper_paths[0] != self.wallpaper_path:
+                try:
+                    os.rename(self.wallpaper_paths[0], self.wallpaper_path)
+                    print(f"已将下载的图片重命名为最终路径: {self.wallpaper_path}")
+                except OSError as e:
+                    print(f"重命名图片 {self.wallpaper_paths[0]} 到 {self.wallpaper_path} 出错: {e}")
+                    raise
+            else:
+                print(f"图片已直接下载到最终路径: {self.wallpaper_path}，无需重命名。")
+        else:
+            print("没有可合并或设置的图片。")
+            raise RuntimeError("下载后未找到可用的图片路径。")
 
-    def _set_mac_wallpaper(self, image_path, fill_mode="center"):
+    @staticmethod
+    def _set_mac_wallpaper(image_path, fill_mode="center"):
         """
         通过 AppleScript 在 macOS 上设置壁纸。
         :param image_path: 图像的完整 POSIX 路径。
@@ -341,7 +896,8 @@ class AutoWallpaperSpider:
             logger.error(f"设置 macOS 壁纸时发生意外错误: {e}", exc_info=True)
             raise
 
-    def _set_linux_wallpaper(self, image_path, fill_mode="zoom"):
+    @staticmethod
+    def _set_linux_wallpaper(image_path, fill_mode="zoom"):
         """
         通过 gsettings 在 Linux (GNOME) 上设置壁纸。
         :param image_path: 图像的完整路径
@@ -390,7 +946,16 @@ class AutoWallpaperSpider:
         if not self.wallpaper_path or not os.path.exists(self.wallpaper_path):
             print(f"无法设置壁纸：壁纸文件不存在于路径 {self.wallpaper_path}")
             return
+        self.apply_wallpaper(self.wallpaper_path, self.img_fill)
+
+    @classmethod
+    def apply_wallpaper(cls, image_path, img_fill=False):
+        """
+        只调用系统接口把已有的图片文件设为桌面壁纸，不下载、不解码（幻灯片模式每次切换只执行这一步）。
 
+        :param image_path: 图片文件路径
+        :param img_fill: 是否使用填充样式，否则居中/适应
+        """
         print("正在尝试设置桌面壁纸...")
 
         if IS_WINDOWS:
@@ -401,7 +966,7 @@ class AutoWallpaperSpider:
                     0,
                     win32con.KEY_SET_VALUE
                 )
-                if self.img_fill:
+                if img_fill:
                     win32api.RegSetValueEx(key, "WallpaperStyle", 0, win32con.REG_SZ, "6")  # 适应
                     win32api.RegSetValueEx(key, "TileWallpaper", 0, win32con.REG_SZ, "0")  # 不平铺
                     print("壁纸样式设置为 '适应' (Windows)。")
@@ -412,24 +977,24 @@ class AutoWallpaperSpider:
 
                 win32gui.SystemParametersInfo(
                     win32con.SPI_SETDESKWALLPAPER,
-                    self.wallpaper_path,
+                    image_path,
                     1 + 2
                 )
-                print(f"桌面壁纸成功设置为 {self.wallpaper_path} (Windows)")
+                print(f"桌面壁纸成功设置为 {image_path} (Windows)")
             except Exception as e:
                 print(f"设置 Windows 桌面壁纸时出错: {e}")
                 raise
         elif IS_MACOS:
-            mac_fill_mode = "fill" if self.img_fill else "scale"  # macOS 填充模式
+            mac_fill_mode = "fill" if img_fill else "scale"  # macOS 填充模式
             try:
-                self._set_mac_wallpaper(self.wallpaper_path, fill_mode=mac_fill_mode)
+                cls._set_mac_wallpaper(image_path, fill_mode=mac_fill_mode)
             except Exception as e:
                 print(f"设置 macOS 桌面壁纸时出错: {e}")
                 raise
         elif IS_LINUX:
-            linux_fill_mode = "zoom" if self.img_fill else "scaled"  # Linux (GNOME) 填充模式
+            linux_fill_mode = "zoom" if img_fill else "scaled"  # Linux (GNOME) 填充模式
             try:
-                self._set_linux_wallpaper(self.wallpaper_path, fill_mode=linux_fill_mode)
+                cls._set_linux_wallpaper(image_path, fill_mode=linux_fill_mode)
             except Exception as e:
                 print(f"设置 Linux (GNOME) 桌面壁纸时出错: {e}")
                 raise
@@ -437,22 +1002,100 @@ class AutoWallpaperSpider:
             print("当前操作系统不支持自动设置壁纸。")
             raise NotImplementedError("当前操作系统不支持自动设置壁纸。")
 
-    def run(self):
+    def prepare(self):
         """
-        执行整个壁纸设置流程。
+        下载并合成壁纸文件，但不设置为桌面壁纸（预取时使用）。
+
+        :return: 是否生成了新的壁纸文件；服务器返回 304、或新帧与当前壁纸相同时为 False
         """
-        print("开始自动壁纸程序...")
-        try:
+        if self.is_tiled:
+            # 瓦片图源：下载与合成重叠进行
+            self.download_and_merge()
+        else:
             self.download_images()
+            if self.not_modified:
+                return False
+            if self.archive is not None:
+                # 单张图片在 merge_images 中可能被移动或释放，先存入归档
+                self.source_blobs = [self.archive.put(path) if path is not None else None
+                                     for path in self.wallpaper_paths]
             self.merge_images()  # 此方法也处理了单张图片的情况
-            self.process_sun_image()  # 太阳图片处理
+        # 裁剪、填充等后处理阶段已在合成/单图处理中于内存执行，最终文件只编码一次
+        return not self.unchanged
+
+    def run_prepared(self, prepared_path):
+        """
+        使用已经合成好的壁纸文件（如预取暂存区中的文件），只做替换和系统壁纸设置。
 
-            # fill_image 仅对 Windows 的 img_fill 模式有效，macOS/Linux 填充模式在 set_desktop_wallpaper 中通过各自命令控制
-            if IS_WINDOWS and self.img_fill:
-                self.fill_image()
+        :param prepared_path: 已合成的壁纸文件，调用后被移动到最终路径（与当前壁纸相同时被删除）
+        :return: 壁纸是否被更新
+        """
+        print(f"使用预取的壁纸: {prepared_path}")
+        self._check_cancelled()
+        self.wallpaper_path = os.path.join(self.wallpaper_dir, self.img_name)
+        if self.frame_hashes is not None:
+            self.frame_hash = dhash_file(prepared_path)
+            if self.frame_hashes.is_unchanged(self.frame_hash) is not None:
+                self.unchanged = True
+                metrics.incr('wallpaper.unchanged_skips')
+                self._remove_quietly(prepared_path)
+                print("预取的壁纸与当前壁纸相同，跳过壁纸设置。")
+                return False
+        os.replace(prepared_path, self.wallpaper_path)
+        self.set_desktop_wallpaper()
+        self._record_frame_hash()
+        print("自动壁纸程序执行成功。")
+        return True
+
+    def archive_frame(self, name, source):
+        """
+        下载的原始内容全部存入归档后，以 name 记录这一帧（与是否设置为壁纸无关）。
+
+        :return: 是否记录
+        """
+        if self.archive is None or not self.source_blobs or None in self.source_blobs:
+            return False
+        grid = (self.grid_rows, self.grid_cols, self.tile_size) if self.is_tiled else (1, 1, 0)
+        if self.wallpaper_path and os.path.exists(self.wallpaper_path):
+            flat_size = os.path.getsize(self.wallpaper_path)
+        else:
+            flat_size = 0
+        self.archive.add_frame(name, source, self.source_blobs, grid=grid, flat_size=flat_size)
+        return True
 
+    def _commit_validators(self, wallpaper_path):
+        """记录本次 200 响应的 ETag / Last-Modified，之后的刷新可以用条件请求直接得到 304"""
+        if self.validator_cache is not None:
+            self.validator_cache.commit(self.img_urls, wallpaper_path, self._validators)
+
+    def _record_frame_hash(self):
+        """壁纸设置成功后记录当前壁纸的感知哈希；条带合成等未计算哈希的情况也要记录，使旧哈希失效"""
+        if self.frame_hashes is not None:
+            self.frame_hashes.update(self.wallpaper_path, self.frame_hash)
+
+    def run(self):
+        """
+        执行整个壁纸设置流程。
+
+        :return: 壁纸是否被更新；服务器返回 304、或新帧与当前壁纸相同时为 False
+        """
+        print("开始自动壁纸程序...")
+        try:
+            if not self.prepare():
+                # 304 或感知哈希相同：跳过写入以及系统壁纸调用
+                if self.unchanged:
+                    # 正文已完整下载，新的校验器对应屏幕上看起来相同的当前壁纸，同样要记录，
+                    # 否则之后每次刷新都要完整下载、解码才能再次发现帧未变化
+                    self._commit_validators(self.unchanged_path)
+                print("图片未变化，跳过处理与壁纸设置。")
+                return False
+
+            self._check_cancelled()
             self.set_desktop_wallpaper()
+            self._record_frame_hash()
+            self._commit_validators(self.wallpaper_path)
             print("自动壁纸程序执行成功。")
+            return True
         except Exception as e:
             print(f"自动壁纸程序执行失败: {e}")
             # 如果是 GUI 应用，这里可以考虑显示错误对话框
@@ -460,11 +1103,12 @@ class AutoWallpaperSpider:
 
 
 if __name__ == '__main__':
-    from wallpaper_sources import (
+    from app.utils.wallpaper_sources import (
         get_earth_h8_img_url,
         get_earth_h8_4x4_img_urls,
         get_moon_nasa_img_url,
-        get_sun_nasa_img_url
+        get_sun_nasa_img_url,
+        get_source_stages
     )
 
     # 针对不同操作系统设置不同的默认壁纸目录
@@ -502,9 +1146,9 @@ if __name__ == '__main__':
     # img_urls, img_name, img_fill = get_moon_nasa_img_url()
     # auto_wallpaper = AutoWallpaperSpider(img_urls=img_urls, img_name=img_name, img_fill=img_fill, wallpaper_dir=wallpaper_dir)
 
-    # 选项 4: NASA 太阳图片 (包含裁剪逻辑)
+    # 选项 4: NASA 太阳图片 (图片源声明了裁剪阶段)
     # img_urls, img_name, img_fill = get_sun_nasa_img_url()
     # auto_wallpaper = AutoWallpaperSpider(img_urls=img_urls, img_name=img_name, img_fill=img_fill,
-    #                                      wallpaper_dir=wallpaper_dir)
+    #                                      wallpaper_dir=wallpaper_dir, stages=get_source_stages('Sun-NASA'))
 
     auto_wallpaper.run()
@@ -72,6 +72,7 @@ class HomeWindow(QWidget, Ui_HomeForm):
         self.setDesktopButton.clicked.connect(self.controller.run_set_wallpaper)
 
     def _on_change_image(self, index):
+        previous_source = self.cfg.get(self.cfg.imageSource)
         if index == 0:
             self.label.setText('向日葵8号气象卫星')
             self.label_2.setText(
@@ -115,6 +116,9 @@ class HomeWindow(QWidget, Ui_HomeForm):
                 "联系：rasfu_1@163.com\n"
             )
             self.cfg.set(self.cfg.imageSource, 'FUCK')
+        # 图片源变化时取消旧图片源的刷新任务
+        if self.cfg.get(self.cfg.imageSource) != previous_source:
+            self.controller.on_image_source_changed()
         # 设置标签的自动换行
         self.label_2.setWordWrap(True)
         # 设置标签的宽度
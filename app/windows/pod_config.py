@@ -12,15 +12,33 @@ from qfluentwidgets import (
     QConfig,
     OptionsConfigItem,
     OptionsValidator,
+    RangeConfigItem,
+    RangeValidator,
     ConfigItem,
     FolderValidator,
 )
 
+from app.utils.image_encoder import OUTPUT_FORMATS
+from app.utils.image_pipeline import RESAMPLE_FILTERS
+
 
 class PoDConfig(QConfig):
     """Configuration class for the application settings"""
     TIME_INTERVAL_OPTIONS = [10, 30, 60, 60 * 12, 24 * 60, 'OFF']
     TIME_INTERVAL_TEXTS = ['10分钟', '30分钟', '1小时', '12小时', '1天', '从不更新']
+    DOWNLOAD_WORKERS_OPTIONS = [1, 2, 4, 8, 16]
+    HIMAWARI_LEVEL_OPTIONS = [2, 4, 8, 16, 20]  # Earth-H8-16 图片源的瓦片级别，N 对应 N×N 个瓦片
+    TILE_CACHE_SIZE_OPTIONS = [0, 100, 200, 500, 1000]  # MB，0 表示关闭瓦片缓存
+    OUTPUT_FORMAT_OPTIONS = OUTPUT_FORMATS  # 最终壁纸的编码格式，按图片源分别设置
+    RESAMPLE_FILTER_OPTIONS = list(RESAMPLE_FILTERS)  # 缩小到屏幕分辨率时的重采样滤镜
+    # 历史壁纸保留策略，0 表示不限
+    HISTORY_MAX_DAYS_OPTIONS = [0, 1, 7, 30, 90, 365]
+    HISTORY_MAX_COUNT_OPTIONS = [0, 144, 1000, 5000, 20000]
+    HISTORY_MAX_SIZE_OPTIONS = [0, 500, 1000, 5000, 20000]  # MB
+    # 历史壁纸的保存方式：files 为每帧一个文件，archive 为按内容去重的归档
+    HISTORY_BACKEND_OPTIONS = ['files', 'archive']
+    SLIDESHOW_HOURS_OPTIONS = [1, 3, 6, 12, 24]  # 幻灯片播放最近多少小时的帧
+    SLIDESHOW_INTERVAL_OPTIONS = [1, 2, 5, 10, 30, 60]  # 幻灯片切换间隔（秒）
 
     timeInterval = OptionsConfigItem(
         'PoD', 'TimeInterval', 10,
@@ -39,7 +57,121 @@ class PoDConfig(QConfig):
         'PoD', 'AutoSave', False,
         OptionsValidator([True, False])
     )
+    historyMaxDays = OptionsConfigItem(
+        'History', 'MaxDays', 0,
+        OptionsValidator(HISTORY_MAX_DAYS_OPTIONS)
+    )
+    historyMaxCount = OptionsConfigItem(
+        'History', 'MaxCount', 0,
+        OptionsValidator(HISTORY_MAX_COUNT_OPTIONS)
+    )
+    historyMaxSize = OptionsConfigItem(
+        'History', 'MaxSize', 0,
+        OptionsValidator(HISTORY_MAX_SIZE_OPTIONS)
+    )
+    historyBackend = OptionsConfigItem(
+        'History', 'Backend', 'files',
+        OptionsValidator(HISTORY_BACKEND_OPTIONS)
+    )
     imageSource = OptionsConfigItem(
         'PoD', 'ImageSource', 'Earth-H8',
         OptionsValidator(['Earth-H8', 'Earth-H8-16', 'Moon-NASA', 'Sun-NASA'])
     )
+    downloadWorkers = OptionsConfigItem(
+        'PoD', 'DownloadWorkers', 4,
+        OptionsValidator(DOWNLOAD_WORKERS_OPTIONS)
+    )
+    tileCacheSize = OptionsConfigItem(
+        'PoD', 'TileCacheSize', 200,
+        OptionsValidator(TILE_CACHE_SIZE_OPTIONS)
+    )
+    himawariLevel = OptionsConfigItem(
+        'PoD', 'HimawariLevel', 4,
+        OptionsValidator(HIMAWARI_LEVEL_OPTIONS)
+    )
+    inMemoryTiles = OptionsConfigItem(
+        'PoD', 'InMemoryTiles', False,
+        OptionsValidator([True, False])
+    )
+    earthH8Format = OptionsConfigItem(
+        'Encoder', 'EarthH8Format', 'png',
+        OptionsValidator(OUTPUT_FORMAT_OPTIONS)
+    )
+    earthH8TilesFormat = OptionsConfigItem(
+        'Encoder', 'EarthH8TilesFormat', 'png',
+        OptionsValidator(OUTPUT_FORMAT_OPTIONS)
+    )
+    moonFormat = OptionsConfigItem(
+        'Encoder', 'MoonFormat', 'jpeg',
+        OptionsValidator(OUTPUT_FORMAT_OPTIONS)
+    )
+    sunFormat = OptionsConfigItem(
+        'Encoder', 'SunFormat', 'jpeg',
+        OptionsValidator(OUTPUT_FORMAT_OPTIONS)
+    )
+    encodeQuality = RangeConfigItem(
+        'Encoder', 'Quality', 90,
+        RangeValidator(1, 100)
+    )
+    pngCompressLevel = RangeConfigItem(
+        'Encoder', 'PngCompressLevel', 6,
+        RangeValidator(0, 9)
+    )
+
+    downscaleToScreen = OptionsConfigItem(
+        'Render', 'DownscaleToScreen', True,
+        OptionsValidator([True, False])
+    )
+    resampleFilter = OptionsConfigItem(
+        'Render', 'ResampleFilter', 'lanczos',
+        OptionsValidator(RESAMPLE_FILTER_OPTIONS)
+    )
+    # 已知占位图（如 NICT 的 "No Image"）的 SHA-1，日志中会记录无效图片的 sha1 以便收集
+    placeholderHashes = ConfigItem('Download', 'PlaceholderHashes', [])
+    enhanceEarth = OptionsConfigItem(
+        'Enhance', 'EnhanceEarth', False,
+        OptionsValidator([True, False])
+    )
+    enhanceGamma = RangeConfigItem(
+        'Enhance', 'Gamma', 120,  # 百分比，120 表示 gamma=1.2
+        RangeValidator(50, 250)
+    )
+    enhanceSaturation = RangeConfigItem(
+        'Enhance', 'Saturation', 110,  # 百分比，100 表示不变
+        RangeValidator(0, 300)
+    )
+    skipUnchanged = OptionsConfigItem(
+        'Render', 'SkipUnchanged', True,
+        OptionsValidator([True, False])
+    )
+    frameHashThreshold = RangeConfigItem(
+        'Render', 'FrameHashThreshold', 2,  # 64 位 dHash 的汉明距离
+        RangeValidator(0, 16)
+    )
+    multiMonitor = OptionsConfigItem(
+        'Display', 'MultiMonitor', False,
+        OptionsValidator([True, False])
+    )
+    # 每个显示器（按 Qt 屏幕顺序）使用的图片源，缺省时使用 ImageSource
+    monitorSources = ConfigItem('Display', 'MonitorSources', [])
+    slideshow = OptionsConfigItem(
+        'Slideshow', 'Enabled', False,
+        OptionsValidator([True, False])
+    )
+    slideshowHours = OptionsConfigItem(
+        'Slideshow', 'Hours', 6,
+        OptionsValidator(SLIDESHOW_HOURS_OPTIONS)
+    )
+    slideshowInterval = OptionsConfigItem(
+        'Slideshow', 'Interval', 5,
+        OptionsValidator(SLIDESHOW_INTERVAL_OPTIONS)
+    )
+
+    def output_format_item(self, image_source):
+        """图片源对应的输出格式配置项"""
+        return {
+            'Earth-H8': self.earthH8Format,
+            'Earth-H8-16': self.earthH8TilesFormat,
+            'Moon-NASA': self.moonFormat,
+            'Sun-NASA': self.sunFormat,
+        }[image_source]
@@ -20,14 +20,17 @@ class SystemTray(QSystemTrayIcon):
         menu = QMenu()
 
         show_action = QAction('打开', self)
+        backfill_action = QAction('补抓最近 48 小时', self)
         quit_action = QAction('退出', self)
 
         menu.addAction(show_action)
+        menu.addAction(backfill_action)
         menu.addAction(quit_action)
 
         self.setContextMenu(menu)
 
         show_action.triggered.connect(self.show_main_window)
+        backfill_action.triggered.connect(self.start_backfill)
         quit_action.triggered.connect(qApp.quit)
 
         self.activated.connect(self.on_tray_icon_activated)
@@ -38,6 +41,17 @@ class SystemTray(QSystemTrayIcon):
         self.main_window.showNormal()
         self.main_window.activateWindow()
 
+    def start_backfill(self):
+        """补抓断网期间错过的 Himawari 时次，结束后在托盘提示结果"""
+        backfill_thread = self.main_window.home_window.controller.start_backfill()
+        if backfill_thread is None:
+            self.showMessage('补抓', '未设置壁纸目录或补抓正在进行')
+            return
+        backfill_thread.backfill_finished.connect(self.on_backfill_finished)
+
+    def on_backfill_finished(self, success, message):
+        self.showMessage('补抓', message, QSystemTrayIcon.Information if success else QSystemTrayIcon.Warning)
+
     def on_tray_icon_activated(self, reason):
         if reason == QSystemTrayIcon.Trigger:
             self.show_main_window()
@@ -0,0 +1,36 @@
+import datetime
+import json
+
+from app.utils.backfill import BackfillJob, BackfillProgress, PROGRESS_FILE_NAME
+
+
+def _run(tmp_path, monkeypatch, start, end):
+    downloaded = []
+
+    def run_slot(job, slot_time, cancel_event):
+        downloaded.append(slot_time)
+        return 10
+
+    monkeypatch.setattr(BackfillJob, '_run_slot', run_slot)
+    job = BackfillJob(start, end, 1, str(tmp_path))
+    report = job.run()
+    return job, report, downloaded
+
+
+def test_progress_survives_a_moving_window(tmp_path, monkeypatch):
+    t0 = datetime.datetime(2026, 10, 18, 0, 0)
+    _, report, downloaded = _run(tmp_path, monkeypatch, t0, t0 + datetime.timedelta(hours=1))
+    assert report['done'] == len(downloaded) == 7
+
+    # 下一次运行的终点后移了 30 分钟：重叠的 4 个时次跳过，只下载新的 3 个
+    start, end = t0 + datetime.timedelta(minutes=30), t0 + datetime.timedelta(minutes=90)
+    job, report, downloaded = _run(tmp_path, monkeypatch, start, end)
+    assert report['skipped'] == 4
+    assert sorted(downloaded) == [t0 + datetime.timedelta(minutes=minutes) for minutes in (70, 80, 90)]
+
+    # 滑出范围的时次记录已被清理
+    with open(tmp_path / PROGRESS_FILE_NAME, 'r', encoding='utf-8') as f:
+        done = set(json.load(f)['jobs'][job.job_id]['done'])
+    progress = BackfillProgress.for_folder(str(tmp_path))
+    assert done == progress.done(job.job_id)
+    assert done == {job._slot_name(start + datetime.timedelta(minutes=10 * i)) for i in range(7)}
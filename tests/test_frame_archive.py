@@ -0,0 +1,95 @@
+import datetime
+import io
+import os
+
+from PIL import Image
+
+from app.utils.frame_archive import FrameArchive
+
+
+def _jpeg_bytes(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (16, 16), color=color).save(buffer, 'JPEG')
+    return buffer
+
+
+def test_fixed_name_frames_are_archived_separately(tmp_path):
+    """SDO 太阳的文件名固定为 sun.jpg，每次更新都要作为新的一帧归档"""
+    archive = FrameArchive(str(tmp_path / 'archive'))
+    first_time = datetime.datetime(2026, 10, 18, 8, 0)
+    second_time = datetime.datetime(2026, 10, 18, 8, 15)
+    first = archive.put(_jpeg_bytes('red'))
+    second = archive.put(_jpeg_bytes('blue'))
+    archive.add_frame('sun.jpg', 'Sun-NASA', [first], slot_time=first_time)
+    archive.add_frame('sun.jpg', 'Sun-NASA', [second], slot_time=second_time)
+
+    assert archive.stats()['frames'] == 2
+    latest = archive.restore('sun.jpg', str(tmp_path / 'latest.jpg'))
+    older = archive.restore('sun.jpg', str(tmp_path / 'older.jpg'), slot_time=first_time)
+    with open(latest, 'rb') as f:
+        assert f.read() == _jpeg_bytes('blue').getvalue()
+    with open(older, 'rb') as f:
+        assert f.read() == _jpeg_bytes('red').getvalue()
+    archive.close()
+
+
+def test_same_slot_is_updated(tmp_path):
+    archive = FrameArchive(str(tmp_path / 'archive'))
+    slot_time = datetime.datetime(2026, 10, 18, 8, 0)
+    first = archive.put(_jpeg_bytes('red'))
+    second = archive.put(_jpeg_bytes('blue'))
+    archive.add_frame('sun.jpg', 'Sun-NASA', [first], slot_time=slot_time)
+    archive.add_frame('sun.jpg', 'Sun-NASA', [second], slot_time=slot_time)
+
+    assert archive.stats()['frames'] == 1
+    restored = archive.restore('sun.jpg', str(tmp_path / 'restored.jpg'))
+    with open(restored, 'rb') as f:
+        assert f.read() == _jpeg_bytes('blue').getvalue()
+    archive.close()
+
+
+
+def _add_sun(archive, color, slot_time, shared=None):
+    blobs = [archive.put(_jpeg_bytes(color))]
+    if shared is not None:
+        blobs.append(shared)
+    archive.add_frame('sun.jpg', 'Sun-NASA', blobs, slot_time=slot_time)
+    return blobs[0]
+
+
+def test_retention_by_count_removes_unreferenced_blobs(tmp_path):
+    archive = FrameArchive(str(tmp_path / 'archive'), gc_grace_seconds=0, max_count=2)
+    start = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    shared = archive.put(_jpeg_bytes('black'))
+    colors = ('red', 'green', 'blue')
+    own = [_add_sun(archive, color, start + datetime.timedelta(minutes=15 * i), shared)
+           for i, color in enumerate(colors)]
+
+    assert archive.stats()['frames'] == 2
+    assert not archive.has_frame('sun.jpg', start)
+    # 最旧一帧独有的内容块被删除，仍被较新的帧引用的内容块保留
+    assert not os.path.exists(archive._blob_path(own[0]))
+    for blob_hash in own[1:] + [shared]:
+        assert os.path.exists(archive._blob_path(blob_hash))
+    assert archive.stats()['blobs'] == 3
+    archive.close()
+
+
+def test_retention_by_age_and_size(tmp_path):
+    now = datetime.datetime.utcnow()
+    archive = FrameArchive(str(tmp_path / 'archive'), gc_grace_seconds=0, max_age_days=1)
+    old = _add_sun(archive, 'red', now - datetime.timedelta(days=3))
+    # 刚记录的帧即使已过期也不会被淘汰
+    assert archive.stats()['frames'] == 1
+    _add_sun(archive, 'green', now - datetime.timedelta(hours=2))
+    assert archive.stats()['frames'] == 1
+    assert not os.path.exists(archive._blob_path(old))
+
+    archive.max_age_days = 0
+    archive.max_bytes = archive.stats()['stored_bytes'] + 1
+    latest_time = now - datetime.timedelta(hours=1)
+    _add_sun(archive, 'blue', latest_time)
+    assert archive.stats()['frames'] == 1
+    assert archive.stats()['stored_bytes'] <= archive.max_bytes
+    assert archive.has_frame('sun.jpg', latest_time)
+    archive.close()
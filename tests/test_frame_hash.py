@@ -0,0 +1,44 @@
+from PIL import Image, ImageDraw, ImageFilter
+
+from app.utils.frame_hash import FrameHashStore, dhash
+from app.utils.wallpaper_sources import skips_unchanged_frames
+
+
+def _earth_frame(cloud_shift):
+    """地球圆盘加几团云，云层向右移动 cloud_shift 像素（相邻两个时次的典型变化）"""
+    img = Image.new('RGB', (1100, 1100))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((50, 50, 1050, 1050), fill=(30, 60, 140))
+    for x, y in ((300, 300), (600, 500), (400, 750), (700, 250)):
+        draw.ellipse((x + cloud_shift, y, x + cloud_shift + 150, y + 80), fill=(230, 230, 230))
+    return img.filter(ImageFilter.GaussianBlur(3))
+
+
+def _store(tmp_path, threshold=0, color_threshold=0):
+    current = tmp_path / 'current.png'
+    current.write_bytes(b'')
+    store = FrameHashStore(str(tmp_path / 'hash.json'), threshold=threshold, color_threshold=color_threshold)
+    return store, str(current)
+
+
+def test_himawari_near_identical_frames_are_different(tmp_path):
+    previous, latest = _earth_frame(0), _earth_frame(5)
+    assert previous.tobytes() != latest.tobytes()
+    store, current = _store(tmp_path)
+    store.update(current, dhash(previous))
+
+    # 8×8 的 dHash 分辨不出几个像素的云层移动，阈值为 0 也会判为同一帧
+    assert store.is_unchanged(dhash(latest)) == current
+    # 因此 Himawari 不做感知跳过，每个新时次都会设置
+    assert not skips_unchanged_frames('Earth-H8')
+    assert not skips_unchanged_frames('Earth-H8-16')
+
+
+def test_slow_sources_skip_unchanged_frames(tmp_path):
+    store, current = _store(tmp_path, threshold=2, color_threshold=8)
+    store.update(current, dhash(_earth_frame(0)))
+
+    assert skips_unchanged_frames('Sun-NASA')
+    assert skips_unchanged_frames('Moon-NASA')
+    assert store.is_unchanged(dhash(_earth_frame(0))) == current
+    assert store.is_unchanged(dhash(_earth_frame(60))) is None
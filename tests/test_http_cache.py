@@ -0,0 +1,17 @@
+import json
+
+from app.utils.http_cache import ValidatorCache
+
+
+def test_commit_keeps_only_current_urls(tmp_path):
+    cache = ValidatorCache(str(tmp_path / 'cache.json'))
+    sun = 'https://sdo.gsfc.nasa.gov/assets/img/latest/latest_2048_0171.jpg'
+    moon = 'https://svs.gsfc.nasa.gov/vis/a000000/a005400/a005415/frames/730x730_1x1_30p/moon.0001.jpg'
+    cache.commit([sun], str(tmp_path / 'sun.jpg'), {sun: {'etag': '"a"', 'last_modified': None}})
+    cache.commit([moon], str(tmp_path / 'moon_1.jpg'), {moon: {'etag': '"b"', 'last_modified': None}})
+
+    with open(cache.cache_path, 'r', encoding='utf-8') as f:
+        validators = json.load(f)['validators']
+    assert list(validators) == [moon]
+    assert cache.conditional_headers(sun) == {}
+    assert cache.conditional_headers(moon) == {'If-None-Match': '"b"'}
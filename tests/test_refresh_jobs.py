@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+QtCore = pytest.importorskip('PyQt5.QtCore')
+
+from app.controllers.refresh_jobs import RefreshJobManager
+
+
+class _FakeJob(QtCore.QObject):
+    """代替下载线程：start 只做记录，由测试发出 download_finished/finished 模拟线程结束"""
+
+    download_finished = QtCore.pyqtSignal(bool, str)
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.started = False
+        self.cancel_event = threading.Event()
+
+    def start(self):
+        self.started = True
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def exit(self, success=True, message='ok'):
+        self.download_finished.emit(success, message)
+        self.finished.emit()
+
+
+@pytest.fixture(scope='module')
+def qapp():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+@pytest.fixture
+def manager(qapp):
+    return RefreshJobManager()
+
+
+def test_submit_while_busy_replaces_pending(manager):
+    results = []
+    manager.job_finished.connect(lambda thread, success, message: results.append((thread, success, message)))
+    running, first, second = _FakeJob(), _FakeJob(), _FakeJob()
+
+    assert manager.submit(running)
+    assert not manager.submit(first)
+    assert not manager.submit(second)
+    assert manager.current is running and manager.pending is second
+
+    running.exit()
+    # 待执行任务只保留最新的一个，在上一个线程退出后才启动
+    assert manager.current is second and second.started
+    assert not first.started
+    assert results == [(running, True, 'ok')]
+
+
+def test_cancel_drops_pending_and_signals_running(manager):
+    running, pending = _FakeJob(), _FakeJob()
+    manager.submit(running)
+    manager.submit(pending)
+
+    manager.cancel()
+    assert manager.pending is None
+    assert running.cancel_event.is_set()
+    # 不等待线程结束：仍然是当前任务，直到线程真正退出
+    assert manager.current is running and manager.is_busy()
+
+    running.exit(False, '已取消')
+    assert manager.current is None and not manager.is_busy()
+    assert not pending.started
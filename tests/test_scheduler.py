@@ -0,0 +1,24 @@
+import datetime
+
+from app.utils.scheduler import get_delay_ms, get_next_tick_time, get_tick_slot
+
+
+def test_next_tick_is_aligned_to_publication():
+    now = datetime.datetime(2026, 10, 18, 8, 3)
+    assert get_next_tick_time('Earth-H8', 10, now=now) == datetime.datetime(2026, 10, 18, 8, 10)
+    assert get_next_tick_time('Moon-NASA', 10, now=now) == datetime.datetime(2026, 10, 18, 9, 0)
+
+
+def test_early_timer_does_not_repeat_tick():
+    """定时器提前 5 毫秒触发时，下一次刷新是下一个时次，而不是刚触发的这一次"""
+    tick = get_next_tick_time('Earth-H8', 10, now=datetime.datetime(2026, 10, 18, 8, 3))
+    early = tick - datetime.timedelta(milliseconds=5)
+    assert get_next_tick_time('Earth-H8', 10, now=early) == tick
+    assert get_next_tick_time('Earth-H8', 10, now=early, previous_tick=tick) == tick + datetime.timedelta(minutes=10)
+    assert get_tick_slot('Earth-H8', max(tick, early)) == datetime.datetime(2026, 10, 18, 7, 50)
+
+
+def test_delay_rounds_up():
+    target = datetime.datetime(2026, 10, 18, 8, 10)
+    assert get_delay_ms(target, now=target - datetime.timedelta(microseconds=100)) == 1
+    assert get_delay_ms(target, now=target + datetime.timedelta(seconds=1)) == 0
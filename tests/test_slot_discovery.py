@@ -0,0 +1,42 @@
+import datetime
+
+from app.utils.slot_discovery import HimawariSlotFinder
+from app.utils.wallpaper_sources import get_earth_h8_img_url
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _Session:
+    """只有 published 中的时次返回 200，记录所有探测的 URL"""
+
+    def __init__(self, published):
+        self.published = {get_earth_h8_img_url(slot_time)[0][0] for slot_time in published}
+        self.probed = []
+
+    def head(self, url, **kwargs):
+        self.probed.append(url)
+        return _Response(200 if url in self.published else 404)
+
+
+def test_probing_starts_after_publication_latency():
+    now = datetime.datetime(2026, 10, 18, 8, 25)
+    latest = datetime.datetime(2026, 10, 18, 8, 0)
+    session = _Session([latest])
+    finder = HimawariSlotFinder(session)
+
+    assert finder.find_latest_slot(now=now) == latest
+    # 08:10、08:20 的时次必然尚未发布，不会被探测
+    assert session.probed == [get_earth_h8_img_url(latest)[0][0]]
+
+
+def test_is_published_updates_latest_slot():
+    target = datetime.datetime(2026, 10, 18, 8, 10)
+    session = _Session([target])
+    finder = HimawariSlotFinder(session)
+
+    assert not finder.is_published(target + datetime.timedelta(minutes=10))
+    assert finder.is_published(target)
+    assert finder.latest_known_slot == target
@@ -0,0 +1,42 @@
+import itertools
+import json
+import os
+
+from app.utils import tile_cache
+from app.utils.tile_cache import TileCache, TILE_SUFFIX
+
+
+def _tile(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+
+def test_lru_eviction_and_index(tmp_path, monkeypatch):
+    # 单调递增的时钟，避免同一时刻的访问顺序不确定
+    clock = itertools.count(1)
+    monkeypatch.setattr(tile_cache.time, 'time', lambda: next(clock))
+    cache_dir = tmp_path / 'cache'
+    cache = TileCache(str(cache_dir), max_bytes=300)
+    urls = [f'https://himawari8.nict.go.jp/img/D531106/4d/550/2026/10/18/080000_{i}_0.png' for i in range(4)]
+
+    for index, url in enumerate(urls[:3]):
+        cache.put(url, _tile(tmp_path, f'download_{index}', 100))
+    # 访问第一个瓦片后，最久未访问的是第二个
+    assert cache.get(urls[0]) is not None
+    cache.put(urls[3], _tile(tmp_path, 'download_3', 100))
+
+    assert cache.get(urls[1]) is None
+    for url in (urls[0], urls[2], urls[3]):
+        assert cache.get(url) is not None
+
+    cache.flush()
+    with open(cache.index_path, 'r', encoding='utf-8') as f:
+        indexed = set(json.load(f)['entries'])
+    on_disk = {name[:-len(TILE_SUFFIX)] for name in os.listdir(cache_dir) if name.endswith(TILE_SUFFIX)}
+    assert indexed == on_disk
+    assert len(on_disk) == 3
+
+    reloaded = TileCache(str(cache_dir), max_bytes=300)
+    assert reloaded.get(urls[1]) is None
+    assert reloaded.get(urls[3]) is not None
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+from PIL import Image, ImageChops
+
+from app.utils.tile_grid import TileGridComposer, StreamingPngWriter, get_grid_shape
+
+
+def _noise_tile(path, size, seed):
+    rng = random.Random(seed)
+    img = Image.frombytes('RGB', (size, size), bytes(rng.randrange(256) for _ in range(size * size * 3)))
+    img.save(path)
+    return img
+
+
+@pytest.mark.parametrize('side', [2, 4])
+def test_streamed_grid_matches_canvas_paste(tmp_path, side):
+    tile_size = 24
+    tile_paths = []
+    canvas = Image.new('RGB', (side * tile_size, side * tile_size))
+    for index in range(side * side):
+        path = str(tmp_path / f'tile_{index}.png')
+        tile = _noise_tile(path, tile_size, index)
+        canvas.paste(tile, ((index % side) * tile_size, (index // side) * tile_size))
+        tile_paths.append(path)
+
+    output_path = str(tmp_path / 'grid.png')
+    TileGridComposer(*get_grid_shape(len(tile_paths)), tile_size=tile_size).compose_to_png(tile_paths, output_path)
+
+    with Image.open(output_path) as streamed:
+        streamed.load()
+        assert streamed.size == canvas.size
+        assert ImageChops.difference(streamed.convert('RGB'), canvas).getbbox() is None
+
+
+def test_writer_rejects_missing_rows(tmp_path):
+    writer = StreamingPngWriter(str(tmp_path / 'short.png'), 8, 8)
+    writer.write_strip(Image.new('RGB', (8, 4)))
+    with pytest.raises(ValueError):
+        writer.close()
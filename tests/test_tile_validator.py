@@ -0,0 +1,119 @@
+import collections
+import hashlib
+import io
+import os
+import struct
+
+import pytest
+from PIL import Image
+
+from app.utils.retry_policy import RetryPolicy
+from app.utils.tile_validator import TileValidator, CorruptTileError, PlaceholderTileError
+from app.utils.wallpaper_spider import AutoWallpaperSpider
+from app.utils.wallpaper_sources import HIMAWARI_TILE_SIZE
+
+
+def _encode(color, fmt='PNG', size=16):
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size), color=color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def _truncated_png():
+    return _encode('red')[:-20]
+
+
+def _bad_crc_png():
+    data = bytearray(_encode('red'))
+    # 签名之后第一个块（IHDR，13 字节数据）的 CRC 位于 8 + 8 + 13 处
+    crc_offset = 8 + 8 + 13
+    data[crc_offset:crc_offset + 4] = struct.pack('>I', 0)
+    return bytes(data)
+
+
+def _jpeg_without_eoi():
+    return _encode('red', 'JPEG')[:-2]
+
+
+PLACEHOLDER = _encode('gray')
+PLACEHOLDER_SHA1 = hashlib.sha1(PLACEHOLDER).hexdigest()
+
+
+def _validate(data, chunk_size=7):
+    validator = TileValidator([PLACEHOLDER_SHA1])
+    for start in range(0, len(data), chunk_size):
+        validator.feed(data[start:start + chunk_size])
+    validator.finish()
+
+
+@pytest.mark.parametrize('data, error', [
+    (_truncated_png(), CorruptTileError),
+    (_bad_crc_png(), CorruptTileError),
+    (_jpeg_without_eoi(), CorruptTileError),
+    (PLACEHOLDER, PlaceholderTileError),
+])
+def test_invalid_tiles_are_rejected(data, error):
+    with pytest.raises(error):
+        _validate(data)
+
+
+def test_valid_tiles_pass():
+    _validate(_encode('red'))
+    _validate(_encode('red', 'JPEG'))
+
+
+class _Response:
+    def __init__(self, url, body):
+        self.url = url
+        self.status_code = 200
+        self.headers = {'Content-Length': str(len(body))}
+        self._body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self._body), chunk_size):
+            yield self._body[start:start + chunk_size]
+
+
+class _Session:
+    """按 URL 返回预设的响应体序列，最后一个响应体重复使用，并记录每个 URL 的请求次数"""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.requests = collections.Counter()
+
+    def get(self, url, **kwargs):
+        sequence = self.bodies[url]
+        body = sequence[min(self.requests[url], len(sequence) - 1)]
+        self.requests[url] += 1
+        return _Response(url, body)
+
+
+@pytest.mark.parametrize('bad_body', [_truncated_png(), _bad_crc_png(), _jpeg_without_eoi(), PLACEHOLDER],
+                         ids=['truncated_png', 'bad_crc', 'jpeg_without_eoi', 'placeholder'])
+def test_only_invalid_tile_is_retried(tmp_path, bad_body):
+    good = _encode('navy', size=HIMAWARI_TILE_SIZE)
+    urls = [f'https://example.invalid/tile_{index}.png' for index in range(4)]
+    bodies = {url: [good] for url in urls}
+    bodies[urls[2]] = [bad_body, good]
+    session = _Session(bodies)
+    retry_policy = RetryPolicy(base_delay=0.01, jitter=0)
+
+    spider = AutoWallpaperSpider(urls, 'grid.png', str(tmp_path), img_fill=True, session=session,
+                                 retry_policy=retry_policy, placeholder_hashes=[PLACEHOLDER_SHA1],
+                                 fill_screen=False)
+    assert spider.prepare()
+
+    assert session.requests[urls[2]] == 2
+    assert all(session.requests[url] == 1 for url in urls if url != urls[2])
+    with Image.open(spider.wallpaper_path) as img:
+        assert img.size == (2 * HIMAWARI_TILE_SIZE, 2 * HIMAWARI_TILE_SIZE)
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('temp_')]
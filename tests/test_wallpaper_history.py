@@ -0,0 +1,66 @@
+import datetime
+
+from app.utils.wallpaper_history import WallpaperHistory, HISTORY_DB_NAME
+
+
+def _add(history, tmp_path, name, slot_time, size=100):
+    path = tmp_path / name
+    path.write_bytes(b'x' * size)
+    history.add('Earth-H8', str(path), slot_time=slot_time)
+    return path
+
+
+def _paths(history):
+    return [row['path'] for row in history.query()]
+
+
+def test_evict_by_age(tmp_path):
+    now = datetime.datetime.utcnow()
+    history = WallpaperHistory(str(tmp_path / HISTORY_DB_NAME), max_age_days=1)
+    old = _add(history, tmp_path, 'old.png', now - datetime.timedelta(days=3))
+    # 刚记录的帧即使已过期也不会被淘汰
+    assert old.exists()
+    recent = _add(history, tmp_path, 'recent.png', now - datetime.timedelta(hours=1))
+
+    assert not old.exists()
+    assert _paths(history) == [str(recent)]
+    history.close()
+
+
+def test_evict_by_count(tmp_path):
+    start = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    history = WallpaperHistory(str(tmp_path / HISTORY_DB_NAME), max_count=2)
+    frames = [_add(history, tmp_path, f'frame_{i}.png', start + datetime.timedelta(minutes=10 * i)) for i in range(3)]
+
+    assert not frames[0].exists()
+    assert _paths(history) == [str(frames[1]), str(frames[2])]
+    history.close()
+
+
+def test_evict_by_size(tmp_path):
+    start = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    history = WallpaperHistory(str(tmp_path / HISTORY_DB_NAME), max_bytes=250)
+    frames = [_add(history, tmp_path, f'frame_{i}.png', start + datetime.timedelta(minutes=10 * i)) for i in range(3)]
+
+    assert not frames[0].exists()
+    assert history.stats() == {'count': 2, 'bytes': 200}
+    history.close()
+
+
+def test_rows_are_kept_when_files_cannot_be_deleted(tmp_path):
+    start = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    history = WallpaperHistory(str(tmp_path / HISTORY_DB_NAME), max_count=1)
+    # 同名目录无法用 os.remove 删除，模拟被占用的文件
+    locked = tmp_path / 'locked.png'
+    locked.mkdir()
+    history.add('Earth-H8', str(locked), slot_time=start)
+    missing = _add(history, tmp_path, 'missing.png', start + datetime.timedelta(minutes=10))
+    missing.unlink()
+    latest = _add(history, tmp_path, 'latest.png', start + datetime.timedelta(minutes=20))
+
+    # 删除失败的记录保留下来等待下次重试，文件已不存在的记录照常移除
+    assert locked.exists()
+    assert _paths(history) == [str(locked), str(latest)]
+    assert history.evict(protect=str(latest)) == 0
+    assert _paths(history) == [str(locked), str(latest)]
+    history.close()